@@ -0,0 +1,102 @@
+import random
+from xml.sax.saxutils import escape
+
+# Exames e parâmetros típicos dos lotes da DB Diagnósticos (texto acentuado, como no portal)
+EXAMES = [
+    ("HEMO", "AUTOMAÇÃO - CITOMETRIA DE FLUXO", [
+        ("Hemácias", "milhões/mm³", "4,50 a 5,90"),
+        ("Hemoglobina", "g/dL", "13,0 a 17,5"),
+        ("Hematócrito", "%", "40,0 a 52,0"),
+        ("Leucócitos", "/mm³", "3.500 a 10.500"),
+        ("Plaquetas", "mil/mm³", "150 a 450"),
+    ]),
+    ("GLIC", "ENZIMÁTICO - HEXOQUINASE", [
+        ("Glicose", "mg/dL", "Normal: 70 a 99\nTolerância à glicose diminuída: 100 a 125\nDiabetes: maior ou igual a 126"),
+    ]),
+    ("MONOC", "AGLUTINAÇÃO", [
+        ("MONONUCLEOSE - ANTICORPOS HETERÓFILOS", "", "Não reagente: ausência de anticorpos\nReagente....: presença de anticorpos"),
+    ]),
+    ("TSH", "ELETROQUIMIOLUMINESCÊNCIA", [
+        ("Hormônio Tireoestimulante", "µUI/mL", "0,27 a 4,20"),
+    ]),
+    ("URINA", "MICROSCOPIA E TIRA REAGENTE", [
+        ("Cor", "", "Amarelo citrino"),
+        ("Aspecto", "", "Límpido"),
+        ("Densidade", "", "1.005 a 1.030"),
+        ("pH", "", "5,0 a 7,5"),
+        ("Proteínas", "", "Negativo"),
+        ("Células epiteliais", "/campo", "Raras"),
+    ]),
+]
+
+LIBERADORES = [
+    "CRBio: 137140 Dr. Natan Jesus Da Silva",
+    "CRF: 45821 Dra. Conceição Araújo",
+    "CRM: 99871 Dr. João Sebastião Müller",
+]
+
+OBSERVACOES = [
+    "Resultado confirmado em duplicata.",
+    "Amostra hemolisada; interpretar com cautela.",
+    "Valores de referência atualizados conforme nova metodologia.",
+]
+
+def _elemento(tag, texto, nivel):
+    return f"{'    ' * nivel}<{tag}>{escape(texto)}</{tag}>\n"
+
+def _resultado(rng, numero, procedimentos):
+    partes = [
+        "        <ct_Resultado_v1>\n",
+        _elemento("NumeroAtendimentoApoiado", str(numero), 3),
+        _elemento("NumeroAtendimentoDB", str(1384600000 + numero), 3),
+        "            <ListaResultadoProcedimentos>\n",
+    ]
+    for codigo, metodologia, parametros in rng.sample(EXAMES, min(procedimentos, len(EXAMES))):
+        partes.append("                <ct_ResultadoProcedimentos_v1>\n")
+        partes.append(_elemento("CodigoExameDB", codigo, 5))
+        partes.append(_elemento("DescricaoMetodologia", metodologia, 5))
+        partes.append("                    <ListaResultadoTexto>\n")
+        for descricao, unidade, referencia in parametros:
+            partes.append("                        <ct_ResultadoTexto_v1>\n")
+            partes.append(_elemento("DescricaoParametrosDB", descricao, 7))
+            partes.append(_elemento("ValorResultado", f"{rng.uniform(0.5, 500):.2f}".replace(".", ","), 7))
+            partes.append(_elemento("UnidadeMedida", unidade, 7))
+            partes.append(_elemento("ValorReferencia", referencia, 7))
+            partes.append("                        </ct_ResultadoTexto_v1>\n")
+        partes.append("                    </ListaResultadoTexto>\n")
+        if rng.random() < 0.3:
+            partes.append(_elemento("Observacao1", rng.choice(OBSERVACOES), 5))
+        partes.append(_elemento("NomeLiberadorClinico", rng.choice(LIBERADORES), 5))
+        partes.append(_elemento("DataHoraLiberacaoClinica", f"{rng.randint(1, 28):02d}/01/2026 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00", 5))
+        partes.append("                </ct_ResultadoProcedimentos_v1>\n")
+    partes.append("            </ListaResultadoProcedimentos>\n")
+    partes.append("        </ct_Resultado_v1>\n")
+    return "".join(partes)
+
+def gerar_lote(caminho, atendimentos, procedimentos=3, seed=42, primeiro_atendimento=6700000):
+    """
+    Gera um 'ct_LoteResultados_v1' sintético em ISO-8859-1, gravado de forma incremental
+    (lotes de 100k atendimentos não precisam caber em memória).
+
+    Args:
+        caminho (str): Arquivo de saída.
+        atendimentos (int): Quantidade de 'ct_Resultado_v1'.
+        procedimentos (int): Procedimentos por atendimento (até a quantidade de exames do catálogo).
+        seed (int): Semente do gerador, para lotes reproduzíveis entre execuções.
+        primeiro_atendimento (int): NumeroAtendimentoApoiado do primeiro registro.
+
+    Returns:
+        str: O caminho gerado.
+    """
+    rng = random.Random(seed)
+    with open(caminho, "w", encoding="iso-8859-1") as f:
+        f.write('<?xml version="1.0" encoding="ISO-8859-1"?>\n')
+        f.write("<ct_LoteResultados_v1>\n")
+        f.write(_elemento("NumeroLote", str(rng.randint(100000, 999999)), 1))
+        f.write(_elemento("CodigoApoiado", "HSF", 1))
+        f.write("    <ListaResultados>\n")
+        for i in range(atendimentos):
+            f.write(_resultado(rng, primeiro_atendimento + i, procedimentos))
+        f.write("    </ListaResultados>\n")
+        f.write("</ct_LoteResultados_v1>\n")
+    return caminho
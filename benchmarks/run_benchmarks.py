@@ -0,0 +1,261 @@
+import sys
+import os
+
+# Adiciona o diretório raiz ao path para permitir imports absolutos (ex: from src.separacao ...)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import gc
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from src.separacao import separar_lote_xml
+from src.cleaner import save_exam_txt
+from src.extracao import ler_lote
+from src.leitor_xml import obter_backend, backends_instalados, BACKENDS_DISPONIVEIS
+from xml_to_rtf import RTFConverter, parse_db_diagnosticos_format
+from benchmarks.gerador_lote import gerar_lote
+from benchmarks.tasy_stub import TasyClientStub
+
+logger = logging.getLogger(__name__)
+
+TAMANHOS_PADRAO = [1000, 10000]
+# Preset --grande: inclui o lote de 100 mil atendimentos, onde memória e streaming fazem diferença
+TAMANHOS_GRANDE = [1000, 10000, 100000]
+MODOS_SEPARACAO = {
+    "separacao_arvore": {"streaming": False},
+    "separacao_streaming": {"streaming": True},
+    "separacao_rapida": {"modo_rapido": True},
+    "separacao_xml_txt_rtf": {"saidas": ("xml", "txt", "rtf")},
+}
+ETAPAS = list(MODOS_SEPARACAO) + [
+    "save_exam_txt", "parse_db_diagnosticos", "escape_text", "lote_em_arvore", "lote_em_registros",
+]
+# Etapas que dependem do leitor XML (repetidas para cada backend comparado)
+ETAPAS_LEITOR = set(MODOS_SEPARACAO) | {"lote_em_arvore", "lote_em_registros"}
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+def _resultados(caminho_lote):
+    """Percorre os 'ct_Resultado_v1' do lote em streaming, liberando cada um após o uso."""
+    for _, elem in ET.iterparse(caminho_lote, events=('end',)):
+        if elem.tag == 'ct_Resultado_v1':
+            yield elem
+            elem.clear()
+
+def _medir(funcao, medir_memoria):
+    """
+    Executa a etapa uma vez para tempo e, opcionalmente, outra sob tracemalloc para o pico de memória
+    (o rastreamento deixa o Python bem mais lento e distorceria a vazão).
+    """
+    gc.collect()
+    inicio = time.perf_counter()
+    itens, latencias = funcao()
+    segundos = time.perf_counter() - inicio
+
+    pico = None
+    if medir_memoria:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            funcao()
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    metricas = {
+        "itens": itens,
+        "segundos": round(segundos, 4),
+        "itens_por_segundo": round(itens / segundos, 1) if segundos else None,
+        "pico_memoria_mb": round(pico / (1024 * 1024), 2) if pico is not None else None,
+    }
+    if latencias:
+        metricas["latencia_p50_ms"] = round(_percentil(latencias, 50) * 1000, 4)
+        metricas["latencia_p95_ms"] = round(_percentil(latencias, 95) * 1000, 4)
+    return metricas
+
+def _etapa_separacao(caminho_lote, opcoes, latencia_tasy, backend=None):
+    def executar():
+        # Cada execução em uma pasta limpa: histórico, XMLs e TXTs não vazam entre rodadas
+        with tempfile.TemporaryDirectory(prefix="bench_sep_") as tmp:
+            anterior = os.getcwd()
+            os.chdir(tmp)
+            try:
+                gerados = separar_lote_xml(
+                    caminho_lote,
+                    client=TasyClientStub(latencia_tasy),
+                    ignorar_historico=True,
+                    pasta_saida=os.path.join(tmp, "saida"),
+                    backend_xml=backend,
+                    **opcoes
+                )
+            finally:
+                os.chdir(anterior)
+        return gerados or 0, None
+    return executar
+
+def _etapa_por_atendimento(caminho_lote, operacao):
+    """Mede apenas a chamada de 'operacao' para cada atendimento; a leitura do lote fica de fora."""
+    def executar():
+        latencias = []
+        with tempfile.TemporaryDirectory(prefix="bench_item_") as tmp:
+            for resultado in _resultados(caminho_lote):
+                inicio = time.perf_counter()
+                operacao(resultado, tmp)
+                latencias.append(time.perf_counter() - inicio)
+        return len(latencias), latencias
+    return executar
+
+def _parse_db(resultado, _tmp):
+    # parse_db_diagnosticos_format espera a raiz do lote: um lote de um atendimento por chamada
+    raiz = ET.Element('ct_LoteResultados_v1')
+    raiz.append(resultado)
+    return parse_db_diagnosticos_format(raiz)
+
+def _escape_rtf(resultado):
+    raiz = ET.Element('ct_LoteResultados_v1')
+    raiz.append(resultado)
+    texto = parse_db_diagnosticos_format(raiz)
+    # Só o escape entra na medição; a extração acima é a etapa 'parse_db_diagnosticos'
+    inicio = time.perf_counter()
+    RTFConverter.escape_text(texto)
+    return time.perf_counter() - inicio
+
+def _etapa_escape(caminho_lote):
+    def executar():
+        latencias = [_escape_rtf(resultado) for resultado in _resultados(caminho_lote)]
+        return len(latencias), latencias
+    return executar
+
+def _etapa_lote_em_memoria(caminho_lote, registros, backend=None):
+    """Carrega o lote inteiro em memória: árvore do leitor XML ou registros tipados (src.extracao)."""
+    def executar():
+        if registros:
+            lote = ler_lote(caminho_lote, backend)
+            return len(lote.resultados), None
+        raiz = obter_backend(backend).parse(caminho_lote)
+        return sum(1 for _ in raiz.iter('ct_Resultado_v1')), None
+    return executar
+
+def executar_benchmarks(tamanhos, procedimentos=3, etapas=None, latencia_tasy=0.0,
+                        medir_memoria=True, pasta_trabalho=None, backends=None):
+    """
+    Gera lotes sintéticos e mede cada etapa do pipeline sobre eles.
+
+    Args:
+        tamanhos (list): Quantidades de atendimentos por lote (ex: [1000, 10000, 100000]).
+        procedimentos (int): Procedimentos por atendimento no lote gerado.
+        etapas (list, opcional): Subconjunto de etapas a medir (padrão: todas).
+        latencia_tasy (float): Segundos por ida e volta ao Tasy simulado.
+        medir_memoria (bool): Repete cada etapa sob tracemalloc para obter o pico de memória.
+        pasta_trabalho (str, opcional): Onde gravar os lotes gerados (padrão: pasta temporária).
+        backends (list, opcional): Leitores XML a comparar (padrão: todos os instalados). O primeiro mede
+            todas as etapas; os demais, só as que dependem do leitor (ETAPAS_LEITOR).
+
+    Returns:
+        dict: Resultado serializável em JSON, com as métricas de cada etapa por tamanho de lote e leitor XML.
+    """
+    etapas = etapas or ETAPAS
+    backends = list(dict.fromkeys(obter_backend(nome).nome for nome in (backends or backends_instalados())))
+
+    relatorio = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "procedimentos_por_atendimento": procedimentos,
+        "latencia_tasy_s": latencia_tasy,
+        "backends_xml": backends,
+        "lotes": [],
+    }
+
+    pasta = pasta_trabalho or tempfile.mkdtemp(prefix="bench_lotes_")
+    try:
+        for tamanho in tamanhos:
+            caminho_lote = os.path.join(pasta, f"lote_exames_bench_{tamanho}.xml")
+            if not os.path.exists(caminho_lote):
+                logger.info(f"Gerando lote sintético com {tamanho} atendimentos...")
+                gerar_lote(caminho_lote, tamanho, procedimentos=procedimentos)
+
+            tamanho_bytes = os.path.getsize(caminho_lote)
+            for ordem, backend in enumerate(backends):
+                medicoes = {
+                    "save_exam_txt": lambda: _etapa_por_atendimento(caminho_lote, save_exam_txt),
+                    "parse_db_diagnosticos": lambda: _etapa_por_atendimento(caminho_lote, _parse_db),
+                    "escape_text": lambda: _etapa_escape(caminho_lote),
+                    "lote_em_arvore": lambda: _etapa_lote_em_memoria(caminho_lote, False, backend),
+                    "lote_em_registros": lambda: _etapa_lote_em_memoria(caminho_lote, True, backend),
+                }
+                for nome, opcoes in MODOS_SEPARACAO.items():
+                    medicoes[nome] = lambda opcoes=opcoes: _etapa_separacao(caminho_lote, opcoes, latencia_tasy, backend)
+
+                resultado_lote = {"atendimentos": tamanho, "tamanho_bytes": tamanho_bytes,
+                                  "backend_xml": backend, "etapas": {}}
+                for nome in etapas:
+                    if ordem > 0 and nome not in ETAPAS_LEITOR:
+                        continue
+                    logger.info(f"[{tamanho}/{backend}] Medindo {nome}...")
+                    metricas = _medir(medicoes[nome](), medir_memoria)
+                    if nome in MODOS_SEPARACAO and metricas["segundos"]:
+                        metricas["mb_por_segundo"] = round(tamanho_bytes / metricas["segundos"] / (1024 * 1024), 2)
+                    resultado_lote["etapas"][nome] = metricas
+                    logger.info(f"[{tamanho}/{backend}] {nome}: {metricas['segundos']}s ({metricas['itens_por_segundo']} itens/s)")
+                relatorio["lotes"].append(resultado_lote)
+    finally:
+        if pasta_trabalho is None:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    return relatorio
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de separação, TXT e RTF sobre lotes sintéticos.")
+    tamanhos = parser.add_mutually_exclusive_group()
+    tamanhos.add_argument("-n", "--atendimentos", type=int, nargs='+', default=TAMANHOS_PADRAO,
+                          help="Tamanhos de lote a gerar (padrão: 1000 10000).")
+    tamanhos.add_argument("--grande", dest="atendimentos", action="store_const", const=TAMANHOS_GRANDE,
+                          help="Mede também o lote de 100000 atendimentos (equivale a -n 1000 10000 100000).")
+    parser.add_argument("-p", "--procedimentos", type=int, default=3, help="Procedimentos por atendimento (padrão: 3).")
+    parser.add_argument("-e", "--etapas", nargs='+', choices=ETAPAS, help="Etapas a medir (padrão: todas).")
+    parser.add_argument("--latencia-tasy", type=float, default=0.0, help="Latência simulada por consulta ao Tasy, em segundos.")
+    parser.add_argument("--sem-memoria", action="store_true", help="Não mede o pico de memória (mais rápido).")
+    parser.add_argument("-b", "--backends", nargs='+', choices=BACKENDS_DISPONIVEIS,
+                        help="Leitores XML a comparar (padrão: todos os instalados).")
+    parser.add_argument("--pasta", help="Mantém os lotes gerados nesta pasta (reaproveitados entre execuções).")
+    parser.add_argument("-o", "--saida", default="benchmark_resultados.json", help="Arquivo JSON de resultados.")
+    args = parser.parse_args()
+
+    # O pipeline loga cada atendimento; no benchmark só interessam as mensagens do próprio runner
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    if args.pasta:
+        os.makedirs(args.pasta, exist_ok=True)
+
+    relatorio = executar_benchmarks(
+        args.atendimentos,
+        procedimentos=args.procedimentos,
+        etapas=args.etapas,
+        latencia_tasy=args.latencia_tasy,
+        medir_memoria=not args.sem_memoria,
+        pasta_trabalho=args.pasta,
+        backends=args.backends,
+    )
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    logger.info(f"Resultados salvos em {args.saida}")
+
+if __name__ == "__main__":
+    main()
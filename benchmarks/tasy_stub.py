@@ -0,0 +1,35 @@
+import time
+
+class TasyClientStub:
+    """
+    Substituto do TasyClient para benchmarks: responde às consultas de enriquecimento sem Oracle,
+    com uma latência fixa opcional por ida e volta ao banco (simula a rede até o TASYPRD).
+    """
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.consultas = 0
+
+    def _round_trip(self):
+        self.consultas += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def fetch_patient_by_prescription(self, nr_prescricao):
+        self._round_trip()
+        return self._paciente(nr_prescricao)
+
+    def fetch_patients_by_prescriptions(self, nr_prescricoes, chunk_size=1000):
+        ids = list(dict.fromkeys(str(nr) for nr in nr_prescricoes))
+        for _ in range(0, len(ids), chunk_size):
+            self._round_trip()
+        return {nr: self._paciente(nr) for nr in ids}
+
+    @staticmethod
+    def _paciente(nr_prescricao):
+        return {
+            "NR_PRESCRICAO": nr_prescricao,
+            "CD_PESSOA_FISICA": f"9{nr_prescricao}",
+            "NM_PESSOA_FISICA": "PACIENTE SINTÉTICO",
+            "NR_CPF": "00000000000",
+        }
@@ -2,6 +2,7 @@ from datetime import datetime
 import time
 import logging
 from src.bot import DBAutomator
+from src.ingestao import IngestaoLotes
 
 # Configuração de Logger para o Main (para ver tentativas)
 logger = logging.getLogger(__name__)
@@ -9,6 +10,10 @@ logger = logging.getLogger(__name__)
 def main():
     MAX_ATTEMPTS = 3
     logger.info("=== AGENDADOR INICIADO (08h às 22h) ===")
+
+    # Separação dos lotes desacoplada do navegador: o bot só baixa, o serviço separa
+    ingestao = IngestaoLotes()
+    ingestao.iniciar()
     
     while True:
         now = datetime.now()
@@ -23,7 +28,7 @@ def main():
             while attempt <= MAX_ATTEMPTS and not success:
                 logger.info(f"--- TENTATIVA {attempt}/{MAX_ATTEMPTS} ---")
                 try:
-                    bot = DBAutomator(headless=False)
+                    bot = DBAutomator(headless=False, separar_apos_download=False)
                     success = bot.run()
                     if success:
                         logger.info(f"--- SUCESSO NA TENTATIVA {attempt} ---")
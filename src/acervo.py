@@ -0,0 +1,368 @@
+import sys
+import os
+
+# Adiciona o diretório raiz ao path para permitir imports absolutos (ex: from src.escrita ...)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import glob
+import zlib
+import struct
+import sqlite3
+import argparse
+import logging
+import threading
+from datetime import datetime
+
+from src.escrita import escrita_atomica
+
+logger = logging.getLogger(__name__)
+
+# Com ACERVO_TXT=0 volta o comportamento antigo: um .txt solto por atendimento em YYYY/
+ACERVO_ATIVO = os.environ.get("ACERVO_TXT", "1") != "0"
+
+INDICE_DB = "acervo.db"
+PADRAO_PACOTE = "acervo_{:05d}.pack"
+TAMANHO_MAX_PACOTE = 256 * 1024 * 1024
+
+TIPO_TXT = "txt"
+TIPO_LOTE = "lote"
+
+# Cabeçalho de cada registro no pacote: assinatura, flags, tamanho da chave, tamanho dos dados, CRC32.
+# Com ele o índice pode ser reconstruído a partir dos pacotes (ver reconstruir_indice).
+CABECALHO = struct.Struct('<4sBHII')
+ASSINATURA = b'ACV1'
+FLAG_ZLIB = 0x01
+FLAG_LOTE = 0x02
+
+class AcervoAnual:
+    """
+    Acervo anual em pacotes: substitui milhares de arquivos pequenos em 'YYYY/'.
+
+    Responsabilidade:
+        - Anexar registros (TXT limpo por atendimento, cópias de lote) a pacotes 'acervo_NNNNN.pack',
+          opcionalmente comprimidos com zlib, abrindo um novo pacote ao atingir o tamanho máximo.
+        - Manter o índice SQLite (tipo, chave) -> (pacote, posição, tamanho) para leitura direta
+          de qualquer registro, sem varrer os pacotes.
+        - Exportar registros como arquivos comuns sob demanda.
+
+    Regravar uma chave (atendimento reemitido) anexa um novo registro e aponta o índice para ele.
+    A escrita no pacote e a atualização do índice acontecem dentro de uma transação IMMEDIATE,
+    o que serializa threads e processos que gravam no mesmo acervo.
+
+    Com 'acumular', os registros ficam em memória até descarregar() (chamado pela separação a cada
+    bloco): um bloco inteiro custa uma transação e um fsync, em vez de um de cada por atendimento.
+    """
+
+    def __init__(self, pasta, comprimir=True, tamanho_max_pacote=TAMANHO_MAX_PACOTE, acumular=False):
+        """
+        Args:
+            pasta (str): Pasta do ano (ex: '2026'); criada se não existir.
+            comprimir (bool): Comprime os novos registros com zlib.
+            tamanho_max_pacote (int): Tamanho a partir do qual um novo pacote é aberto.
+            acumular (bool): Só grava os registros em descarregar() (ou ao fechar).
+        """
+        self.pasta = pasta
+        self.comprimir = comprimir
+        self.tamanho_max_pacote = tamanho_max_pacote
+        self.acumular = acumular
+        os.makedirs(pasta, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Registros aguardando descarregar() e número do pacote corrente (descoberto no primeiro uso)
+        self._pendentes = []
+        self._numero = None
+        self.conn = sqlite3.connect(os.path.join(pasta, INDICE_DB), timeout=60,
+                                    isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS registros (
+                tipo TEXT NOT NULL,
+                chave TEXT NOT NULL,
+                pacote INTEGER NOT NULL,
+                posicao INTEGER NOT NULL,
+                tamanho INTEGER NOT NULL,
+                comprimido INTEGER NOT NULL,
+                gravado_em TEXT NOT NULL,
+                PRIMARY KEY (tipo, chave)
+            ) WITHOUT ROWID
+        """)
+
+    def __contains__(self, chave):
+        return self._localizar(chave, TIPO_TXT) is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM registros").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.fechar()
+
+    def _caminho_pacote(self, numero):
+        return os.path.join(self.pasta, PADRAO_PACOTE.format(numero))
+
+    def _pacote_atual(self):
+        pacotes = sorted(glob.glob(os.path.join(self.pasta, PADRAO_PACOTE.replace("{:05d}", "*"))))
+        if not pacotes:
+            return 0
+        numero = int(os.path.basename(pacotes[-1])[len("acervo_"):-len(".pack")])
+        if os.path.getsize(pacotes[-1]) >= self.tamanho_max_pacote:
+            numero += 1
+        return numero
+
+    def _abrir_pacote(self):
+        """Pacote corrente para anexar, pulando os que já atingiram o tamanho máximo (outro processo pode tê-los enchido)."""
+        if self._numero is None:
+            self._numero = self._pacote_atual()
+        while True:
+            f = open(self._caminho_pacote(self._numero), 'ab')
+            inicio = f.seek(0, os.SEEK_END)
+            if inicio < self.tamanho_max_pacote:
+                return f, inicio
+            f.close()
+            self._numero += 1
+
+    def adicionar(self, chave, dados, tipo=TIPO_TXT):
+        """
+        Anexa um registro ao pacote corrente e o indexa (com 'acumular', apenas o prepara para descarregar()).
+
+        Args:
+            chave (str): Atendimento (TXT) ou nome do arquivo (lote).
+            dados (bytes | str): Conteúdo; str é gravado em UTF-8.
+            tipo (str): TIPO_TXT ou TIPO_LOTE.
+        """
+        if isinstance(dados, str):
+            dados = dados.encode('utf-8')
+        flags = FLAG_LOTE if tipo == TIPO_LOTE else 0
+        if self.comprimir:
+            dados = zlib.compress(dados)
+            flags |= FLAG_ZLIB
+        chave_bytes = chave.encode('utf-8')
+        cabecalho = CABECALHO.pack(ASSINATURA, flags, len(chave_bytes), len(dados), zlib.crc32(dados))
+
+        with self._lock:
+            self._pendentes.append((tipo, chave, cabecalho + chave_bytes + dados,
+                                    CABECALHO.size + len(chave_bytes), len(dados)))
+        if not self.acumular:
+            self.descarregar()
+
+    def descarregar(self):
+        """
+        Grava os registros pendentes: anexa todos ao pacote com um único fsync e os indexa em uma
+        única transação. Se falhar, os registros do bloco são descartados.
+        """
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, []
+            if not pendentes:
+                return
+            agora = datetime.now().isoformat()
+            linhas = []
+            # BEGIN IMMEDIATE: trava de escrita do índice, válida também entre processos
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                f = None
+                try:
+                    for tipo, chave, registro, deslocamento, tamanho in pendentes:
+                        if f is None:
+                            f, inicio = self._abrir_pacote()
+                        f.write(registro)
+                        linhas.append((tipo, chave, self._numero, inicio + deslocamento, tamanho,
+                                       int(self.comprimir), agora))
+                        inicio += len(registro)
+                        if inicio >= self.tamanho_max_pacote:
+                            # Pacote cheio: fecha (com fsync) e os próximos registros vão para o seguinte
+                            f.flush()
+                            os.fsync(f.fileno())
+                            f.close()
+                            f = None
+                    if f is not None:
+                        f.flush()
+                        os.fsync(f.fileno())
+                finally:
+                    if f is not None:
+                        f.close()
+                self.conn.executemany("INSERT OR REPLACE INTO registros VALUES (?, ?, ?, ?, ?, ?, ?)", linhas)
+                self.conn.execute("COMMIT")
+            except Exception:
+                # Bytes já anexados ficam órfãos no pacote (sem entrada no índice), sem efeito na leitura
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def adicionar_arquivo(self, caminho, tipo=TIPO_LOTE):
+        """Anexa o conteúdo de um arquivo (ex: cópia do lote baixado), usando o nome como chave."""
+        with open(caminho, 'rb') as f:
+            self.adicionar(os.path.basename(caminho), f.read(), tipo)
+
+    def _localizar(self, chave, tipo):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT pacote, posicao, tamanho, comprimido FROM registros WHERE tipo = ? AND chave = ?",
+                (tipo, chave)
+            ).fetchone()
+
+    def ler(self, chave, tipo=TIPO_TXT):
+        """
+        Lê um registro pelo índice (uma consulta e um seek no pacote).
+
+        Returns:
+            bytes | None: Conteúdo original, ou None se a chave não estiver no acervo.
+        """
+        local = self._localizar(chave, tipo)
+        if local is None:
+            return None
+        numero, posicao, tamanho, comprimido = local
+        with open(self._caminho_pacote(numero), 'rb') as f:
+            f.seek(posicao)
+            dados = f.read(tamanho)
+        return zlib.decompress(dados) if comprimido else dados
+
+    def chaves(self, tipo=TIPO_TXT):
+        """Chaves do tipo informado, em ordem."""
+        with self._lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT chave FROM registros WHERE tipo = ? ORDER BY chave", (tipo,)
+            )]
+
+    def exportar(self, chave, destino, tipo=TIPO_TXT):
+        """
+        Grava um registro como arquivo comum em 'destino' ('<atendimento>.txt' ou o nome do lote).
+
+        Returns:
+            str | None: Caminho gerado, ou None se a chave não existir.
+        """
+        dados = self.ler(chave, tipo)
+        if dados is None:
+            return None
+        os.makedirs(destino, exist_ok=True)
+        caminho = os.path.join(destino, f"{chave}.txt" if tipo == TIPO_TXT else chave)
+        with escrita_atomica(caminho) as f:
+            f.write(dados)
+        return caminho
+
+    def importar_pasta(self, pasta=None, remover=False):
+        """
+        Move para o acervo os arquivos soltos de uma pasta anual ('*.txt' e 'lote_exames_*.xml').
+
+        Args:
+            pasta (str, opcional): Pasta de origem (padrão: a própria pasta do acervo).
+            remover (bool): Apaga cada arquivo depois de indexado.
+
+        Returns:
+            int: Quantidade de arquivos importados.
+        """
+        pasta = pasta or self.pasta
+        importados = 0
+        for caminho in sorted(glob.glob(os.path.join(pasta, "*.txt"))):
+            with open(caminho, 'rb') as f:
+                self.adicionar(os.path.splitext(os.path.basename(caminho))[0], f.read(), TIPO_TXT)
+            importados += 1
+            if remover:
+                os.remove(caminho)
+        for caminho in sorted(glob.glob(os.path.join(pasta, "lote_exames_*.xml"))):
+            self.adicionar_arquivo(caminho, TIPO_LOTE)
+            importados += 1
+            if remover:
+                os.remove(caminho)
+        return importados
+
+    def reconstruir_indice(self):
+        """
+        Recria o índice lendo os cabeçalhos de todos os pacotes (ex: após perda do 'acervo.db').
+        Registros corrompidos ou truncados no fim de um pacote são ignorados.
+
+        Returns:
+            int: Quantidade de registros indexados.
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM registros")
+                total = 0
+                for caminho in sorted(glob.glob(os.path.join(self.pasta, PADRAO_PACOTE.replace("{:05d}", "*")))):
+                    numero = int(os.path.basename(caminho)[len("acervo_"):-len(".pack")])
+                    total += self._indexar_pacote(caminho, numero)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return total
+
+    def _indexar_pacote(self, caminho, numero):
+        total = 0
+        with open(caminho, 'rb') as f:
+            while True:
+                inicio = f.tell()
+                bruto = f.read(CABECALHO.size)
+                if len(bruto) < CABECALHO.size:
+                    break
+                assinatura, flags, tam_chave, tam_dados, crc = CABECALHO.unpack(bruto)
+                if assinatura != ASSINATURA:
+                    logger.warning(f"Registro inválido em {caminho} (posição {inicio}); restante do pacote ignorado.")
+                    break
+                chave = f.read(tam_chave).decode('utf-8')
+                posicao = f.tell()
+                dados = f.read(tam_dados)
+                if len(dados) < tam_dados or zlib.crc32(dados) != crc:
+                    logger.warning(f"Registro truncado em {caminho} ({chave}); ignorado.")
+                    break
+                tipo = TIPO_LOTE if flags & FLAG_LOTE else TIPO_TXT
+                # Registros posteriores da mesma chave substituem os anteriores
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO registros VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (tipo, chave, numero, posicao, tam_dados, int(bool(flags & FLAG_ZLIB)), datetime.now().isoformat())
+                )
+                total += 1
+        return total
+
+    def fechar(self):
+        try:
+            self.descarregar()
+        except Exception as e:
+            logger.error(f"Erro ao gravar registros pendentes do acervo: {e}")
+        self.conn.close()
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    parser = argparse.ArgumentParser(description="Consulta e manutenção do acervo anual em pacotes.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    exp = sub.add_parser("exportar", help="Exporta TXTs (ou lotes) do acervo como arquivos comuns.")
+    exp.add_argument("pasta", help="Pasta do ano (ex: 2026).")
+    exp.add_argument("chaves", nargs='*', help="Atendimentos (ou nomes de lote com --lote). Sem chaves: exporta tudo.")
+    exp.add_argument("-o", "--saida", default="exportados", help="Pasta de destino (padrão: exportados).")
+    exp.add_argument("--lote", action="store_true", help="Exporta cópias de lote em vez de TXTs.")
+
+    imp = sub.add_parser("importar", help="Move os .txt e lotes soltos da pasta do ano para o acervo.")
+    imp.add_argument("pasta", help="Pasta do ano (ex: 2026).")
+    imp.add_argument("--remover", action="store_true", help="Apaga os arquivos soltos após importar.")
+
+    rec = sub.add_parser("reindexar", help="Reconstrói o índice a partir dos pacotes.")
+    rec.add_argument("pasta", help="Pasta do ano (ex: 2026).")
+
+    args = parser.parse_args()
+
+    with AcervoAnual(args.pasta) as acervo:
+        if args.comando == "exportar":
+            tipo = TIPO_LOTE if args.lote else TIPO_TXT
+            chaves = args.chaves or acervo.chaves(tipo)
+            faltando = [chave for chave in chaves if acervo.exportar(chave, args.saida, tipo) is None]
+            for chave in faltando:
+                logger.warning(f"Não encontrado no acervo: {chave}")
+            logger.info(f"{len(chaves) - len(faltando)} arquivo(s) exportado(s) para '{args.saida}'.")
+            if faltando:
+                sys.exit(1)
+        elif args.comando == "importar":
+            total = acervo.importar_pasta(remover=args.remover)
+            logger.info(f"{total} arquivo(s) importado(s) para o acervo de '{args.pasta}'.")
+        elif args.comando == "reindexar":
+            total = acervo.reconstruir_indice()
+            logger.info(f"Índice reconstruído com {total} registro(s).")
+
+if __name__ == "__main__":
+    main()
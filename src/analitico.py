@@ -0,0 +1,148 @@
+import os
+import json
+import glob
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Raiz do dataset analítico (uma subpasta por mês: mes=YYYY-MM/)
+PASTA_ANALITICO = os.environ.get("ANALITICO_DIR", "analitico")
+
+FORMATO_LIBERACAO = "%d/%m/%Y %H:%M:%S"
+
+def _data_liberacao(texto):
+    """Converte 'DataHoraLiberacaoClinica' (dd/mm/aaaa hh:mm:ss) em datetime, ou None se ausente/inválida."""
+    if not texto:
+        return None
+    try:
+        return datetime.strptime(texto.strip(), FORMATO_LIBERACAO)
+    except ValueError:
+        return None
+
+def linhas_parametros(registro, lote=None, processado_em=None):
+    """
+    Uma linha por 'ct_ResultadoTexto_v1' de um registro extraído (src.extracao.Resultado).
+
+    Returns:
+        list: Tuplas (particao 'YYYY-MM', dicionário da linha). A partição é o mês da liberação
+        clínica; sem data válida, o mês do processamento.
+    """
+    processado_em = processado_em or datetime.now()
+    linhas = []
+    for proc in registro.procedimentos:
+        liberado_em = _data_liberacao(proc.data_liberacao)
+        particao = (liberado_em or processado_em).strftime("%Y-%m")
+        for param in proc.parametros:
+            linhas.append((particao, {
+                "atendimento": registro.atendimento_apoiado,
+                "atendimento_db": registro.atendimento_db,
+                "exame": proc.codigo_exame,
+                "metodologia": proc.metodologia,
+                "parametro": param.descricao,
+                "valor": param.valor,
+                "unidade": param.unidade,
+                "referencia": param.referencia,
+                "liberado_em": liberado_em.isoformat() if liberado_em else None,
+                "liberador": proc.liberador,
+                "lote": lote,
+                "processado_em": processado_em.isoformat(timespec="seconds"),
+            }))
+    return linhas
+
+class ExportadorAnalitico:
+    """
+    Sink analítico da separação: grava cada parâmetro de resultado como uma linha NDJSON,
+    particionada pelo mês da liberação clínica ('<pasta>/mes=YYYY-MM/<arquivo>.ndjson').
+
+    Cada execução escreve em arquivos próprios (nome com lote, horário e PID, mais o número do bloco),
+    então separações simultâneas nunca disputam o mesmo arquivo, e novos dados são sempre acrescentados
+    ao dataset. As linhas ficam em memória até descarregar(), chamado a cada bloco confirmado da separação;
+    as partições de um bloco são publicadas juntas (tudo ou nada).
+    Um atendimento reemitido (resultado alterado) gera novas linhas; use o 'processado_em' mais
+    recente por atendimento para obter a versão vigente.
+    """
+
+    def __init__(self, pasta=None, nome=None):
+        """
+        Args:
+            pasta (str, opcional): Raiz do dataset (padrão: PASTA_ANALITICO).
+            nome (str, opcional): Nome base dos arquivos desta execução (padrão: horário + PID).
+        """
+        self.pasta = pasta or PASTA_ANALITICO
+        self.nome = nome or f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{os.getpid()}"
+        self._pendentes = {}
+        self._blocos = 0
+        self._lock = threading.Lock()
+
+    def adicionar(self, registro, lote=None):
+        """Enfileira as linhas de um atendimento (seguro para as threads de gravação)."""
+        linhas = linhas_parametros(registro, lote)
+        with self._lock:
+            for particao, linha in linhas:
+                self._pendentes.setdefault(particao, []).append(json.dumps(linha, ensure_ascii=False))
+
+    def descarregar(self):
+        """
+        Grava as linhas pendentes em um arquivo do bloco por partição ('<nome>_<bloco>.ndjson').
+
+        Todas as partições são gravadas primeiro como temporários ('.tmp', com fsync) e só então
+        renomeadas: se alguma falhar, nenhuma aparece no dataset e a nova tentativa do bloco
+        (ao retomar o lote) não duplica as linhas das partições que já tinham sido gravadas.
+
+        Returns:
+            int: Quantidade de linhas gravadas.
+        """
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, {}
+            if not pendentes:
+                return 0
+            self._blocos += 1
+            bloco = self._blocos
+
+        destinos = []
+        total = 0
+        try:
+            for particao, linhas in sorted(pendentes.items()):
+                pasta_particao = os.path.join(self.pasta, f"mes={particao}")
+                os.makedirs(pasta_particao, exist_ok=True)
+                destino = os.path.join(pasta_particao, f"{self.nome}_{bloco:05d}.ndjson")
+                destinos.append(destino)
+                with open(f"{destino}.tmp", "w", encoding="utf-8") as f:
+                    f.write("\n".join(linhas))
+                    f.write("\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                total += len(linhas)
+        except BaseException:
+            for destino in destinos:
+                try:
+                    os.remove(f"{destino}.tmp")
+                except OSError:
+                    pass
+            raise
+
+        for destino in destinos:
+            os.replace(f"{destino}.tmp", destino)
+        return total
+
+def ler_dataset(pasta=None, meses=None):
+    """
+    Percorre as linhas do dataset analítico.
+
+    Args:
+        pasta (str, opcional): Raiz do dataset (padrão: PASTA_ANALITICO).
+        meses (iterable, opcional): Partições 'YYYY-MM' a ler (padrão: todas).
+
+    Yields:
+        dict: Uma linha por parâmetro de resultado.
+    """
+    pasta = pasta or PASTA_ANALITICO
+    particoes = [f"mes={mes}" for mes in meses] if meses else ["mes=*"]
+    for particao in particoes:
+        for caminho in sorted(glob.glob(os.path.join(pasta, particao, "*.ndjson"))):
+            with open(caminho, encoding="utf-8") as f:
+                for linha in f:
+                    if linha.strip():
+                        yield json.loads(linha)
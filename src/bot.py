@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 from playwright.sync_api import sync_playwright
 from src.config import Config
 from src.separacao import separar_lote_xml
+from src.acervo import AcervoAnual, ACERVO_ATIVO
 from src.decorators import retry_action
 
 # Configuração de Logs
@@ -22,8 +23,15 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class DBAutomator:
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, separar_apos_download=True):
+        """
+        Args:
+            headless (bool): Executa o navegador sem interface.
+            separar_apos_download (bool): Separa o lote logo após o download. Use False quando o
+                serviço de ingestão (src/ingestao.py) estiver observando as pastas mensais.
+        """
         self.headless = headless
+        self.separar_apos_download = separar_apos_download
         self.playwright = None
         self.browser = None
         self.context = None
@@ -377,13 +385,20 @@ class DBAutomator:
             final_path = self._download_xml_with_retry()
             
             # 5. Pós-processamento (Separação e Backup)
-            logger.info("Iniciando separação automática do lote...")
-            separar_lote_xml(final_path)
+            if self.separar_apos_download:
+                logger.info("Iniciando separação automática do lote...")
+                separar_lote_xml(final_path)
+            else:
+                logger.info("Separação delegada ao serviço de ingestão.")
             
             current_year = datetime.now().strftime('%Y')
             backup_dir = os.path.join(os.getcwd(), current_year)
-            os.makedirs(backup_dir, exist_ok=True)
-            shutil.copy2(final_path, os.path.join(backup_dir, os.path.basename(final_path)))
+            if ACERVO_ATIVO:
+                with AcervoAnual(backup_dir) as acervo:
+                    acervo.adicionar_arquivo(final_path)
+            else:
+                os.makedirs(backup_dir, exist_ok=True)
+                shutil.copy2(final_path, os.path.join(backup_dir, os.path.basename(final_path)))
             logger.info("Processo concluído com sucesso.")
             
         except Exception as e:
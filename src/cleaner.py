@@ -1,7 +1,8 @@
 import os
-import re
 import logging
 import xml.etree.ElementTree as ET
+from src.escrita import escrita_atomica
+from src.extracao import extrair_resultado
 
 logger = logging.getLogger(__name__)
 
@@ -9,83 +10,103 @@ def clean_text(text):
     """Remove caracteres indesejados e espaços extras."""
     if not text:
         return ""
-    # Remove caracteres de controle e espaços duplicados
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    # Remove caracteres de controle e espaços duplicados (split() usa o mesmo conjunto de \s do re)
+    return " ".join(text.split())
 
-def save_exam_txt(exam_element, output_dir):
+def identificar_atendimento(registro):
+    """NumeroAtendimentoApoiado do registro, com fallback para NumeroAtendimentoDB (tags ausentes ou vazias)."""
+    return registro.atendimento_apoiado or registro.atendimento_db or "SEM_ID"
+
+def formatar_txt(registro):
+    """
+    Monta as linhas do TXT limpo a partir de um registro extraído (src.extracao.Resultado).
+    Retorna None quando o atendimento não tem procedimentos.
+    """
+    if not registro.procedimentos:
+        return None
+
+    atendimento_id = identificar_atendimento(registro)
+    lines = [f"ATENDIMENTO: {atendimento_id}", "=" * 40, ""]
+
+    for proc in registro.procedimentos:
+        codigo = clean_text(proc.codigo_exame)
+        # Se não tiver CodigoExameDB, tenta CodigoProcedimento
+        if not codigo:
+            codigo = clean_text(proc.codigo_procedimento)
+
+        lines.append(f"EXAME: {codigo}")
+        lines.append(f"METODOLOGIA: {clean_text(proc.metodologia)}")
+        lines.append("-" * 20)
+
+        # Parâmetros
+        for param in proc.parametros:
+            lines.append(f"{clean_text(param.descricao)}: {clean_text(param.valor)} {clean_text(param.unidade)}")
+            ref = clean_text(param.referencia)
+            if ref:
+                lines.append(f"Referência: {ref}")
+
+        lines.append("")
+        lines.append("=" * 40)
+        lines.append("")
+
+    return lines
+
+def save_exam_txt(exam_element, output_dir, registro=None):
     """
     Extrai dados limpos de um elemento XML de exame e salva em TXT.
     
     Args:
         exam_element (xml.etree.ElementTree.Element): Elemento 'ct_Resultado_v1' ou similar com dados do atendimento.
         output_dir (str): Diretório onde o arquivo TXT será salvo.
+        registro (Resultado, opcional): Registro já extraído do elemento (evita percorrê-lo de novo).
     """
     try:
-        # 1. Identificar Chave Única (NumeroAtendimentoApoiado)
-        atendimento_node = exam_element.find('.//NumeroAtendimentoApoiado')
-        if atendimento_node is None:
-             atendimento_node = exam_element.find('.//NumeroAtendimentoDB') # Fallback
-        
-        atendimento_id = atendimento_node.text if atendimento_node is not None else "SEM_ID"
-        
-        lines = []
-        lines.append(f"ATENDIMENTO: {atendimento_id}")
-        lines.append("=" * 40)
-        lines.append("")
+        # Uma única passada pelo elemento (src.extracao) em vez de várias buscas './/'
+        if registro is None:
+            registro = extrair_resultado(exam_element)
 
-        # 2. Extração de Resultados
-        # Itera sobre ListaResultadoProcedimentos -> ct_ResultadoProcedimentos_v1
-        # Nota: O elemento passado (exam_element) já é um 'ct_Resultado_v1' ou container similar
-        
-        found_exams = False
-        
-        # Busca recursiva a partir do elemento do exame
-        procedures = exam_element.findall('.//ct_ResultadoProcedimentos_v1')
-        
-        for proc in procedures:
-            found_exams = True
-            codigo = clean_text(proc.findtext('CodigoExameDB'))
-            # Se não tiver CodigoExameDB, tenta CodigoProcedimento
-            if not codigo:
-                codigo = clean_text(proc.findtext('CodigoProcedimento'))
-                
-            metodologia = clean_text(proc.findtext('DescricaoMetodologia'))
-            
-            lines.append(f"EXAME: {codigo}")
-            lines.append(f"METODOLOGIA: {metodologia}")
-            lines.append("-" * 20)
-            
-            # Parâmetros
-            params = proc.findall('.//ct_ResultadoTexto_v1')
-            for param in params:
-                desc = clean_text(param.findtext('DescricaoParametrosDB'))
-                res = clean_text(param.findtext('ValorResultado'))
-                unid = clean_text(param.findtext('UnidadeMedida'))
-                ref = clean_text(param.findtext('ValorReferencia'))
-                
-                lines.append(f"{desc}: {res} {unid}")
-                if ref:
-                    lines.append(f"Referência: {ref}")
-            
-            lines.append("")
-            lines.append("=" * 40)
-            lines.append("")
-
-        if not found_exams:
+        atendimento_id = identificar_atendimento(registro)
+        lines = formatar_txt(registro)
+        if lines is None:
             logger.warning(f"Nenhum procedimento encontrado para atendimento {atendimento_id} ao gerar TXT.")
             return
 
-        # 3. Salvar Arquivo
+        # Salvar Arquivo
         filename = f"{atendimento_id}.txt"
         filepath = os.path.join(output_dir, filename)
         
         os.makedirs(output_dir, exist_ok=True)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
+        with escrita_atomica(filepath, 'w', encoding='utf-8') as f:
             f.write("\n".join(lines))
             
         logger.info(f"Arquivo TXT limpo gerado: {filepath}")
 
     except Exception as e:
         logger.error(f"Erro ao gerar TXT limpo para atendimento: {e}")
+
+def arquivar_exam_txt(exam_element, acervo, registro=None):
+    """
+    Variante de save_exam_txt que anexa o TXT limpo ao acervo anual em pacotes (src.acervo)
+    em vez de criar um arquivo por atendimento.
+    
+    Args:
+        exam_element (xml.etree.ElementTree.Element): Elemento 'ct_Resultado_v1' ou similar com dados do atendimento.
+        acervo (AcervoAnual): Acervo do ano corrente.
+        registro (Resultado, opcional): Registro já extraído do elemento.
+    """
+    try:
+        if registro is None:
+            registro = extrair_resultado(exam_element)
+
+        atendimento_id = identificar_atendimento(registro)
+        lines = formatar_txt(registro)
+        if lines is None:
+            logger.warning(f"Nenhum procedimento encontrado para atendimento {atendimento_id} ao gerar TXT.")
+            return
+
+        acervo.adicionar(atendimento_id, "\n".join(lines))
+        logger.info(f"TXT limpo arquivado no acervo: {atendimento_id}")
+
+    except Exception as e:
+        logger.error(f"Erro ao arquivar TXT limpo para atendimento: {e}")
@@ -0,0 +1,32 @@
+import os
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+@contextmanager
+def escrita_atomica(caminho, modo='wb', **kwargs):
+    """
+    Abre um arquivo temporário ('<caminho>.tmp') no mesmo diretório do destino e, ao final do bloco,
+    o renomeia para 'caminho'. O arquivo final nunca fica visível pela metade para a importação do Tasy:
+    ou existe a versão anterior, ou a nova completa.
+
+    Args:
+        caminho (str): Arquivo de destino.
+        modo (str): Modo de abertura ('wb' ou 'w').
+        **kwargs: Repassados para open() (ex: encoding).
+    """
+    temporario = f"{caminho}.tmp"
+    try:
+        with open(temporario, modo, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            try:
+                os.remove(temporario)
+            except OSError as e:
+                logger.warning(f"Não foi possível remover o temporário {temporario}: {e}")
+        raise
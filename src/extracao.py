@@ -0,0 +1,187 @@
+import sys
+from typing import NamedTuple, Optional, Tuple
+
+from src.leitor_xml import obter_backend
+
+# Motor de extração único: cada 'ct_Resultado_v1' é percorrido uma só vez e vira registros
+# tipados, consumidos pelo TXT (cleaner), pelo RTF (xml_to_rtf), pelo dataset analítico e pelo índice.
+#
+# Os campos seguem a semântica de Element.findtext: None quando a tag não existe e "" quando
+# existe sem texto, para que os consumidores mantenham exatamente a saída de antes.
+#
+# Os registros são tuplas (NamedTuple, sem __dict__ por instância) e os textos que se repetem entre
+# atendimentos (códigos, metodologias, descrições, unidades, referências, liberadores, observações)
+# são internados: em um lote grande, cada valor distinto existe uma única vez em memória.
+
+TAG_LOTE = 'ct_LoteResultados_v1'
+TAG_RESULTADO = 'ct_Resultado_v1'
+TAG_PROCEDIMENTO = 'ct_ResultadoProcedimentos_v1'
+TAG_PARAMETRO = 'ct_ResultadoTexto_v1'
+
+CAMPOS_PARAMETRO = {
+    'DescricaoParametrosDB': 0,
+    'ValorResultado': 1,
+    'UnidadeMedida': 2,
+    'ValorReferencia': 3,
+}
+
+CAMPOS_PROCEDIMENTO = {
+    'CodigoExameDB': 0,
+    'CodigoProcedimento': 1,
+    'DescricaoMetodologia': 2,
+    'NomeLiberadorClinico': 3,
+    'DataHoraLiberacaoClinica': 4,
+}
+
+CAMPOS_OBSERVACAO = {f'Observacao{i}': i - 1 for i in range(1, 6)}
+
+# Campos categóricos (repetidos entre atendimentos): valores de resultado e datas ficam de fora
+CAMPOS_INTERNADOS = frozenset({
+    'DescricaoParametrosDB', 'UnidadeMedida', 'ValorReferencia',
+    'CodigoExameDB', 'CodigoProcedimento', 'DescricaoMetodologia', 'NomeLiberadorClinico',
+    *CAMPOS_OBSERVACAO,
+})
+
+_intern = sys.intern
+
+def _texto(elem):
+    """Texto do elemento ("" se vazio), internado quando o campo é categórico."""
+    texto = elem.text
+    if not texto:
+        return ""
+    return _intern(texto) if elem.tag in CAMPOS_INTERNADOS else texto
+
+class Parametro(NamedTuple):
+    """Um 'ct_ResultadoTexto_v1'."""
+    descricao: Optional[str]
+    valor: Optional[str]
+    unidade: Optional[str]
+    referencia: Optional[str]
+
+class Procedimento(NamedTuple):
+    """Um 'ct_ResultadoProcedimentos_v1' com seus parâmetros e observações (Observacao1..5 não vazias)."""
+    codigo_exame: Optional[str]
+    codigo_procedimento: Optional[str]
+    metodologia: Optional[str]
+    liberador: Optional[str]
+    data_liberacao: Optional[str]
+    parametros: Tuple[Parametro, ...]
+    observacoes: Tuple[str, ...]
+
+class Resultado(NamedTuple):
+    """Um 'ct_Resultado_v1': identificação do atendimento e procedimentos em ordem de documento."""
+    atendimento_apoiado: Optional[str]
+    atendimento_db: Optional[str]
+    procedimentos: Tuple[Procedimento, ...]
+
+class Lote(NamedTuple):
+    """Um 'ct_LoteResultados_v1': cabeçalho e atendimentos de ListaResultados."""
+    numero: Optional[str]
+    codigo_apoiado: Optional[str]
+    resultados: Tuple[Resultado, ...]
+
+def _parametro(elem):
+    campos = [None, None, None, None]
+    for filho in elem:
+        indice = CAMPOS_PARAMETRO.get(filho.tag)
+        if indice is not None and campos[indice] is None:
+            campos[indice] = _texto(filho)
+    return Parametro(*campos)
+
+def _coletar_parametros(elem, parametros):
+    for filho in elem:
+        if filho.tag == TAG_PARAMETRO:
+            parametros.append(_parametro(filho))
+        else:
+            _coletar_parametros(filho, parametros)
+
+def _procedimento(elem):
+    campos = [None] * len(CAMPOS_PROCEDIMENTO)
+    observacoes = [None] * len(CAMPOS_OBSERVACAO)
+    parametros = []
+
+    for filho in elem:
+        tag = filho.tag
+        indice = CAMPOS_PROCEDIMENTO.get(tag)
+        if indice is not None:
+            if campos[indice] is None:
+                campos[indice] = _texto(filho)
+            continue
+        indice = CAMPOS_OBSERVACAO.get(tag)
+        if indice is not None:
+            if observacoes[indice] is None:
+                observacoes[indice] = _texto(filho)
+            continue
+        if tag == TAG_PARAMETRO:
+            parametros.append(_parametro(filho))
+        else:
+            # ListaResultadoTexto (ou qualquer outro agrupador) contém os parâmetros
+            _coletar_parametros(filho, parametros)
+
+    return Procedimento(*campos, tuple(parametros), tuple(obs for obs in observacoes if obs))
+
+def extrair_resultado(resultado):
+    """
+    Percorre um 'ct_Resultado_v1' uma única vez e devolve o registro tipado.
+
+    Args:
+        resultado (xml.etree.ElementTree.Element): Elemento 'ct_Resultado_v1' (ou container similar).
+
+    Returns:
+        Resultado: Atendimento (Apoiado/DB) e procedimentos com seus parâmetros.
+    """
+    ids = {'NumeroAtendimentoApoiado': None, 'NumeroAtendimentoDB': None}
+    procedimentos = []
+    pendentes = [iter(resultado)]
+
+    # Busca em profundidade em ordem de documento (mesma ordem dos antigos './/' findall)
+    while pendentes:
+        filho = next(pendentes[-1], None)
+        if filho is None:
+            pendentes.pop()
+            continue
+        tag = filho.tag
+        if tag == TAG_PROCEDIMENTO:
+            procedimentos.append(_procedimento(filho))
+        elif tag in ids:
+            if ids[tag] is None:
+                ids[tag] = filho.text or ""
+        elif len(filho):
+            pendentes.append(iter(filho))
+
+    return Resultado(ids['NumeroAtendimentoApoiado'], ids['NumeroAtendimentoDB'], tuple(procedimentos))
+
+def extrair_lote(raiz):
+    """
+    Converte um lote já carregado em árvore no registro tipado.
+
+    Args:
+        raiz (xml.etree.ElementTree.Element): Elemento 'ct_LoteResultados_v1'.
+
+    Returns:
+        Lote: NumeroLote, CodigoApoiado e os atendimentos de ListaResultados.
+    """
+    lista_resultados = raiz.find('ListaResultados')
+    resultados = () if lista_resultados is None else tuple(
+        extrair_resultado(resultado) for resultado in lista_resultados.iterfind(TAG_RESULTADO)
+    )
+    return Lote(raiz.findtext('NumeroLote'), raiz.findtext('CodigoApoiado'), resultados)
+
+def ler_lote(caminho, backend=None):
+    """
+    Lê um lote do disco direto para o registro tipado, em streaming (iterparse): cada
+    'ct_Resultado_v1' é extraído e descartado, então a árvore completa nunca fica em memória.
+    Mesmo resultado de extrair_lote(ET.parse(caminho).getroot()).
+
+    Args:
+        caminho (str): Arquivo do lote (ct_LoteResultados_v1).
+        backend (str, opcional): Leitor XML ('auto', 'lxml', 'stdlib'; ver src.leitor_xml).
+
+    Returns:
+        Lote: NumeroLote, CodigoApoiado e os atendimentos de ListaResultados.
+    """
+    cabecalho = {}
+    resultados = tuple(
+        extrair_resultado(resultado) for resultado in obter_backend(backend).iterar_resultados(caminho, cabecalho)
+    )
+    return Lote(cabecalho.get('NumeroLote'), cabecalho.get('CodigoApoiado'), resultados)
@@ -0,0 +1,248 @@
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB = "processed_exams.db"
+
+# Formato antigo (lista JSON reescrita a cada lote), migrado uma única vez para o SQLite
+HISTORY_FILE = "processed_exams.json"
+
+# Situação de um atendimento em relação ao histórico
+NOVO = "novo"
+INALTERADO = "inalterado"
+ALTERADO = "alterado"
+
+def calcular_digest(resultado):
+    """
+    Calcula o SHA-256 do conteúdo canônico de um 'ct_Resultado_v1': tags, atributos ordenados e
+    textos sem os espaços das bordas, percorrendo o elemento uma única vez (sem serializar o XML).
+    Indentação, ordem de atributos e encoding do lote não alteram o digest; qualquer mudança de conteúdo altera.
+    """
+    partes = []
+
+    def visitar(elem):
+        # Registro de aridade fixa: tag, atributos, texto, filhos (cada um seguido do tail) e '/'
+        partes.append(elem.tag)
+        partes.append(repr(sorted(elem.attrib.items())) if elem.attrib else "")
+        partes.append((elem.text or "").strip())
+        for filho in elem:
+            visitar(filho)
+            partes.append((filho.tail or "").strip())
+        partes.append("/")
+
+    visitar(resultado)
+    return hashlib.sha256("\x00".join(partes).encode('utf-8', 'surrogatepass')).hexdigest()
+
+class HistoricoProcessados:
+    """
+    Histórico de atendimentos já separados, persistido em SQLite.
+
+    Responsabilidade:
+        - Verificar se um atendimento já foi processado e se o conteúdo mudou desde então
+          (consulta indexada pela chave primária + comparação do digest).
+        - Registrar novos atendimentos em lotes, em uma única transação por lote.
+        - Manter o journal de cada arquivo de lote (posição confirmada), permitindo retomar
+          uma separação interrompida a partir do último bloco gravado.
+        - Migrar o antigo 'processed_exams.json' na primeira abertura.
+
+    O banco usa journal WAL: uma queda no meio do processamento preserva tudo o que já foi
+    confirmado, e outros processos podem ler o histórico enquanto ele é atualizado.
+    """
+
+    def __init__(self, caminho=HISTORY_DB, caminho_json=HISTORY_FILE):
+        """
+        Args:
+            caminho (str): Arquivo SQLite do histórico.
+            caminho_json (str): Histórico legado em JSON a ser migrado, se existir.
+        """
+        self.caminho = caminho
+        self.conn = sqlite3.connect(caminho, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS atendimentos (
+                atendimento TEXT PRIMARY KEY,
+                processado_em TEXT NOT NULL,
+                digest TEXT
+            ) WITHOUT ROWID
+        """)
+        colunas = [row[1] for row in self.conn.execute("PRAGMA table_info(atendimentos)")]
+        if 'digest' not in colunas:
+            self.conn.execute("ALTER TABLE atendimentos ADD COLUMN digest TEXT")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS lotes (
+                caminho TEXT PRIMARY KEY,
+                assinatura TEXT NOT NULL,
+                posicao INTEGER NOT NULL,
+                concluido INTEGER NOT NULL DEFAULT 0,
+                atualizado_em TEXT NOT NULL,
+                sysdate TEXT
+            ) WITHOUT ROWID
+        """)
+        colunas = [row[1] for row in self.conn.execute("PRAGMA table_info(lotes)")]
+        if 'sysdate' not in colunas:
+            self.conn.execute("ALTER TABLE lotes ADD COLUMN sysdate TEXT")
+        self.conn.commit()
+
+        if caminho_json:
+            self.migrar_json(caminho_json)
+
+    def __contains__(self, atendimento):
+        row = self.conn.execute(
+            "SELECT 1 FROM atendimentos WHERE atendimento = ?", (atendimento,)
+        ).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM atendimentos").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.fechar()
+
+    def situacao(self, atendimento, digest):
+        """
+        Compara o digest atual do atendimento com o registrado no histórico.
+
+        Returns:
+            NOVO, INALTERADO ou ALTERADO. Registros legados (sem digest) adotam o digest
+            atual como referência e são considerados INALTERADOS.
+        """
+        row = self.conn.execute(
+            "SELECT digest FROM atendimentos WHERE atendimento = ?", (atendimento,)
+        ).fetchone()
+
+        if row is None:
+            return NOVO
+        if row[0] is None:
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE atendimentos SET digest = ? WHERE atendimento = ?", (digest, atendimento)
+                )
+            return INALTERADO
+        return INALTERADO if row[0] == digest else ALTERADO
+
+    def adicionar(self, itens):
+        """
+        Registra (ou atualiza) atendimentos processados em uma única transação.
+
+        Args:
+            itens: Pares (atendimento, digest); o digest pode ser None.
+        """
+        with self.conn:
+            self._inserir(itens)
+
+    def progresso_lote(self, caminho, assinatura):
+        """
+        Consulta o journal de um arquivo de lote.
+
+        Args:
+            caminho (str): Caminho absoluto do lote.
+            assinatura (str): Identifica a versão do arquivo (tamanho e mtime); se mudou, o lote recomeça do zero.
+
+        Returns:
+            Tupla (posicao, concluido): quantidade de 'ct_Resultado_v1' já confirmados e se o lote terminou.
+        """
+        row = self.conn.execute(
+            "SELECT assinatura, posicao, concluido FROM lotes WHERE caminho = ?", (caminho,)
+        ).fetchone()
+        if row is None or row[0] != assinatura:
+            return 0, False
+        return row[1], bool(row[2])
+
+    def lote_pendente(self, caminho):
+        """Indica se o lote tem execução iniciada e não concluída no journal (qualquer versão do arquivo)."""
+        row = self.conn.execute(
+            "SELECT 1 FROM lotes WHERE caminho = ? AND concluido = 0", (caminho,)
+        ).fetchone()
+        return row is not None
+
+    def iniciar_lote(self, caminho, assinatura, sysdate, reiniciar=False):
+        """
+        Abre (ou retoma) a execução de um lote no journal.
+
+        Args:
+            caminho (str): Caminho absoluto do lote.
+            assinatura (str): Versão do arquivo (tamanho e mtime); se mudou, o lote recomeça do zero.
+            sysdate (str): Carimbo desta execução, usado nos nomes dos arquivos gerados.
+            reiniciar (bool): Recomeça do zero mesmo com journal válido (reprocessamento forçado).
+
+        Returns:
+            Tupla (posicao, concluido, sysdate). Ao retomar, sysdate é o da execução interrompida,
+            para que os arquivos de um bloco regravado substituam os anteriores em vez de duplicá-los.
+        """
+        row = self.conn.execute(
+            "SELECT assinatura, posicao, concluido, sysdate FROM lotes WHERE caminho = ?", (caminho,)
+        ).fetchone()
+        if not reiniciar and row is not None and row[0] == assinatura:
+            if row[3] is not None:
+                return row[1], bool(row[2]), row[3]
+            # Journal anterior ao registro do carimbo: adota o desta execução
+            with self.conn:
+                self.conn.execute("UPDATE lotes SET sysdate = ? WHERE caminho = ?", (sysdate, caminho))
+            return row[1], bool(row[2]), sysdate
+
+        agora = datetime.now().isoformat(timespec='seconds')
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO lotes (caminho, assinatura, posicao, concluido, atualizado_em, sysdate) VALUES (?, ?, 0, 0, ?, ?)",
+                (caminho, assinatura, agora, sysdate)
+            )
+        return 0, False, sysdate
+
+    def confirmar_bloco(self, itens, caminho, assinatura, posicao, concluido=False):
+        """
+        Registra os atendimentos gravados de um bloco e avança o journal do lote na mesma transação,
+        de modo que histórico e posição nunca fiquem inconsistentes após uma queda.
+        O carimbo registrado em iniciar_lote é preservado.
+        """
+        agora = datetime.now().isoformat(timespec='seconds')
+        with self.conn:
+            self._inserir(itens)
+            self.conn.execute(
+                """INSERT INTO lotes (caminho, assinatura, posicao, concluido, atualizado_em) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(caminho) DO UPDATE SET assinatura = excluded.assinatura, posicao = excluded.posicao,
+                       concluido = excluded.concluido, atualizado_em = excluded.atualizado_em""",
+                (caminho, assinatura, posicao, int(concluido), agora)
+            )
+
+    def _inserir(self, itens):
+        agora = datetime.now().isoformat(timespec='seconds')
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO atendimentos (atendimento, processado_em, digest) VALUES (?, ?, ?)",
+            ((atendimento, agora, digest) for atendimento, digest in itens)
+        )
+
+    def migrar_json(self, caminho_json):
+        """
+        Importa o histórico legado em JSON e renomeia o arquivo para '<nome>.migrado',
+        garantindo que a migração aconteça apenas uma vez.
+        """
+        if not os.path.exists(caminho_json):
+            return
+
+        try:
+            with open(caminho_json, 'r') as f:
+                legado = json.load(f)
+        except Exception as e:
+            logger.error(f"Erro ao ler histórico legado '{caminho_json}': {e}")
+            return
+
+        agora = datetime.now().isoformat(timespec='seconds')
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO atendimentos (atendimento, processado_em) VALUES (?, ?)",
+                ((str(atendimento), agora) for atendimento in legado)
+            )
+        os.replace(caminho_json, f"{caminho_json}.migrado")
+        logger.info(f"Histórico legado migrado para SQLite: {len(legado)} atendimentos.")
+
+    def fechar(self):
+        self.conn.close()
@@ -0,0 +1,282 @@
+import sys
+import os
+
+# Adiciona o diretório raiz ao path para permitir imports absolutos (ex: from src.extracao ...)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import re
+import glob
+import time
+import sqlite3
+import argparse
+import logging
+import threading
+import unicodedata
+from datetime import datetime
+
+from src.extracao import ler_lote
+
+logger = logging.getLogger(__name__)
+
+INDICE_DB = os.environ.get("INDICE_EXAMES_DB", "indice_exames.db")
+
+# Campos indexados de cada atendimento (também usados como filtro na consulta: 'exame:glic')
+CAMPO_ATENDIMENTO = "atendimento"
+CAMPO_EXAME = "exame"
+CAMPO_METODOLOGIA = "metodologia"
+CAMPO_PARAMETRO = "parametro"
+CAMPOS = (CAMPO_ATENDIMENTO, CAMPO_EXAME, CAMPO_METODOLOGIA, CAMPO_PARAMETRO)
+
+PADRAO_TERMO = re.compile(r'[0-9a-z]+')
+
+# Lotes baixados nas pastas mensais (YYYYMM/lote_exames_*.xml), fonte da reindexação
+PADRAO_LOTES = os.path.join("[0-9][0-9][0-9][0-9][0-9][0-9]", "lote_exames_*.xml")
+
+# Maior caractere Unicode: limite superior das buscas por prefixo ('glic*')
+FIM_PREFIXO = '\U0010ffff'
+
+def normalizar(texto):
+    """Minúsculas e sem acentos ('HETERÓFILOS' -> 'heterofilos')."""
+    decomposto = unicodedata.normalize('NFKD', texto.lower())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+def termos(texto):
+    """Termos indexáveis de um texto (sequências alfanuméricas normalizadas)."""
+    if not texto:
+        return []
+    return PADRAO_TERMO.findall(normalizar(texto))
+
+def termos_registro(registro):
+    """
+    Pares (termo, campo) de um registro extraído (src.extracao.Resultado), sem repetições.
+    """
+    pares = set()
+    for atendimento in (registro.atendimento_apoiado, registro.atendimento_db):
+        for termo in termos(atendimento):
+            pares.add((termo, CAMPO_ATENDIMENTO))
+    for proc in registro.procedimentos:
+        for codigo in (proc.codigo_exame, proc.codigo_procedimento):
+            for termo in termos(codigo):
+                pares.add((termo, CAMPO_EXAME))
+        for termo in termos(proc.metodologia):
+            pares.add((termo, CAMPO_METODOLOGIA))
+        for param in proc.parametros:
+            for termo in termos(param.descricao):
+                pares.add((termo, CAMPO_PARAMETRO))
+    return pares
+
+class IndiceExames:
+    """
+    Índice invertido dos atendimentos recebidos, persistido em SQLite.
+
+    Responsabilidade:
+        - Manter, de forma incremental, os termos de códigos de exame, metodologias, descrições de
+          parâmetros e números de atendimento -> atendimentos (tabela 'termos', chave (termo, campo, atendimento)).
+        - Substituir as entradas de um atendimento reemitido (resultado alterado) pelas novas.
+        - Responder consultas por termos (E lógico), com filtro por campo e busca por prefixo.
+
+    Como saída da separação, acumula os registros de um bloco e grava tudo em descarregar(),
+    em uma única transação.
+    """
+
+    def __init__(self, caminho=INDICE_DB):
+        """
+        Args:
+            caminho (str): Arquivo SQLite do índice.
+        """
+        self.caminho = caminho
+        self._pendentes = {}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS documentos (
+                atendimento TEXT PRIMARY KEY,
+                atendimento_db TEXT,
+                exames TEXT,
+                lote TEXT,
+                indexado_em TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS termos (
+                termo TEXT NOT NULL,
+                campo TEXT NOT NULL,
+                atendimento TEXT NOT NULL,
+                PRIMARY KEY (termo, campo, atendimento)
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS termos_atendimento ON termos (atendimento)")
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM documentos").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.fechar()
+
+    def adicionar(self, registro, lote=None):
+        """Enfileira um atendimento para indexação (seguro para as threads de gravação)."""
+        atendimento = registro.atendimento_apoiado or registro.atendimento_db
+        if not atendimento:
+            return
+        exames = ",".join(dict.fromkeys(
+            proc.codigo_exame or proc.codigo_procedimento or "" for proc in registro.procedimentos
+        ))
+        documento = (atendimento, registro.atendimento_db, exames, lote, termos_registro(registro))
+        with self._lock:
+            self._pendentes[atendimento] = documento
+
+    def descarregar(self):
+        """
+        Grava os atendimentos pendentes em uma transação, substituindo entradas anteriores.
+
+        Returns:
+            int: Quantidade de atendimentos indexados.
+        """
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, {}
+            if not pendentes:
+                return 0
+            agora = datetime.now().isoformat(timespec="seconds")
+            with self.conn:
+                self.conn.executemany("DELETE FROM termos WHERE atendimento = ?", [(a,) for a in pendentes])
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO documentos VALUES (?, ?, ?, ?, ?)",
+                    [(a, db, exames, lote, agora) for a, db, exames, lote, _ in pendentes.values()]
+                )
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO termos VALUES (?, ?, ?)",
+                    [(termo, campo, a) for a, _, _, _, pares in pendentes.values() for termo, campo in pares]
+                )
+        return len(pendentes)
+
+    def buscar(self, consulta, limite=50):
+        """
+        Busca atendimentos que contenham todos os termos da consulta.
+
+        Sintaxe: termos separados por espaço; 'campo:termo' restringe o campo
+        (atendimento, exame, metodologia, parametro); 'termo*' busca por prefixo.
+
+        Returns:
+            list: Dicionários (atendimento, atendimento_db, exames, lote, indexado_em), mais recentes primeiro.
+        """
+        filtros = []
+        parametros = []
+        for parte in consulta.split():
+            campo = None
+            if ":" in parte:
+                prefixo_campo, parte = parte.split(":", 1)
+                if prefixo_campo.lower() not in CAMPOS:
+                    raise ValueError(f"Campo desconhecido: {prefixo_campo} (disponíveis: {', '.join(CAMPOS)})")
+                campo = prefixo_campo.lower()
+            prefixo = parte.endswith("*")
+            for termo in termos(parte):
+                if prefixo:
+                    sql, valores = "termo >= ? AND termo < ?", [termo, termo + FIM_PREFIXO]
+                else:
+                    sql, valores = "termo = ?", [termo]
+                if campo:
+                    sql += " AND campo = ?"
+                    valores.append(campo)
+                filtros.append(f"SELECT atendimento FROM termos WHERE {sql}")
+                parametros.extend(valores)
+
+        if not filtros:
+            return []
+
+        sql = f"""
+            SELECT d.atendimento, d.atendimento_db, d.exames, d.lote, d.indexado_em
+            FROM documentos d
+            WHERE d.atendimento IN ({" INTERSECT ".join(filtros)})
+            ORDER BY d.indexado_em DESC, d.atendimento
+            LIMIT ?
+        """
+        with self._lock:
+            linhas = self.conn.execute(sql, parametros + [limite]).fetchall()
+        colunas = ("atendimento", "atendimento_db", "exames", "lote", "indexado_em")
+        return [dict(zip(colunas, linha)) for linha in linhas]
+
+    def fechar(self):
+        self.conn.close()
+
+def reindexar(base_dir=".", caminho=INDICE_DB, backend=None):
+    """
+    Reconstrói o índice a partir dos lotes guardados nas pastas mensais (YYYYMM/lote_exames_*.xml).
+
+    Recupera blocos que a separação gravou sem conseguir indexar e lotes processados antes do
+    índice existir. Os lotes são lidos em ordem de nome (data do download), então a versão mais
+    recente de um atendimento reemitido prevalece; 'indexado_em' passa a ser o momento da reindexação.
+
+    Args:
+        base_dir (str): Diretório que contém as pastas 'YYYYMM'.
+        caminho (str): Arquivo SQLite do índice.
+        backend (str, opcional): Leitor XML ('auto', 'lxml', 'stdlib'; ver src.leitor_xml).
+
+    Returns:
+        int: Quantidade de atendimentos indexados (somando todos os lotes).
+    """
+    total = 0
+    with IndiceExames(caminho) as indice:
+        for caminho_lote in sorted(glob.glob(os.path.join(base_dir, PADRAO_LOTES)), key=os.path.basename):
+            try:
+                lote = ler_lote(caminho_lote, backend)
+            except Exception as e:
+                logger.error(f"Erro ao ler {caminho_lote} para reindexação: {e}")
+                continue
+            for registro in lote.resultados:
+                indice.adicionar(registro, lote.numero)
+            indexados = indice.descarregar()
+            total += indexados
+            logger.info(f"Reindexado: {caminho_lote} ({indexados} atendimentos)")
+    return total
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    parser = argparse.ArgumentParser(description="Consulta o índice de atendimentos recebidos.")
+    parser.add_argument("consulta", nargs='*', help="Termos (ex: 6790505, 'exame:glic', 'parametro:hemo*', 'mononucleose').")
+    parser.add_argument("-n", "--limite", type=int, default=50, help="Máximo de resultados (padrão: 50).")
+    parser.add_argument("--indice", default=INDICE_DB, help=f"Arquivo do índice (padrão: {INDICE_DB}).")
+    parser.add_argument("--reindexar", metavar="BASE_DIR", nargs='?', const=".",
+                        help="Reconstrói o índice a partir de BASE_DIR/YYYYMM/lote_exames_*.xml (padrão: diretório atual).")
+    args = parser.parse_args()
+
+    if args.reindexar is not None:
+        inicio = time.perf_counter()
+        total = reindexar(args.reindexar, args.indice)
+        logger.info(f"{total} atendimento(s) reindexado(s) em {time.perf_counter() - inicio:.1f} s.")
+        return
+
+    if not args.consulta:
+        parser.error("informe os termos da consulta ou --reindexar")
+
+    if not os.path.exists(args.indice):
+        logger.error(f"Índice não encontrado: {args.indice}")
+        sys.exit(1)
+
+    with IndiceExames(args.indice) as indice:
+        inicio = time.perf_counter()
+        try:
+            resultados = indice.buscar(" ".join(args.consulta), args.limite)
+        except ValueError as e:
+            logger.error(str(e))
+            sys.exit(1)
+        milissegundos = (time.perf_counter() - inicio) * 1000
+
+    for r in resultados:
+        print(f"{r['atendimento']}\tDB: {r['atendimento_db'] or '-'}\tExames: {r['exames']}\tLote: {r['lote'] or '-'}\tIndexado em: {r['indexado_em']}")
+    logger.info(f"{len(resultados)} atendimento(s) em {milissegundos:.1f} ms.")
+    if not resultados:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
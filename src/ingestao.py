@@ -0,0 +1,232 @@
+import sys
+import os
+
+# Adiciona o diretório raiz ao path para permitir imports absolutos (ex: from src.separacao ...)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import re
+import glob
+import queue
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime
+
+from src.historico import HistoricoProcessados
+from src.separacao import separar_lote_xml, SAIDAS_DISPONIVEIS
+
+logger = logging.getLogger(__name__)
+
+# Pastas mensais criadas pelo bot (ex: 202602/) e nome dos lotes baixados
+PADRAO_PASTA_MES = re.compile(r'^\d{6}$')
+PADRAO_LOTE = "lote_exames_*.xml"
+
+# Novas tentativas de um lote com falha: espera de intervalo * 2^(n-1), até ESPERA_MAXIMA segundos;
+# após MAX_TENTATIVAS o lote fica parado até o arquivo mudar (novo download ou cópia corrigida)
+MAX_TENTATIVAS = 5
+ESPERA_MAXIMA = 3600.0
+
+class IngestaoLotes:
+    """
+    Serviço de ingestão que observa as pastas 'YYYYMM' e separa os lotes novos.
+
+    Responsabilidade:
+        - Varrer periodicamente as pastas mensais em busca de 'lote_exames_*.xml'
+          (baixados pelo bot ou copiados manualmente).
+        - Enfileirar cada lote apenas quando o arquivo parou de crescer (download concluído).
+        - Processar a fila com concorrência limitada via separar_lote_xml.
+
+    A varredura é feita por polling (sem dependências externas), e o journal do histórico
+    garante que um lote já concluído não seja separado novamente após reiniciar o serviço.
+
+    Lotes de meses anteriores que não mudaram desde o início do serviço são ignorados, a menos que
+    o journal tenha a separação deles em andamento: sem isso, a primeira execução (journal vazio)
+    separaria todo o histórico de lotes, reemitindo atendimentos antigos. Lotes passados são
+    reprocessados explicitamente com 'python -m src.reprocessamento'.
+
+    Um lote com falha (total ou parcial) volta para a fila com espera exponencial entre as tentativas;
+    depois de MAX_TENTATIVAS falhas com o mesmo arquivo, só é tentado de novo quando ele muda.
+    """
+
+    def __init__(self, base_dir=None, intervalo=30.0, max_concorrencia=2, saidas=None, incluir_antigos=False):
+        """
+        Args:
+            base_dir (str): Diretório que contém as pastas 'YYYYMM' (padrão: diretório atual).
+            intervalo (float): Segundos entre varreduras.
+            max_concorrencia (int): Quantidade máxima de lotes separados ao mesmo tempo.
+            saidas (iterable, opcional): Saídas por atendimento ('xml', 'txt', 'rtf', 'ndjson', 'indice');
+                padrão da separação (SAIDAS_PADRAO: 'xml', 'txt', 'indice').
+            incluir_antigos (bool): Também separa os lotes de meses anteriores ao início do serviço.
+        """
+        self.base_dir = base_dir or os.getcwd()
+        self.intervalo = intervalo
+        self.max_concorrencia = max(1, max_concorrencia)
+        self.saidas = saidas
+        self.fila = queue.Queue()
+        self._parar = threading.Event()
+        self._workers = []
+        # caminho -> assinatura (tamanho, mtime) já enfileirada ou observada na varredura anterior
+        self._enfileirados = {}
+        self._observados = {}
+        self._lock = threading.Lock()
+        self.incluir_antigos = incluir_antigos
+        self._inicio_ns = time.time_ns()
+        # Lotes antigos já avaliados: caminho -> assinatura em que foram ignorados
+        self._antigos = {}
+        # Lotes com falha: caminho -> (assinatura, tentativas, instante da próxima tentativa em time.monotonic)
+        self._falhas = {}
+
+    def _aguardando_nova_tentativa(self, caminho, assinatura):
+        """Lote que falhou com esta mesma versão do arquivo e ainda não pode ser tentado de novo."""
+        falha = self._falhas.get(caminho)
+        if falha is None:
+            return False
+        if falha[0] != assinatura:
+            # Arquivo alterado: recomeça a contagem de tentativas
+            del self._falhas[caminho]
+            return False
+        return time.monotonic() < falha[2]
+
+    def _registrar_falha(self, caminho):
+        """Libera o lote para nova tentativa após a espera (ou o estaciona após MAX_TENTATIVAS)."""
+        with self._lock:
+            assinatura = self._enfileirados.pop(caminho, None)
+            anterior = self._falhas.get(caminho)
+            tentativas = anterior[1] + 1 if anterior is not None and anterior[0] == assinatura else 1
+            if tentativas >= MAX_TENTATIVAS:
+                proxima = float('inf')
+                logger.error(f"Lote {caminho} falhou {tentativas} vezes; não será tentado de novo até o arquivo mudar.")
+            else:
+                espera = min(self.intervalo * 2 ** (tentativas - 1), ESPERA_MAXIMA)
+                proxima = time.monotonic() + espera
+                logger.warning(f"Lote {caminho} com falha (tentativa {tentativas}/{MAX_TENTATIVAS}); nova tentativa em {espera:.0f}s.")
+            self._falhas[caminho] = (assinatura, tentativas, proxima)
+
+    def _lote_antigo(self, pasta, caminho, assinatura):
+        """Lote de mês anterior, sem alteração desde o início do serviço e sem separação pendente no journal."""
+        if self.incluir_antigos or pasta >= datetime.now().strftime('%Y%m') or assinatura[1] >= self._inicio_ns:
+            return False
+        if self._antigos.get(caminho) == assinatura:
+            return True
+        with HistoricoProcessados() as historico:
+            pendente = historico.lote_pendente(os.path.abspath(caminho))
+        if not pendente:
+            logger.info(f"Lote anterior ao início do serviço ignorado (use src.reprocessamento): {caminho}")
+            self._antigos[caminho] = assinatura
+        return not pendente
+
+    def varrer(self):
+        """
+        Procura lotes novos ou alterados e enfileira os que estão estáveis desde a varredura anterior.
+        Retorna a lista de caminhos enfileirados nesta chamada.
+        """
+        encontrados = {}
+        for pasta in sorted(os.listdir(self.base_dir)):
+            caminho_pasta = os.path.join(self.base_dir, pasta)
+            if not PADRAO_PASTA_MES.match(pasta) or not os.path.isdir(caminho_pasta):
+                continue
+            for caminho in sorted(glob.glob(os.path.join(caminho_pasta, PADRAO_LOTE))):
+                try:
+                    stat = os.stat(caminho)
+                except OSError:
+                    continue
+                assinatura = (stat.st_size, stat.st_mtime_ns)
+                if self._lote_antigo(pasta, caminho, assinatura):
+                    continue
+                encontrados[caminho] = assinatura
+
+        novos = []
+        with self._lock:
+            for caminho, assinatura in encontrados.items():
+                if self._enfileirados.get(caminho) == assinatura or self._aguardando_nova_tentativa(caminho, assinatura):
+                    continue
+                # Só enfileira quando o arquivo não mudou entre duas varreduras (download concluído)
+                if self._observados.get(caminho) == assinatura and assinatura[0] > 0:
+                    self._enfileirados[caminho] = assinatura
+                    novos.append(caminho)
+            self._observados = encontrados
+
+        for caminho in novos:
+            logger.info(f"Lote enfileirado para separação: {caminho}")
+            self.fila.put(caminho)
+        return novos
+
+    def _worker(self):
+        while not self._parar.is_set():
+            try:
+                caminho = self.fila.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                relatorio = {}
+                resultado = separar_lote_xml(caminho, saidas=self.saidas, relatorio=relatorio)
+                if resultado is None or relatorio.get('falhas'):
+                    # Falha total ou parcial: nova tentativa após a espera
+                    # (o journal retoma a partir do primeiro bloco com falha)
+                    self._registrar_falha(caminho)
+                else:
+                    with self._lock:
+                        self._falhas.pop(caminho, None)
+            except Exception as e:
+                logger.error(f"Erro ao separar lote {caminho}: {e}")
+                self._registrar_falha(caminho)
+            finally:
+                self.fila.task_done()
+
+    def iniciar(self):
+        """Inicia as threads de processamento e a varredura periódica em background."""
+        self._parar.clear()
+        for i in range(self.max_concorrencia):
+            worker = threading.Thread(target=self._worker, name=f"ingestao-{i + 1}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+        observador = threading.Thread(target=self._loop_varredura, name="ingestao-varredura", daemon=True)
+        observador.start()
+        self._workers.append(observador)
+        logger.info(f"Serviço de ingestão iniciado em '{self.base_dir}' (intervalo: {self.intervalo}s, concorrência: {self.max_concorrencia}).")
+
+    def _loop_varredura(self):
+        while not self._parar.is_set():
+            try:
+                self.varrer()
+            except Exception as e:
+                logger.error(f"Erro na varredura de lotes: {e}")
+            self._parar.wait(self.intervalo)
+
+    def parar(self, timeout=None):
+        """Sinaliza o encerramento e aguarda as threads terminarem o lote em andamento."""
+        self._parar.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+        logger.info("Serviço de ingestão encerrado.")
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    parser = argparse.ArgumentParser(description="Observa as pastas YYYYMM e separa os lotes XML baixados.")
+    parser.add_argument("-d", "--base-dir", default=".", help="Diretório com as pastas mensais (padrão: atual).")
+    parser.add_argument("-i", "--intervalo", type=float, default=30.0, help="Segundos entre varreduras (padrão: 30).")
+    parser.add_argument("-c", "--concorrencia", type=int, default=2, help="Lotes separados simultaneamente (padrão: 2).")
+    parser.add_argument("-s", "--saidas", nargs='+', choices=SAIDAS_DISPONIVEIS,
+                        help="Saídas geradas por atendimento: xml, txt, rtf, ndjson, indice (padrão: SEPARACAO_SAIDAS ou xml txt indice).")
+    parser.add_argument("--todos", action="store_true",
+                        help="Separa também os lotes de meses anteriores ao início do serviço.")
+    args = parser.parse_args()
+
+    servico = IngestaoLotes(args.base_dir, args.intervalo, args.concorrencia, args.saidas, incluir_antigos=args.todos)
+    servico.iniciar()
+    try:
+        while True:
+            threading.Event().wait(3600)
+    except KeyboardInterrupt:
+        servico.parar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import logging
+import xml.etree.ElementTree as ET
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+logger = logging.getLogger(__name__)
+
+# Camada de leitura de XML: usa o lxml (libxml2, em C) quando instalado e o ElementTree da
+# biblioteca padrão caso contrário. XML_BACKEND=auto|lxml|stdlib (padrão: auto).
+#
+# Os dois entregam a mesma árvore para os lotes do portal (comentários e instruções de
+# processamento descartados, como no ElementTree), então textos, digests e registros extraídos
+# são idênticos. Elementos que serão reserializados (XML individual nos modos árvore/streaming)
+# continuam vindo do ElementTree, que é quem grava os arquivos.
+
+BACKEND_STDLIB = "stdlib"
+BACKEND_LXML = "lxml"
+BACKENDS_DISPONIVEIS = (BACKEND_STDLIB, BACKEND_LXML)
+
+TAGS_CABECALHO = ('NumeroLote', 'CodigoApoiado')
+TAG_RESULTADO = 'ct_Resultado_v1'
+
+class _BackendStdlib:
+    """xml.etree.ElementTree (sempre disponível)."""
+    nome = BACKEND_STDLIB
+    ErroParse = ET.ParseError
+
+    def parse(self, caminho):
+        """Retorna a raiz do documento."""
+        return ET.parse(caminho).getroot()
+
+    def iterparse(self, caminho, eventos=('end',)):
+        return ET.iterparse(caminho, events=eventos)
+
+    def fromstring(self, dados):
+        return ET.fromstring(dados)
+
+    def iterar_resultados(self, caminho, cabecalho):
+        """
+        Percorre em streaming os 'ct_Resultado_v1' de ListaResultados: cada um é entregue logo após
+        ser fechado e removido da árvore em seguida, mantendo o uso de memória constante.
+        Preenche 'cabecalho' com NumeroLote, CodigoApoiado (devem vir antes de ListaResultados, como
+        nos lotes do portal) e a presença de ListaResultados.
+        """
+        cabecalho['ListaResultados'] = False
+        nivel = 0
+        lista_resultados = None
+        lista_aberta = False
+        pendente = None
+
+        for evento, elem in ET.iterparse(caminho, events=('start', 'end')):
+            # O 'tail' de um elemento só é preenchido quando o parser chega ao evento seguinte,
+            # por isso o resultado é entregue um evento depois (mesma saída do modo tradicional).
+            if pendente is not None:
+                yield pendente
+                lista_resultados.remove(pendente)
+                pendente = None
+
+            if evento == 'start':
+                nivel += 1
+                if nivel == 2 and elem.tag == 'ListaResultados' and lista_resultados is None:
+                    lista_resultados = elem
+                    lista_aberta = True
+                    cabecalho['ListaResultados'] = True
+                continue
+
+            nivel -= 1
+            if nivel == 1:
+                if elem.tag in TAGS_CABECALHO and elem.tag not in cabecalho:
+                    cabecalho[elem.tag] = elem.text or ""
+                elif elem is lista_resultados:
+                    lista_aberta = False
+            elif nivel == 2 and lista_aberta and elem.tag == TAG_RESULTADO:
+                pendente = elem
+
+        if pendente is not None:
+            yield pendente
+            lista_resultados.remove(pendente)
+
+class _BackendLxml:
+    """lxml.etree, com as mesmas regras do ElementTree (sem comentários/PIs) e sem limite de tamanho de texto."""
+    nome = BACKEND_LXML
+
+    def __init__(self):
+        self.ErroParse = lxml_etree.XMLSyntaxError
+        self._parser = lxml_etree.XMLParser(remove_comments=True, remove_pis=True, huge_tree=True)
+
+    def parse(self, caminho):
+        return lxml_etree.parse(caminho, self._parser).getroot()
+
+    def iterparse(self, caminho, eventos=('end',)):
+        return lxml_etree.iterparse(caminho, events=eventos, remove_comments=True, remove_pis=True, huge_tree=True)
+
+    def fromstring(self, dados):
+        return lxml_etree.fromstring(dados, self._parser)
+
+    def iterar_resultados(self, caminho, cabecalho):
+        """
+        Mesmo contrato de _BackendStdlib.iterar_resultados, mas o filtro de tags roda dentro do
+        libxml2: o Python só recebe eventos do cabeçalho, de ListaResultados e dos 'ct_Resultado_v1'.
+        O 'tail' do resultado não é garantido (este leitor não é usado quando o elemento é reserializado).
+        """
+        cabecalho['ListaResultados'] = False
+        lista_resultados = None
+        eventos = lxml_etree.iterparse(
+            caminho, events=('start', 'end'), tag=(*TAGS_CABECALHO, 'ListaResultados', TAG_RESULTADO),
+            remove_comments=True, remove_pis=True, huge_tree=True,
+        )
+        for evento, elem in eventos:
+            pai = elem.getparent()
+            # Filho direto da raiz (nível 2), como no leitor padrão
+            filho_da_raiz = pai is not None and pai.getparent() is None
+            if evento == 'start':
+                if elem.tag == 'ListaResultados' and filho_da_raiz and lista_resultados is None:
+                    lista_resultados = elem
+                    cabecalho['ListaResultados'] = True
+                continue
+
+            if elem.tag == TAG_RESULTADO:
+                if lista_resultados is not None and pai is lista_resultados:
+                    yield elem
+                    lista_resultados.remove(elem)
+            elif elem.tag in TAGS_CABECALHO and filho_da_raiz and elem.tag not in cabecalho:
+                cabecalho[elem.tag] = elem.text or ""
+
+STDLIB = _BackendStdlib()
+LXML = _BackendLxml() if lxml_etree is not None else None
+
+# Exceções de XML malformado de qualquer backend (para blocos 'except')
+ERROS_PARSE = (ET.ParseError,) + ((lxml_etree.XMLSyntaxError,) if lxml_etree is not None else ())
+
+def obter_backend(nome=None):
+    """
+    Resolve o backend de leitura.
+
+    Args:
+        nome (str, opcional): 'auto', 'lxml' ou 'stdlib' (padrão: variável XML_BACKEND, ou 'auto').
+            'lxml' sem o pacote instalado volta para o ElementTree com um aviso.
+
+    Returns:
+        Objeto com parse(caminho) -> raiz, iterparse(caminho, eventos), fromstring(dados),
+        iterar_resultados(caminho, cabecalho) e ErroParse.
+    """
+    nome = (nome or os.environ.get("XML_BACKEND", "auto")).strip().lower()
+    if nome == BACKEND_STDLIB:
+        return STDLIB
+    if nome not in ("auto", BACKEND_LXML):
+        raise ValueError(f"Backend XML desconhecido: {nome} (disponíveis: auto, {', '.join(BACKENDS_DISPONIVEIS)})")
+    if LXML is not None:
+        return LXML
+    if nome == BACKEND_LXML:
+        logger.warning("lxml não instalado; usando xml.etree.ElementTree.")
+    return STDLIB
+
+def backends_instalados():
+    """Nomes dos backends disponíveis neste ambiente."""
+    return [backend.nome for backend in (STDLIB, LXML) if backend is not None]
@@ -0,0 +1,150 @@
+import sys
+import os
+
+# Adiciona o diretório raiz ao path para permitir imports absolutos (ex: from src.separacao ...)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import glob
+import time
+import argparse
+import logging
+from multiprocessing import Manager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.separacao import separar_lote_xml, SAIDAS_DISPONIVEIS
+from utils.tasy_client import TasyClient
+
+logger = logging.getLogger(__name__)
+
+PADRAO_LOTE = "lote_exames_*.xml"
+
+# Estado de cada processo worker (inicializado uma vez por processo)
+_client = None
+_cache_pacientes = None
+
+def listar_lotes(alvos):
+    """
+    Resolve diretórios (busca recursiva por 'lote_exames_*.xml') e padrões glob em uma lista
+    ordenada e sem repetições de arquivos de lote.
+    """
+    lotes = set()
+    for alvo in alvos:
+        if os.path.isdir(alvo):
+            lotes.update(glob.glob(os.path.join(alvo, "**", PADRAO_LOTE), recursive=True))
+        else:
+            lotes.update(caminho for caminho in glob.glob(alvo, recursive=True) if os.path.isfile(caminho))
+    return sorted(lotes)
+
+def _inicializar_worker(cache_pacientes, nivel_log):
+    """Cria um único TasyClient por processo e conecta o cache de pacientes compartilhado."""
+    global _client, _cache_pacientes
+    logging.basicConfig(level=nivel_log, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+    _client = TasyClient()
+    _cache_pacientes = cache_pacientes
+
+def _reprocessar_lote(caminho, opcoes):
+    inicio = time.perf_counter()
+    gerados = separar_lote_xml(
+        caminho,
+        client=_client,
+        cache_pacientes=_cache_pacientes,
+        **opcoes
+    )
+    return caminho, gerados, os.path.getsize(caminho), time.perf_counter() - inicio
+
+def reprocessar(lotes, processos=None, **opcoes):
+    """
+    Reprocessa uma lista de lotes distribuindo-os entre processos.
+
+    Cada processo reaproveita o próprio TasyClient; os dados de pacientes já consultados ficam em um
+    cache compartilhado entre os processos. O histórico (SQLite/WAL) recebe as atualizações de cada
+    lote em transações próprias, então processos concorrentes não sobrescrevem o trabalho uns dos outros.
+
+    Args:
+        lotes (list): Caminhos dos XMLs de lote.
+        processos (int, opcional): Quantidade de processos (padrão: número de CPUs).
+        **opcoes: Repassadas para separar_lote_xml (ex: ignorar_historico, pasta_saida, modo_rapido).
+
+    Returns:
+        dict: Relatório agregado (lotes, falhas, arquivos gerados, bytes lidos e tempos).
+    """
+    processos = max(1, min(processos or os.cpu_count() or 1, len(lotes) or 1))
+    relatorio = {"lotes": len(lotes), "falhas": 0, "arquivos": 0, "bytes": 0, "segundos": 0.0}
+    inicio = time.perf_counter()
+
+    with Manager() as manager:
+        cache = manager.dict()
+        nivel_log = logging.getLogger().getEffectiveLevel()
+        with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_worker,
+                                 initargs=(cache, nivel_log)) as pool:
+            tarefas = [pool.submit(_reprocessar_lote, caminho, opcoes) for caminho in lotes]
+            for concluidas, tarefa in enumerate(as_completed(tarefas), start=1):
+                try:
+                    caminho, gerados, tamanho, segundos = tarefa.result()
+                except Exception as e:
+                    logger.error(f"Erro ao reprocessar lote: {e}")
+                    relatorio["falhas"] += 1
+                    continue
+
+                if gerados is None:
+                    relatorio["falhas"] += 1
+                    logger.error(f"[{concluidas}/{len(lotes)}] Falha: {caminho}")
+                else:
+                    relatorio["arquivos"] += gerados
+                    logger.info(f"[{concluidas}/{len(lotes)}] {os.path.basename(caminho)}: {gerados} arquivos em {segundos:.1f}s")
+                relatorio["bytes"] += tamanho
+
+    relatorio["segundos"] = time.perf_counter() - inicio
+    return relatorio
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    parser = argparse.ArgumentParser(description="Reprocessa lotes XML arquivados em paralelo.")
+    parser.add_argument("alvos", nargs='+', help="Diretórios (busca recursiva por lote_exames_*.xml) ou padrões glob.")
+    parser.add_argument("-p", "--processos", type=int, help="Quantidade de processos (padrão: número de CPUs).")
+    parser.add_argument("-o", "--saida", help="Pasta para os XMLs individuais (padrão: a pasta de cada lote).")
+    parser.add_argument("-f", "--forcar", action="store_true", help="Reemite todos os atendimentos, ignorando histórico e journal.")
+    parser.add_argument("--modo-rapido", action="store_true", help="Copia os bytes originais de cada atendimento (mmap).")
+    parser.add_argument("-s", "--saidas", nargs='+', choices=SAIDAS_DISPONIVEIS,
+                        help="Saídas geradas por atendimento: xml, txt, rtf, ndjson, indice (padrão: SEPARACAO_SAIDAS ou xml txt indice).")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostra o log detalhado de cada lote.")
+    args = parser.parse_args()
+
+    lotes = listar_lotes(args.alvos)
+    if not lotes:
+        logger.error(f"Nenhum lote encontrado em: {', '.join(args.alvos)}")
+        sys.exit(1)
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        logger.setLevel(logging.INFO)
+
+    logger.info(f"Reprocessando {len(lotes)} lotes...")
+    relatorio = reprocessar(
+        lotes,
+        processos=args.processos,
+        ignorar_historico=args.forcar,
+        pasta_saida=args.saida,
+        modo_rapido=args.modo_rapido,
+        saidas=args.saidas,
+    )
+
+    segundos = max(relatorio["segundos"], 1e-9)
+    logger.info("=== RELATÓRIO DE REPROCESSAMENTO ===")
+    logger.info(f"Lotes: {relatorio['lotes']} ({relatorio['falhas']} com falha)")
+    logger.info(f"Arquivos gerados: {relatorio['arquivos']}")
+    logger.info(f"Tempo total: {relatorio['segundos']:.1f}s")
+    logger.info(f"Vazão: {relatorio['lotes'] / segundos:.2f} lotes/s | "
+                f"{relatorio['arquivos'] / segundos:.1f} arquivos/s | "
+                f"{relatorio['bytes'] / segundos / (1024 * 1024):.1f} MB/s")
+
+    if relatorio["falhas"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,130 +1,510 @@
 import os
+import re
+import mmap
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
 
-import json
-from src.cleaner import save_exam_txt
+from src.cleaner import save_exam_txt, arquivar_exam_txt
+from src.extracao import extrair_resultado
+from src.acervo import AcervoAnual, ACERVO_ATIVO
+from src.analitico import ExportadorAnalitico
+from src.indice import IndiceExames
+from src.leitor_xml import obter_backend, STDLIB
+from src.escrita import escrita_atomica
+from src.historico import HistoricoProcessados, calcular_digest, NOVO, ALTERADO
 from utils.tasy_client import TasyClient
+from xml_to_rtf import RTFConverter, formatar_resultado
 
 logger = logging.getLogger(__name__)
 
-HISTORY_FILE = "processed_exams.json"
+# Lotes a partir deste tamanho são separados em modo streaming (iterparse)
+LIMITE_STREAMING_BYTES = 50 * 1024 * 1024
 
-def load_history():
-    if os.path.exists(HISTORY_FILE):
+# Quantidade de atendimentos novos acumulados antes de cada consulta em lote ao Tasy.
+# Cada bloco também é a unidade de confirmação do journal: uma queda perde no máximo um bloco.
+TAMANHO_LOTE_ENRIQUECIMENTO = 1000
+
+# Threads dedicadas à serialização e gravação dos arquivos XML/TXT (pasta de rede: latência por arquivo)
+MAX_WORKERS_ESCRITA = int(os.environ.get("SEPARACAO_WORKERS", "4"))
+
+# Declaração gravada em todos os XMLs individuais (padrão de importação do Tasy)
+PROLOGO_XML = b'<?xml version="1.0" encoding="iso-8859-1"?>\n'
+
+# Saídas geradas por atendimento a partir da mesma leitura do lote (SEPARACAO_SAIDAS=xml,txt,rtf,ndjson,indice)
+SAIDA_XML = "xml"
+SAIDA_TXT = "txt"
+SAIDA_RTF = "rtf"
+SAIDA_NDJSON = "ndjson"
+SAIDA_INDICE = "indice"
+SAIDAS_DISPONIVEIS = (SAIDA_XML, SAIDA_TXT, SAIDA_RTF, SAIDA_NDJSON, SAIDA_INDICE)
+SAIDAS_PADRAO = tuple(
+    saida.strip() for saida in os.environ.get("SEPARACAO_SAIDAS", "xml,txt,indice").split(",") if saida.strip()
+)
+
+# Encodings de lote cujos bytes podem ser copiados sem recodificação para a saída ISO-8859-1
+ENCODINGS_BYTES_ORIGINAIS = ('iso-8859-1', 'iso8859-1', 'latin-1', 'latin1', 'us-ascii', 'ascii')
+
+def enriquecer_pacientes(client, atendimentos, cache=None):
+    """
+    Busca no Tasy, em lote, os dados dos pacientes dos atendimentos informados.
+    Retorna um dicionário {atendimento: dados_do_paciente}.
+
+    Se 'cache' (mapeamento compartilhado, ex: Manager().dict()) for informado, só as prescrições
+    ausentes dele são consultadas; prescrições sem paciente ficam registradas como None.
+    """
+    if not atendimentos:
+        return {}
+
+    pacientes = {}
+    pendentes = list(atendimentos)
+    if cache is not None:
+        pendentes = []
+        for atendimento in atendimentos:
+            if atendimento in cache:
+                if cache[atendimento] is not None:
+                    pacientes[atendimento] = cache[atendimento]
+            else:
+                pendentes.append(atendimento)
+
+    if pendentes:
         try:
-            with open(HISTORY_FILE, 'r') as f:
-                return set(json.load(f))
-        except:
-            return set()
-    return set()
+            logger.info(f"Buscando dados dos pacientes para {len(pendentes)} prescrições...")
+            encontrados = client.fetch_patients_by_prescriptions(pendentes)
+        except Exception as dh_err:
+            logger.error(f"Erro ao buscar dados dos pacientes: {dh_err}")
+            return pacientes
 
-def save_history(history):
-    try:
-        with open(HISTORY_FILE, 'w') as f:
-            json.dump(list(history), f)
-    except Exception as e:
-        logger.error(f"Erro ao salvar histórico: {e}")
+        pacientes.update(encontrados)
+        if cache is not None:
+            cache.update({atendimento: encontrados.get(atendimento) for atendimento in pendentes})
 
-def separar_lote_xml(caminho_arquivo):
+    for atendimento in atendimentos:
+        patient_data = pacientes.get(atendimento)
+        if patient_data:
+            logger.info(f"Dados do Paciente (Tasy) [{atendimento}]: {patient_data.get('NM_PESSOA_FISICA')} | CPF: {patient_data.get('NR_CPF')}")
+        else:
+            logger.warning(f"Paciente não encontrado no Tasy para prescrição {atendimento}.")
+
+    return pacientes
+
+# Abertura de ListaResultados em qualquer forma válida (com atributos, espaços ou vazia)
+PADRAO_LISTA_RESULTADOS = re.compile(rb'<ListaResultados(?=[\s/>])[^>]*>')
+
+def _iterar_resultados(caminho_arquivo, cabecalho, backend=STDLIB):
+    """
+    Carrega o lote inteiro em memória e retorna cada 'ct_Resultado_v1' de ListaResultados.
+    Preenche 'cabecalho' com NumeroLote, CodigoApoiado e a presença de ListaResultados.
+    """
+    # Carrega o XML mantendo o encoding original do laboratório
+    root = backend.parse(caminho_arquivo)
+
+    # Extrai metadados do cabeçalho para replicar nos novos arquivos
+    cabecalho['NumeroLote'] = root.findtext('NumeroLote')
+    cabecalho['CodigoApoiado'] = root.findtext('CodigoApoiado')
+
+    # Localiza a lista de resultados
+    lista_resultados = root.find('ListaResultados')
+    cabecalho['ListaResultados'] = lista_resultados is not None
+    if lista_resultados is None:
+        return
+
+    for resultado in lista_resultados.findall('ct_Resultado_v1'):
+        yield resultado, None
+
+def _iterar_resultados_streaming(caminho_arquivo, cabecalho, backend=STDLIB):
+    """
+    Versão incremental de _iterar_resultados (iterparse): cada 'ct_Resultado_v1' é entregue
+    logo após ser fechado e removido da árvore em seguida, mantendo o uso de memória constante.
+    O cabeçalho (NumeroLote/CodigoApoiado) deve vir antes de ListaResultados, como nos lotes do portal.
+    """
+    for resultado in backend.iterar_resultados(caminho_arquivo, cabecalho):
+        yield resultado, None
+
+def _lote_aceita_bytes_originais(caminho_arquivo):
+    """
+    Verifica se o lote pode usar o modo rápido: declaração em ISO-8859-1 (ou ASCII),
+    sem namespaces, que exigiriam reescrever os prefixos nos blocos copiados, e ListaResultados
+    escrita exatamente como '<ListaResultados>...</ListaResultados>', a forma que o mmap localiza.
+    Variações válidas (atributos, espaços na tag, lista vazia '<ListaResultados/>') vão para o leitor XML.
+    """
+    with open(caminho_arquivo, 'rb') as f:
+        inicio = f.read(4096)
+
+        declaracao = re.match(rb'\s*<\?xml[^>]*?encoding=["\']([A-Za-z0-9._-]+)["\']', inicio)
+        if not declaracao or declaracao.group(1).decode('ascii').lower() not in ENCODINGS_BYTES_ORIGINAIS:
+            return False
+        if b'xmlns' in inicio:
+            return False
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            abertura = PADRAO_LISTA_RESULTADOS.search(mm)
+            return (abertura is not None and abertura.group(0) == b'<ListaResultados>'
+                    and mm.rfind(b'</ListaResultados>') > abertura.start())
+
+def _iterar_resultados_mmap(caminho_arquivo, cabecalho, backend=STDLIB):
+    """
+    Modo rápido: localiza cada 'ct_Resultado_v1' por offset em um mapeamento do arquivo (mmap)
+    e entrega, junto com o elemento, os bytes originais do bloco, que são gravados sem reconstruir
+    nem recodificar o XML. Apenas o bloco de cada atendimento é convertido em elemento (chave,
+    digest e TXT); o lote nunca vira uma árvore em memória.
+    """
+    cabecalho['ListaResultados'] = False
+    with open(caminho_arquivo, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        inicio_lista = mm.find(b'<ListaResultados>')
+        fim_lista = mm.rfind(b'</ListaResultados>')
+        if inicio_lista == -1 or fim_lista < inicio_lista:
+            return
+        cabecalho['ListaResultados'] = True
+
+        # Cabeçalho do lote copiado byte a byte (NumeroLote e CodigoApoiado originais); o texto dos
+        # campos também vai para 'cabecalho', como nos outros modos (lote no NDJSON e no índice)
+        prefixo = mm[:inicio_lista]
+        campos = []
+        for tag in ('NumeroLote', 'CodigoApoiado'):
+            marca = tag.encode('ascii')
+            campo = re.search(rb'<%s\s*/>|<%s>.*?</%s>' % (marca, marca, marca), prefixo, re.S)
+            if campo:
+                campos.append(campo.group(0))
+                cabecalho[tag] = ET.fromstring(PROLOGO_XML + campo.group(0)).text or ""
+            else:
+                campos.append(b'<%s />' % marca)
+                cabecalho[tag] = None
+        cabecalho['prefixo_bruto'] = (
+            PROLOGO_XML + b'<ct_LoteResultados_v1>' + b''.join(campos) + b'<ListaResultados>'
+        )
+
+        abertura, fechamento = b'<ct_Resultado_v1', b'</ct_Resultado_v1>'
+        pos = inicio_lista
+        while True:
+            inicio = mm.find(abertura, pos, fim_lista)
+            if inicio == -1:
+                break
+            # Ignora tags que apenas começam com o mesmo nome (ex.: ct_Resultado_v10)
+            if mm[inicio + len(abertura):inicio + len(abertura) + 1] not in (b'>', b' ', b'\t', b'\r', b'\n'):
+                pos = inicio + len(abertura)
+                continue
+
+            fim = mm.find(fechamento, inicio, fim_lista)
+            if fim == -1:
+                raise ET.ParseError(f"Bloco ct_Resultado_v1 sem fechamento no offset {inicio}.")
+            fim += len(fechamento)
+
+            bruto = mm[inicio:fim]
+            yield backend.fromstring(PROLOGO_XML + bruto), bruto
+            pos = fim
+
+def _gravar_xml(resultado, cabecalho, caminho_saida, bruto=None):
+    """
+    Grava o XML individual do atendimento.
+    Quando 'bruto' é informado (modo rápido), o bloco original é copiado sem passar pelo ElementTree.
+    """
+    if bruto is not None:
+        with escrita_atomica(caminho_saida) as f:
+            f.write(cabecalho['prefixo_bruto'])
+            f.write(bruto)
+            f.write(b'</ListaResultados></ct_LoteResultados_v1>')
+        return
+
+    # Reconstrói a estrutura XML exigida
+    novo_root = ET.Element('ct_LoteResultados_v1')
+    ET.SubElement(novo_root, 'NumeroLote').text = cabecalho.get('NumeroLote')
+    ET.SubElement(novo_root, 'CodigoApoiado').text = cabecalho.get('CodigoApoiado')
+    nova_lista = ET.SubElement(novo_root, 'ListaResultados')
+
+    # Insere o bloco de dados do paciente/atendimento
+    nova_lista.append(resultado)
+
+    # Grava o arquivo com o cabeçalho ISO-8859-1
+    nova_tree = ET.ElementTree(novo_root)
+    with escrita_atomica(caminho_saida) as f:
+        f.write(PROLOGO_XML)
+        nova_tree.write(f, encoding="iso-8859-1", xml_declaration=False)
+
+def _gravar_atendimento(resultado, atendimento, cabecalho, caminho_saida, bruto=None, acervo=None,
+                        saidas=SAIDAS_PADRAO, coletores=()):
+    """
+    Distribui um atendimento para as saídas configuradas: XML individual, TXT limpo, RTF e dataset analítico.
+    O 'ct_Resultado_v1' é extraído uma única vez e o mesmo registro alimenta TXT, RTF e NDJSON.
+    Com 'acervo', o TXT vai para o pacote anual em vez de um arquivo solto em 'YYYY/'.
+    'coletores' são as saídas acumuladas por bloco (dataset analítico, índice de busca): recebem o registro
+    em adicionar() e só gravam em descarregar(), chamado pela separação antes de confirmar o bloco.
+    Falhas no XML ou no RTF são propagadas (o atendimento não entra no histórico); no TXT, apenas registradas.
+    """
+    if SAIDA_XML in saidas:
+        _gravar_xml(resultado, cabecalho, caminho_saida, bruto)
+
+    if SAIDA_TXT not in saidas and SAIDA_RTF not in saidas and not coletores:
+        return
+    registro = extrair_resultado(resultado)
+
+    # Geração do Arquivo TXT Limpo (Backup Anual)
+    if SAIDA_TXT in saidas:
+        try:
+            if acervo is not None:
+                arquivar_exam_txt(resultado, acervo, registro)
+            else:
+                current_year = datetime.now().strftime('%Y')
+                clean_dir = os.path.join(os.getcwd(), current_year)
+                save_exam_txt(resultado, clean_dir, registro)
+        except Exception as clean_err:
+            logger.error(f"Erro ao gerar TXT limpo para {atendimento}: {clean_err}")
+
+    # RTF para o prontuário: mesmo nome do XML individual, sem reler o arquivo gravado
+    if SAIDA_RTF in saidas:
+        linhas = formatar_resultado(registro)
+        if not linhas:
+            logger.warning(f"Atendimento {atendimento} sem conteúdo para RTF.")
+        else:
+            caminho_rtf = os.path.splitext(caminho_saida)[0] + ".rtf"
+            if not RTFConverter.create_file_streaming(["\n".join(linhas)], caminho_rtf):
+                raise IOError(f"Falha ao gravar {os.path.basename(caminho_rtf)}")
+
+    # Dataset analítico e índice de busca: só vão para o disco quando o bloco é confirmado
+    for coletor in coletores:
+        coletor.adicionar(registro, cabecalho.get('NumeroLote'))
+
+def _validar_saidas(saidas):
+    saidas = tuple(saidas) if saidas else SAIDAS_PADRAO
+    invalidas = [saida for saida in saidas if saida not in SAIDAS_DISPONIVEIS]
+    if invalidas:
+        raise ValueError(f"Saídas desconhecidas: {', '.join(invalidas)} (disponíveis: {', '.join(SAIDAS_DISPONIVEIS)})")
+    return saidas
+
+def separar_lote_xml(caminho_arquivo, streaming=None, workers=None, modo_rapido=False,
+                     client=None, cache_pacientes=None, ignorar_historico=False, pasta_saida=None,
+                     saidas=None, backend_xml=None, relatorio=None):
     """
     Realiza o parsing de um XML de lote e separa em arquivos individuais por atendimento.
-    Evita reprocessar atendimentos já salvos no histórico.
+    É o ponto de entrada único do pós-download: cada 'ct_Resultado_v1' é lido uma vez e alimenta
+    todas as saídas configuradas (XML individual, TXT limpo e RTF para o prontuário).
+    Evita reprocessar atendimentos já salvos no histórico: um atendimento só é emitido novamente
+    quando o digest do seu conteúdo mudou (resultado corrigido ou complementado pelo laboratório).
+
+    O progresso é confirmado a cada bloco de TAMANHO_LOTE_ENRIQUECIMENTO atendimentos (journal do
+    lote no histórico): se o processo cair, a próxima execução retoma do último bloco confirmado.
+    Os arquivos são gravados de forma atômica, então nunca há XML/TXT pela metade na pasta.
+
+    Args:
+        caminho_arquivo (str): Caminho do XML de lote baixado do portal.
+        streaming (bool, opcional): Usa o parsing incremental (iterparse), que não carrega o lote
+            inteiro em memória. Se omitido, é ativado para arquivos a partir de LIMITE_STREAMING_BYTES.
+        workers (int, opcional): Quantidade de threads de gravação dos arquivos (padrão: MAX_WORKERS_ESCRITA).
+            O histórico é sempre atualizado na ordem do lote, independente da ordem de término.
+        modo_rapido (bool): Copia os bytes originais de cada 'ct_Resultado_v1' para o XML individual
+            (mmap, sem reconstruir a árvore nem recodificar). Lotes incompatíveis (encoding diferente de
+            ISO-8859-1 ou com namespaces) voltam automaticamente ao modo tradicional/streaming.
+        client (TasyClient, opcional): Cliente reaproveitado entre chamadas (padrão: um novo por lote).
+        cache_pacientes (dict, opcional): Cache de enriquecimento compartilhado (ver enriquecer_pacientes).
+        ignorar_historico (bool): Reemite todos os atendimentos do lote, ignorando histórico e journal
+            (reprocessamento após mudança de formato). O histórico é atualizado normalmente.
+        pasta_saida (str, opcional): Pasta dos XMLs individuais (padrão: a mesma do lote).
+        saidas (iterable, opcional): Subconjunto de SAIDAS_DISPONIVEIS ('xml', 'txt', 'rtf', 'ndjson', 'indice');
+            padrão SAIDAS_PADRAO (variável SEPARACAO_SAIDAS, ou 'xml,txt,indice'). O RTF é gravado ao lado do XML.
+        backend_xml (str, opcional): Leitor XML ('auto', 'lxml', 'stdlib'; padrão: variável XML_BACKEND).
+            Nos modos árvore/streaming com saída 'xml', os elementos são reserializados e a leitura
+            fica sempre no ElementTree; no modo rápido os bytes originais são copiados com qualquer leitor.
+        relatorio (dict, opcional): Recebe 'falhas', a quantidade de atendimentos não gravados nesta
+            execução (o lote fica pendente no journal e deve ser tentado de novo).
+
+    Returns:
+        int: Quantidade de arquivos individuais gerados (0 se não havia nada novo), ou None em caso de falha.
     """
     if not caminho_arquivo or not os.path.exists(caminho_arquivo):
         logger.error(f"Arquivo não encontrado para separação: {caminho_arquivo}")
         return
 
+    saidas = _validar_saidas(saidas)
+
+    processed_ids = None
+    acervo = None
+    indice = None
+    coletores = []
     try:
-        # Inicializa cliente Tasy
-        logger.info("Inicializando cliente Tasy para enriquecimento de dados...")
-        client = TasyClient()
-        
-        # Carrega histórico de duplicatas
-        processed_ids = load_history()
+        # Abre o histórico de duplicatas (SQLite)
+        processed_ids = HistoricoProcessados()
         logger.info(f"Histórico carregado com {len(processed_ids)} atendimentos processados.")
 
-        # Carrega o XML mantendo o encoding original do laboratório
-        tree = ET.parse(caminho_arquivo)
-        root = tree.getroot()
-
-        # Extrai metadados do cabeçalho para replicar nos novos arquivos
-        numero_lote = root.findtext('NumeroLote')
-        codigo_apoiado = root.findtext('CodigoApoiado')
-        
-        # Localiza a lista de resultados
-        lista_resultados = root.find('ListaResultados')
-        if lista_resultados is None:
-            logger.warning("Nenhum resultado encontrado no XML para separação.")
-            return
+        # Journal do lote: identifica o arquivo pela versão (tamanho + mtime)
+        chave_lote = os.path.abspath(caminho_arquivo)
+        stat_lote = os.stat(caminho_arquivo)
+        assinatura = f"{stat_lote.st_size}:{stat_lote.st_mtime_ns}"
+        # O carimbo dos nomes de arquivo fica no journal: ao retomar, o bloco interrompido é regravado
+        # com os mesmos nomes (substituindo os arquivos) em vez de gerar cópias com outro carimbo.
+        retomar_de, concluido, sysdate = processed_ids.iniciar_lote(
+            chave_lote, assinatura, datetime.now().strftime("%Y%m%d%H%M%S"), reiniciar=ignorar_historico
+        )
+        if concluido:
+            logger.info(f"Lote já processado anteriormente: {os.path.basename(caminho_arquivo)}")
+            return 0
+        if retomar_de:
+            logger.info(f"Retomando lote interrompido a partir do registro #{retomar_de + 1}.")
+
+        # Acervo anual em pacotes para os TXTs limpos
+        if ACERVO_ATIVO and SAIDA_TXT in saidas:
+            acervo = AcervoAnual(os.path.join(os.getcwd(), datetime.now().strftime('%Y')), acumular=True)
+
+        # Dataset analítico (NDJSON por mês), com arquivos próprios desta execução
+        if SAIDA_NDJSON in saidas:
+            nome_lote = os.path.splitext(os.path.basename(caminho_arquivo))[0]
+            coletores.append(ExportadorAnalitico(nome=f"{nome_lote}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{os.getpid()}"))
+
+        # Índice de busca dos atendimentos recebidos (python -m src.indice)
+        if SAIDA_INDICE in saidas:
+            indice = IndiceExames()
+            coletores.append(indice)
+
+        # Inicializa cliente Tasy
+        if client is None:
+            logger.info("Inicializando cliente Tasy para enriquecimento de dados...")
+            client = TasyClient()
+
+        if pasta_saida is None:
+            pasta_saida = os.path.dirname(caminho_arquivo)
+        os.makedirs(pasta_saida or ".", exist_ok=True)
+
+        if streaming is None:
+            streaming = stat_lote.st_size >= LIMITE_STREAMING_BYTES
+
+        backend = obter_backend(backend_xml)
+        cabecalho = {}
+        if modo_rapido and _lote_aceita_bytes_originais(caminho_arquivo):
+            logger.info(f"Separação em modo rápido (mmap, bytes originais; leitor {backend.nome}).")
+            resultados = _iterar_resultados_mmap(caminho_arquivo, cabecalho, backend)
+        else:
+            if SAIDA_XML in saidas:
+                # O XML individual é gravado pelo ElementTree a partir do próprio elemento lido
+                backend = STDLIB
+            if streaming:
+                logger.info(f"Separação em modo streaming (iterparse; leitor {backend.nome}).")
+                resultados = _iterar_resultados_streaming(caminho_arquivo, cabecalho, backend)
+            else:
+                resultados = _iterar_resultados(caminho_arquivo, cabecalho, backend)
 
-        sysdate = datetime.now().strftime("%Y%m%d%H%M%S")
         count = 0
-        new_items = False
+        falhas = 0
+        # Posição já confirmada antes do bloco atual e, após uma falha, a do início do primeiro bloco com falha
+        inicio_bloco = retomar_de
+        pendente_desde = None
+        novos_resultados = {}
 
-        # Itera sobre cada registro de atendimento
-        for resultado in lista_resultados.findall('ct_Resultado_v1'):
-            atendimento = resultado.findtext('NumeroAtendimentoApoiado')
-            
-            if not atendimento:
-                continue
+        def processar_novos(pool, posicao, fim_do_lote=False):
+            nonlocal falhas, inicio_bloco, pendente_desde
+            falhas_bloco = 0
 
-            # Busca dados do paciente no Tasy (Enriquecimento)
-            try:
-                logger.info(f"Buscando dados do paciente para prescrição: {atendimento}...")
-                patient_data = client.fetch_patient_by_prescription(atendimento)
-                if patient_data:
-                    logger.info(f"Dados do Paciente (Tasy): {patient_data.get('NM_PESSOA_FISICA')} | CPF: {patient_data.get('NR_CPF')}")
-                else:
-                    logger.warning(f"Paciente não encontrado no Tasy para prescrição {atendimento}.")
-            except Exception as dh_err:
-                logger.error(f"Erro ao buscar dados do paciente: {dh_err}")
-
-            # Verificação de Duplicidade
-
-            if atendimento in processed_ids:
-                logger.info(f"Ignorando duplicado: {atendimento}")
-                continue
+            # Busca dados dos pacientes no Tasy em lote (Enriquecimento)
+            enriquecer_pacientes(client, list(novos_resultados), cache_pacientes)
 
-            # Reconstrói a estrutura XML exigida
-            novo_root = ET.Element('ct_LoteResultados_v1')
-            ET.SubElement(novo_root, 'NumeroLote').text = numero_lote
-            ET.SubElement(novo_root, 'CodigoApoiado').text = codigo_apoiado
-            nova_lista = ET.SubElement(novo_root, 'ListaResultados')
-            
-            # Insere o bloco de dados do paciente/atendimento
-            nova_lista.append(resultado)
-
-            # Define o nome do arquivo: Atendimento + Sysdate
-            nome_saida = f"{atendimento}_{sysdate}.xml"
-            caminho_saida = os.path.join(os.path.dirname(caminho_arquivo), nome_saida)
-            
-            # Grava o arquivo com o cabeçalho ISO-8859-1
-            nova_tree = ET.ElementTree(novo_root)
-            with open(caminho_saida, "wb") as f:
-                f.write(b'<?xml version="1.0" encoding="iso-8859-1"?>\n')
-                nova_tree.write(f, encoding="iso-8859-1", xml_declaration=False)
-            
-            # Atualiza memória e flag
-            processed_ids.add(atendimento)
-            count += 1
-            new_items = True
-            logger.info(f"Gerado: {nome_saida}")
-            
-            # Geração do Arquivo TXT Limpo (Backup Anual)
-            try:
-                current_year = datetime.now().strftime('%Y')
-                clean_dir = os.path.join(os.getcwd(), current_year)
-                save_exam_txt(resultado, clean_dir)
-            except Exception as clean_err:
-                logger.error(f"Erro ao gerar TXT limpo para {atendimento}: {clean_err}")
+            # Gravação concorrente dos arquivos do bloco
+            tarefas = []
+            for atendimento, (resultado, bruto, digest) in novos_resultados.items():
+                # Define o nome do arquivo: Atendimento + Sysdate
+                nome_saida = f"{atendimento}_{sysdate}.xml"
+                caminho_saida = os.path.join(pasta_saida, nome_saida)
+                tarefa = pool.submit(_gravar_atendimento, resultado, atendimento, cabecalho, caminho_saida, bruto,
+                                     acervo, saidas, coletores)
+                tarefas.append((atendimento, digest, nome_saida, tarefa))
+
+            # Consolida na ordem de envio para manter histórico e logs determinísticos
+            gerados = []
+            for atendimento, digest, nome_saida, tarefa in tarefas:
+                try:
+                    tarefa.result()
+                except Exception as write_err:
+                    logger.error(f"Erro ao gravar {nome_saida}: {write_err}")
+                    falhas_bloco += 1
+                    continue
+
+                gerados.append((atendimento, digest))
+                logger.info(f"Gerado: {nome_saida}")
+
+            # TXTs do bloco no acervo: uma transação e um fsync por bloco (falha no TXT é apenas registrada)
+            if acervo is not None:
+                try:
+                    acervo.descarregar()
+                except Exception as acervo_err:
+                    logger.error(f"Erro ao gravar TXTs limpos no acervo: {acervo_err}")
+
+            # Saídas acumuladas do bloco: sem o dataset analítico gravado, o bloco não entra no histórico.
+            # O índice de busca, como o TXT no acervo, é apenas registrado (recuperável com
+            # 'python -m src.indice --reindexar'), para não reemitir um bloco já entregue por causa dele.
+            for coletor in coletores:
+                try:
+                    coletor.descarregar()
+                except Exception as coletor_err:
+                    logger.error(f"Erro ao gravar {type(coletor).__name__}: {coletor_err}")
+                    if coletor is indice:
+                        continue
+                    falhas_bloco += len(gerados)
+                    gerados = []
+
+            # Confirma o bloco: histórico + journal na mesma transação. O journal nunca passa de um
+            # registro não gravado: após a primeira falha ele fica no início daquele bloco (os blocos
+            # seguintes entram no histórico e são reconhecidos como já emitidos ao retomar).
+            if falhas_bloco:
+                falhas += falhas_bloco
+                if pendente_desde is None:
+                    pendente_desde = inicio_bloco
+            confirmado = posicao if pendente_desde is None else pendente_desde
+            processed_ids.confirmar_bloco(gerados, chave_lote, assinatura, confirmado,
+                                          concluido=fim_do_lote and pendente_desde is None)
+            inicio_bloco = posicao
+            if gerados:
+                logger.info("Histórico atualizado.")
+
+            novos_resultados.clear()
+            return len(gerados)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers or MAX_WORKERS_ESCRITA)) as pool:
+            # Itera sobre cada registro de atendimento
+            posicao = 0
+            for posicao, (resultado, bruto) in enumerate(resultados, start=1):
+                # Registros já confirmados em uma execução anterior interrompida
+                if posicao <= retomar_de:
+                    continue
+
+                atendimento = resultado.findtext('NumeroAtendimentoApoiado')
+
+                if not atendimento:
+                    continue
+
+                # Verificação de Duplicidade (por conteúdo)
+                if atendimento in novos_resultados:
+                    logger.info(f"Ignorando duplicado: {atendimento}")
+                    continue
+
+                digest = calcular_digest(resultado)
+                situacao = NOVO if ignorar_historico else processed_ids.situacao(atendimento, digest)
+                if situacao == ALTERADO:
+                    logger.info(f"Resultado alterado pelo laboratório, reemitindo: {atendimento}")
+                elif situacao != NOVO:
+                    logger.info(f"Ignorando duplicado: {atendimento}")
+                    continue
+
+                novos_resultados[atendimento] = (resultado, bruto, digest)
+                if len(novos_resultados) >= TAMANHO_LOTE_ENRIQUECIMENTO:
+                    count += processar_novos(pool, posicao)
+
+            if not cabecalho.get('ListaResultados'):
+                logger.warning("Nenhum resultado encontrado no XML para separação.")
+                return 0
 
-        if new_items:
-            save_history(processed_ids)
-            logger.info("Histórico atualizado.")
+            count += processar_novos(pool, posicao, fim_do_lote=True)
 
+        if relatorio is not None:
+            relatorio['falhas'] = falhas
+        if falhas:
+            logger.warning(f"{falhas} atendimentos não gravados; o lote será retomado na próxima execução.")
         logger.info(f"Sucesso: {count} novos arquivos individuais criados.")
+        return count
 
     except Exception as e:
-        logger.error(f"Falha crítica na separação do XML: {e}")
\ No newline at end of file
+        logger.error(f"Falha crítica na separação do XML: {e}")
+    finally:
+        if acervo is not None:
+            acervo.fechar()
+        if indice is not None:
+            indice.fechar()
+        if processed_ids is not None:
+            processed_ids.fechar()
\ No newline at end of file
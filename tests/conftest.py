@@ -30,3 +30,11 @@ def temp_dir(tmp_path):
     d = tmp_path / "xml_test"
     d.mkdir()
     return d
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """Executa cada teste em um diretório próprio (histórico e pastas anuais)."""
+    work_dir = tmp_path / "cwd"
+    work_dir.mkdir()
+    monkeypatch.chdir(work_dir)
+    return work_dir
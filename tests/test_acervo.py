@@ -0,0 +1,93 @@
+import os
+from datetime import datetime
+from unittest.mock import patch
+
+from src.acervo import AcervoAnual, TIPO_LOTE, INDICE_DB
+from src.separacao import separar_lote_xml
+
+LOTE_COM_PROCEDIMENTO = """<?xml version="1.0" encoding="ISO-8859-1"?>
+<ct_LoteResultados_v1>
+    <NumeroLote>1</NumeroLote>
+    <ListaResultados>
+        <ct_Resultado_v1>
+            <NumeroAtendimentoApoiado>6790505</NumeroAtendimentoApoiado>
+            <ListaResultadoProcedimentos>
+                <ct_ResultadoProcedimentos_v1>
+                    <CodigoExameDB>MONOC</CodigoExameDB>
+                    <DescricaoMetodologia>AGLUTINAÇÃO</DescricaoMetodologia>
+                </ct_ResultadoProcedimentos_v1>
+            </ListaResultadoProcedimentos>
+        </ct_Resultado_v1>
+    </ListaResultados>
+</ct_LoteResultados_v1>"""
+
+def test_acervo_grava_le_e_substitui(tmp_path):
+    with AcervoAnual(str(tmp_path / "2026"), tamanho_max_pacote=40) as acervo:
+        acervo.adicionar("1001", "ATENDIMENTO: 1001\nHemácias")
+        acervo.adicionar("1002", "ATENDIMENTO: 1002")
+        acervo.adicionar("1001", "ATENDIMENTO: 1001\nreemitido")
+
+        assert acervo.ler("1001").decode("utf-8") == "ATENDIMENTO: 1001\nreemitido"
+        assert acervo.ler("9999") is None
+        assert "1002" in acervo
+        assert len(acervo) == 2
+
+    # Pacotes pequenos: cada registro passa do limite e abre um novo pacote
+    pacotes = sorted(f for f in os.listdir(tmp_path / "2026") if f.endswith(".pack"))
+    assert len(pacotes) > 1
+
+def test_acervo_reconstroi_indice_a_partir_dos_pacotes(tmp_path):
+    pasta = str(tmp_path / "2026")
+    with AcervoAnual(pasta, comprimir=False) as acervo:
+        acervo.adicionar("1001", "primeiro")
+        acervo.adicionar("1001", "segundo")
+        acervo.adicionar("lote_exames_1.xml", b"<ct_LoteResultados_v1/>", TIPO_LOTE)
+        acervo.conn.execute("DELETE FROM registros")
+
+        assert acervo.reconstruir_indice() == 3
+        assert acervo.ler("1001") == b"segundo"
+        assert acervo.ler("lote_exames_1.xml", TIPO_LOTE) == b"<ct_LoteResultados_v1/>"
+
+def test_acervo_exporta_e_importa_arquivos_soltos(tmp_path):
+    pasta = tmp_path / "2026"
+    pasta.mkdir()
+    (pasta / "1001.txt").write_text("ATENDIMENTO: 1001", encoding="utf-8")
+
+    with AcervoAnual(str(pasta)) as acervo:
+        assert acervo.importar_pasta(remover=True) == 1
+        assert not (pasta / "1001.txt").exists()
+
+        caminho = acervo.exportar("1001", str(tmp_path / "exportados"))
+        assert open(caminho, encoding="utf-8").read() == "ATENDIMENTO: 1001"
+
+def test_separar_lote_xml_arquiva_txt_no_acervo(temp_dir, isolated_cwd):
+    input_file = temp_dir / "lote.xml"
+    input_file.write_text(LOTE_COM_PROCEDIMENTO, encoding="iso-8859-1")
+
+    with patch('src.separacao.TasyClient'):
+        assert separar_lote_xml(str(input_file)) == 1
+
+    pasta_ano = isolated_cwd / datetime.now().strftime('%Y')
+    assert INDICE_DB in os.listdir(pasta_ano)
+    assert not [f for f in os.listdir(pasta_ano) if f.endswith(".txt")]
+    with AcervoAnual(str(pasta_ano)) as acervo:
+        assert "METODOLOGIA: AGLUTINAÇÃO" in acervo.ler("6790505").decode("utf-8")
+
+def test_acervo_acumulado_grava_por_bloco(tmp_path):
+    pasta = str(tmp_path / "2026")
+    with AcervoAnual(pasta, tamanho_max_pacote=60, acumular=True) as acervo:
+        for i in range(4):
+            acervo.adicionar(str(1000 + i), f"ATENDIMENTO: {1000 + i}")
+        assert len(acervo) == 0 and acervo.ler("1000") is None
+
+        with patch("src.acervo.os.fsync") as fsync:
+            acervo.descarregar()
+        assert len(acervo) == 4
+        assert [acervo.ler(str(1000 + i)).decode() for i in range(4)] == [f"ATENDIMENTO: {1000 + i}" for i in range(4)]
+        # Um fsync por pacote preenchido no bloco, não por registro
+        pacotes = sorted(f for f in os.listdir(pasta) if f.endswith(".pack"))
+        assert 1 < len(pacotes) and fsync.call_count == len(pacotes) < 4
+
+        acervo.adicionar("1004", "pendente ao fechar")
+    with AcervoAnual(pasta) as acervo:
+        assert acervo.ler("1004") == b"pendente ao fechar"
@@ -0,0 +1,96 @@
+import os
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+import xml.etree.ElementTree as ET
+
+from benchmarks.gerador_lote import gerar_lote
+from src.analitico import linhas_parametros, ler_dataset, ExportadorAnalitico
+from src.extracao import extrair_resultado
+from src.indice import IndiceExames
+from src.separacao import separar_lote_xml
+
+RESULTADO_XML = """<ct_Resultado_v1>
+    <NumeroAtendimentoApoiado>6790505</NumeroAtendimentoApoiado>
+    <ListaResultadoProcedimentos>
+        <ct_ResultadoProcedimentos_v1>
+            <CodigoExameDB>GLIC</CodigoExameDB>
+            <ListaResultadoTexto>
+                <ct_ResultadoTexto_v1>
+                    <DescricaoParametrosDB>Glicose</DescricaoParametrosDB>
+                    <ValorResultado>92</ValorResultado>
+                    <UnidadeMedida>mg/dL</UnidadeMedida>
+                </ct_ResultadoTexto_v1>
+            </ListaResultadoTexto>
+            <DataHoraLiberacaoClinica>23/01/2026 05:22:00</DataHoraLiberacaoClinica>
+        </ct_ResultadoProcedimentos_v1>
+        <ct_ResultadoProcedimentos_v1>
+            <CodigoExameDB>TSH</CodigoExameDB>
+            <ct_ResultadoTexto_v1><DescricaoParametrosDB>TSH</DescricaoParametrosDB></ct_ResultadoTexto_v1>
+        </ct_ResultadoProcedimentos_v1>
+    </ListaResultadoProcedimentos>
+</ct_Resultado_v1>"""
+
+def test_linhas_parametros_particiona_pela_liberacao():
+    registro = extrair_resultado(ET.fromstring(RESULTADO_XML))
+    linhas = linhas_parametros(registro, lote="999", processado_em=datetime(2026, 2, 10, 8, 0, 0))
+
+    (particao_glic, glic), (particao_tsh, tsh) = linhas
+    assert particao_glic == "2026-01"
+    assert glic["atendimento"] == "6790505" and glic["exame"] == "GLIC" and glic["valor"] == "92"
+    assert glic["liberado_em"] == "2026-01-23T05:22:00" and glic["lote"] == "999"
+    # Sem data de liberação: mês do processamento
+    assert particao_tsh == "2026-02" and tsh["liberado_em"] is None
+
+def test_exportador_so_grava_ao_descarregar(tmp_path):
+    exportador = ExportadorAnalitico(str(tmp_path), nome="execucao")
+    exportador.adicionar(extrair_resultado(ET.fromstring(RESULTADO_XML)))
+    assert list(ler_dataset(str(tmp_path))) == []
+
+    assert exportador.descarregar() == 2
+    assert [linha["parametro"] for linha in ler_dataset(str(tmp_path), meses=["2026-01"])] == ["Glicose"]
+
+def test_exportador_publica_particoes_do_bloco_juntas(tmp_path):
+    exportador = ExportadorAnalitico(str(tmp_path), nome="execucao")
+    registro = extrair_resultado(ET.fromstring(RESULTADO_XML))
+    exportador.adicionar(registro)
+
+    # Falha na segunda partição: a primeira, já gravada, não é publicada
+    with patch("src.analitico.os.fsync", side_effect=[None, OSError("disco cheio")]):
+        with pytest.raises(OSError):
+            exportador.descarregar()
+    assert list(ler_dataset(str(tmp_path))) == []
+    assert not [nome for _, _, nomes in os.walk(tmp_path) for nome in nomes if nome.endswith(".tmp")]
+
+    # Nova tentativa do bloco (ao retomar o lote): cada linha aparece uma única vez
+    exportador.adicionar(registro)
+    assert exportador.descarregar() == 2
+    assert sorted(linha["parametro"] for linha in ler_dataset(str(tmp_path))) == ["Glicose", "TSH"]
+
+def test_separar_lote_xml_exporta_dataset_analitico(temp_dir):
+    lote = gerar_lote(str(temp_dir / "lote_exames_1.xml"), 30, procedimentos=2)
+    esperado = sum(
+        len(proc.parametros)
+        for resultado in ET.parse(lote).getroot().iter('ct_Resultado_v1')
+        for proc in extrair_resultado(resultado).procedimentos
+    )
+
+    with patch("src.separacao.TasyClient"):
+        assert separar_lote_xml(lote, saidas=["ndjson"], pasta_saida=str(temp_dir / "saida")) == 30
+
+    linhas = list(ler_dataset())
+    assert len(linhas) == esperado
+    assert {linha["liberado_em"][:7] for linha in linhas} == {"2026-01"}
+
+def test_separar_lote_xml_modo_rapido_informa_o_lote(temp_dir):
+    lote = gerar_lote(str(temp_dir / "lote_exames_1.xml"), 5)
+    numero = ET.parse(lote).getroot().findtext("NumeroLote")
+
+    with patch("src.separacao.TasyClient"):
+        assert separar_lote_xml(lote, modo_rapido=True, saidas=["xml", "ndjson", "indice"],
+                                pasta_saida=str(temp_dir / "saida")) == 5
+
+    assert {linha["lote"] for linha in ler_dataset()} == {numero}
+    with IndiceExames() as indice:
+        documentos = indice.conn.execute("SELECT lote FROM documentos").fetchall()
+    assert documentos == [(numero,)] * 5
@@ -0,0 +1,39 @@
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+from benchmarks.gerador_lote import gerar_lote
+from benchmarks import run_benchmarks
+from benchmarks.run_benchmarks import executar_benchmarks
+
+def test_gerador_produz_lote_valido(tmp_path):
+    caminho = gerar_lote(str(tmp_path / "lote_exames_bench.xml"), 50, procedimentos=2)
+
+    root = ET.parse(caminho).getroot()
+    resultados = root.findall('.//ct_Resultado_v1')
+    assert root.tag == 'ct_LoteResultados_v1'
+    assert len(resultados) == 50
+    assert len({r.findtext('NumeroAtendimentoApoiado') for r in resultados}) == 50
+    assert all(len(r.findall('.//ct_ResultadoProcedimentos_v1')) == 2 for r in resultados)
+    # Texto acentuado sobrevive ao ISO-8859-1
+    assert any('Ç' in (p.findtext('DescricaoMetodologia') or '') for p in root.iter('ct_ResultadoProcedimentos_v1'))
+
+def test_executar_benchmarks_registra_metricas(tmp_path):
+    relatorio = executar_benchmarks([20], etapas=["separacao_rapida", "save_exam_txt"],
+                                    pasta_trabalho=str(tmp_path))
+
+    etapas = relatorio["lotes"][0]["etapas"]
+    assert etapas["separacao_rapida"]["itens"] == 20
+    assert etapas["separacao_rapida"]["pico_memoria_mb"] is not None
+    assert etapas["save_exam_txt"]["latencia_p95_ms"] >= etapas["save_exam_txt"]["latencia_p50_ms"]
+    # Nada do benchmark fica no diretório atual
+    assert not os.listdir(os.getcwd())
+
+def test_preset_grande_inclui_lote_de_100_mil(tmp_path, monkeypatch):
+    chamadas = []
+    monkeypatch.setattr(run_benchmarks, "executar_benchmarks", lambda tamanhos, **kwargs: chamadas.append(tamanhos) or {})
+    for argumentos in ([], ["--grande"]):
+        monkeypatch.setattr(sys, "argv", ["run_benchmarks", "-o", str(tmp_path / "saida.json"), *argumentos])
+        run_benchmarks.main()
+
+    assert chamadas == [[1000, 10000], [1000, 10000, 100000]]
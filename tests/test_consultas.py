@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from utils import consultas
+from utils.consultas import RegistroConsultas, normalizar_sql, extrair_binds
+
+SQL = """--03/02/2026
+--Resultados do paciente
+SELECT
+    to_char(RL.DT_COLETA,'DD/MM/YYYY HH24:MI') AS DATA_COLETA,
+    'a--b' AS TEXTO /* :IGNORADO */
+FROM RESULTADOS RL
+
+WHERE RL.CD_PESSOA_FISICA = :CD_PESSOA_FISICA --180927
+AND RL.NR_PRESCRICAO = :NR_PRESCRICAO
+AND RL.CD_PESSOA_FISICA <> :CD_PESSOA_FISICA;
+"""
+
+def test_normalizar_sql_preserva_literais_e_extrai_binds():
+    sql = normalizar_sql(SQL)
+
+    assert sql.startswith("SELECT\n")
+    assert "'DD/MM/YYYY HH24:MI'" in sql and "'a--b' AS TEXTO" in sql
+    assert "180927" not in sql and "IGNORADO" not in sql and not sql.endswith(";")
+    # ':MI' dentro do literal não é bind; binds repetidos aparecem uma vez
+    assert extrair_binds(sql) == ("CD_PESSOA_FISICA", "NR_PRESCRICAO")
+
+def test_registro_valida_parametros_e_recarrega_por_mtime(tmp_path):
+    arquivo = tmp_path / "Resultados.sql"
+    arquivo.write_text(SQL, encoding="utf-8")
+    registro = RegistroConsultas(str(tmp_path))
+
+    consulta = registro.obter("Resultados.sql")
+    assert registro.obter("Resultados") is consulta
+    assert registro.nomes() == ["Resultados"]
+    consulta.validar_parametros({"CD_PESSOA_FISICA": 1, "nr_prescricao": 2})
+    with pytest.raises(ValueError, match="sem valor: NR_PRESCRICAO"):
+        consulta.validar_parametros({"CD_PESSOA_FISICA": 1})
+    with pytest.raises(ValueError, match="inexistentes no SQL: ID_EXAME_ITEM"):
+        consulta.validar_parametros({"CD_PESSOA_FISICA": 1, "NR_PRESCRICAO": 2, "ID_EXAME_ITEM": 3})
+
+    arquivo.write_text("SELECT 1 FROM DUAL WHERE X = :X", encoding="utf-8")
+    os.utime(arquivo, ns=(consulta.mtime_ns + 10**9, consulta.mtime_ns + 10**9))
+    assert registro.obter("Resultados").binds == ("X",)
+
+    with pytest.raises(FileNotFoundError):
+        registro.obter("Inexistente.sql")
+
+def test_com_lista_in_memoriza_variante(tmp_path):
+    (tmp_path / "Pessoa.sql").write_text("SELECT * FROM PM WHERE PM.NR_PRESCRICAO = :NR_PRESCRICAO", encoding="utf-8")
+    registro = RegistroConsultas(str(tmp_path))
+
+    variante = registro.com_lista_in("Pessoa", "NR_PRESCRICAO", 2)
+    assert variante.sql.endswith("PM.NR_PRESCRICAO IN (:NR_PRESCRICAO_0, :NR_PRESCRICAO_1)")
+    assert variante.binds == ("NR_PRESCRICAO_0", "NR_PRESCRICAO_1")
+    assert registro.com_lista_in("Pessoa", "NR_PRESCRICAO", 2) is variante
+    with pytest.raises(ValueError):
+        registro.com_lista_in("Pessoa", "CD_PESSOA_FISICA", 2)
+
+def test_com_lista_in_usa_larguras_fixas_e_cache_limitado(tmp_path, monkeypatch):
+    arquivo = tmp_path / "Pessoa.sql"
+    arquivo.write_text("SELECT * FROM PM WHERE PM.NR_PRESCRICAO = :NR_PRESCRICAO", encoding="utf-8")
+    registro = RegistroConsultas(str(tmp_path))
+
+    # 3 valores usam a variante de 4 binds; acima de 512, o limite do Oracle
+    assert len(registro.com_lista_in("Pessoa", "NR_PRESCRICAO", 3).binds) == 4
+    assert registro.com_lista_in("Pessoa", "NR_PRESCRICAO", 4) is registro.com_lista_in("Pessoa", "NR_PRESCRICAO", 3)
+    assert len(registro.com_lista_in("Pessoa", "NR_PRESCRICAO", 600).binds) == 1000
+
+    # Variantes menos usadas saem do cache
+    monkeypatch.setattr(consultas, "MAX_DERIVADAS", 2)
+    uma = registro.com_lista_in("Pessoa", "NR_PRESCRICAO", 1)
+    registro.com_lista_in("Pessoa", "NR_PRESCRICAO", 2)
+    registro.com_lista_in("Pessoa", "NR_PRESCRICAO", 1)
+    registro.com_lista_in("Pessoa", "NR_PRESCRICAO", 8)
+    assert [chave[2] for chave in registro._derivadas] == [1, 8]
+    assert registro.com_lista_in("Pessoa", "NR_PRESCRICAO", 1) is uma
+
+    # Arquivo alterado: as variantes da versão anterior são descartadas
+    mtime_ns = registro.obter("Pessoa").mtime_ns + 10**9
+    os.utime(arquivo, ns=(mtime_ns, mtime_ns))
+    registro.obter("Pessoa")
+    assert not registro._derivadas
+
+def test_queries_do_projeto_carregam_com_binds():
+    registro = RegistroConsultas()
+    assert registro.obter("Resultado_Exame").binds == ("CD_PESSOA_FISICA", "ID_EXAME_ITEM", "NR_PRESCRICAO")
+    assert registro.obter("Resultados_Exames").binds == ("CD_PESSOA_FISICA",)
+    assert registro.obter("Pessoa_Fisica").binds == ("NR_PRESCRICAO",)
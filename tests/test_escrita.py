@@ -0,0 +1,25 @@
+import os
+import pytest
+from src.escrita import escrita_atomica
+
+def test_escrita_atomica_substitui_arquivo(temp_dir):
+    destino = temp_dir / "saida.txt"
+    destino.write_text("versão anterior", encoding="utf-8")
+
+    with escrita_atomica(str(destino), 'w', encoding='utf-8') as f:
+        f.write("versão nova")
+        # Durante a escrita o destino ainda tem a versão anterior completa
+        assert destino.read_text(encoding="utf-8") == "versão anterior"
+
+    assert destino.read_text(encoding="utf-8") == "versão nova"
+    assert os.listdir(temp_dir) == ["saida.txt"]
+
+def test_escrita_atomica_descarta_temporario_em_falha(temp_dir):
+    destino = temp_dir / "saida.xml"
+
+    with pytest.raises(RuntimeError):
+        with escrita_atomica(str(destino)) as f:
+            f.write(b"<parcial")
+            raise RuntimeError("falha no meio da gravação")
+
+    assert os.listdir(temp_dir) == []
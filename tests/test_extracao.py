@@ -0,0 +1,80 @@
+import xml.etree.ElementTree as ET
+
+from src.extracao import extrair_resultado, extrair_lote, ler_lote, Parametro
+from src.cleaner import save_exam_txt
+
+RESULTADO_XML = """<ct_Resultado_v1>
+    <NumeroAtendimentoApoiado>6790505</NumeroAtendimentoApoiado>
+    <NumeroAtendimentoDB>1384686346</NumeroAtendimentoDB>
+    <ListaResultadoProcedimentos>
+        <ct_ResultadoProcedimentos_v1>
+            <CodigoExameDB>MONOC</CodigoExameDB>
+            <DescricaoMetodologia>AGLUTINAÇÃO</DescricaoMetodologia>
+            <ListaResultadoTexto>
+                <ct_ResultadoTexto_v1>
+                    <DescricaoParametrosDB>MONONUCLEOSE</DescricaoParametrosDB>
+                    <ValorResultado>Não   reagente</ValorResultado>
+                    <UnidadeMedida/>
+                    <ValorReferencia>Não reagente
+Reagente</ValorReferencia>
+                </ct_ResultadoTexto_v1>
+            </ListaResultadoTexto>
+            <Observacao2>Segunda</Observacao2>
+            <Observacao1>Primeira</Observacao1>
+            <NomeLiberadorClinico>Dr. Teste</NomeLiberadorClinico>
+        </ct_ResultadoProcedimentos_v1>
+        <ct_ResultadoProcedimentos_v1>
+            <CodigoProcedimento>40301630</CodigoProcedimento>
+        </ct_ResultadoProcedimentos_v1>
+    </ListaResultadoProcedimentos>
+</ct_Resultado_v1>"""
+
+def test_extrair_resultado_registros_tipados():
+    registro = extrair_resultado(ET.fromstring(RESULTADO_XML))
+
+    assert registro.atendimento_apoiado == "6790505"
+    assert registro.atendimento_db == "1384686346"
+    assert len(registro.procedimentos) == 2
+
+    monoc, sem_exame = registro.procedimentos
+    assert monoc.codigo_exame == "MONOC"
+    assert monoc.metodologia == "AGLUTINAÇÃO"
+    # Mesma semântica de findtext: "" para tag vazia, None para tag ausente
+    assert monoc.parametros == (Parametro("MONONUCLEOSE", "Não   reagente", "", "Não reagente\nReagente"),)
+    # Observações seguem a numeração (Observacao1..5), não a ordem no XML
+    assert monoc.observacoes == ("Primeira", "Segunda")
+    assert monoc.data_liberacao is None
+
+    assert sem_exame.codigo_exame is None
+    assert sem_exame.codigo_procedimento == "40301630"
+    assert sem_exame.parametros == ()
+
+def test_save_exam_txt_usa_registro(tmp_path):
+    save_exam_txt(ET.fromstring(RESULTADO_XML), str(tmp_path))
+
+    linhas = (tmp_path / "6790505.txt").read_text(encoding="utf-8").split("\n")
+    assert linhas[0] == "ATENDIMENTO: 6790505"
+    assert "EXAME: MONOC" in linhas
+    assert "MONONUCLEOSE: Não reagente " in linhas
+    assert "Referência: Não reagente Reagente" in linhas
+    # Fallback para CodigoProcedimento quando não há CodigoExameDB
+    assert "EXAME: 40301630" in linhas
+
+def test_ler_lote_em_streaming_igual_a_arvore(tmp_path):
+    lote_xml = tmp_path / "lote.xml"
+    lote_xml.write_text(f"""<?xml version="1.0" encoding="ISO-8859-1"?>
+<ct_LoteResultados_v1>
+    <NumeroLote>770487</NumeroLote>
+    <CodigoApoiado>123</CodigoApoiado>
+    <ListaResultados>{RESULTADO_XML}{RESULTADO_XML.replace("6790505", "6790506")}</ListaResultados>
+</ct_LoteResultados_v1>""", encoding="iso-8859-1")
+
+    lote = ler_lote(str(lote_xml))
+    assert lote == extrair_lote(ET.parse(str(lote_xml)).getroot())
+    assert (lote.numero, lote.codigo_apoiado) == ("770487", "123")
+    assert [r.atendimento_apoiado for r in lote.resultados] == ["6790505", "6790506"]
+
+    # Textos categóricos repetidos entre atendimentos apontam para o mesmo objeto
+    primeiro, segundo = (r.procedimentos[0] for r in lote.resultados)
+    assert primeiro.metodologia is segundo.metodologia
+    assert primeiro.parametros[0].referencia is segundo.parametros[0].referencia
@@ -0,0 +1,51 @@
+import json
+import pytest
+import xml.etree.ElementTree as ET
+from src.historico import HistoricoProcessados, calcular_digest, NOVO, INALTERADO, ALTERADO
+
+def test_historico_adiciona_e_consulta(tmp_path):
+    with HistoricoProcessados(str(tmp_path / "hist.db"), caminho_json=None) as historico:
+        historico.adicionar([("A1", "d1"), ("A2", "d2")])
+        historico.adicionar([("A2", "d2"), ("A3", "d3")])
+
+        assert "A1" in historico
+        assert "A9" not in historico
+        assert len(historico) == 3
+
+def test_historico_persiste_entre_aberturas(tmp_path):
+    db = str(tmp_path / "hist.db")
+    with HistoricoProcessados(db, caminho_json=None) as historico:
+        historico.adicionar([("A1", None)])
+
+    with HistoricoProcessados(db, caminho_json=None) as historico:
+        assert "A1" in historico
+
+def test_historico_migra_json_uma_vez(tmp_path):
+    legado = tmp_path / "processed_exams.json"
+    legado.write_text(json.dumps(["6790505", "6791908"]))
+
+    with HistoricoProcessados(str(tmp_path / "hist.db"), caminho_json=str(legado)) as historico:
+        assert "6790505" in historico
+        assert len(historico) == 2
+
+    assert not legado.exists()
+    assert (tmp_path / "processed_exams.json.migrado").exists()
+
+def test_historico_situacao_por_digest(tmp_path):
+    with HistoricoProcessados(str(tmp_path / "hist.db"), caminho_json=None) as historico:
+        historico.adicionar([("A1", "d1"), ("LEGADO", None)])
+
+        assert historico.situacao("A9", "x") == NOVO
+        assert historico.situacao("A1", "d1") == INALTERADO
+        assert historico.situacao("A1", "d2") == ALTERADO
+        # Registro legado adota o primeiro digest visto como referência
+        assert historico.situacao("LEGADO", "d5") == INALTERADO
+        assert historico.situacao("LEGADO", "d6") == ALTERADO
+
+def test_calcular_digest_ignora_formatacao():
+    a = ET.fromstring("<ct_Resultado_v1><Valor>10</Valor></ct_Resultado_v1>")
+    b = ET.fromstring("<ct_Resultado_v1>\n    <Valor>10</Valor>\n</ct_Resultado_v1>")
+    c = ET.fromstring("<ct_Resultado_v1><Valor>11</Valor></ct_Resultado_v1>")
+
+    assert calcular_digest(a) == calcular_digest(b)
+    assert calcular_digest(a) != calcular_digest(c)
@@ -0,0 +1,112 @@
+import sqlite3
+from unittest.mock import patch
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from src.extracao import extrair_resultado
+from src.indice import IndiceExames, INDICE_DB, reindexar, termos
+from src.separacao import separar_lote_xml
+
+def _registro(atendimento, exame, metodologia, parametro):
+    return extrair_resultado(ET.fromstring(f"""<ct_Resultado_v1>
+    <NumeroAtendimentoApoiado>{atendimento}</NumeroAtendimentoApoiado>
+    <NumeroAtendimentoDB>99{atendimento}</NumeroAtendimentoDB>
+    <ListaResultadoProcedimentos>
+        <ct_ResultadoProcedimentos_v1>
+            <CodigoExameDB>{exame}</CodigoExameDB>
+            <DescricaoMetodologia>{metodologia}</DescricaoMetodologia>
+            <ListaResultadoTexto>
+                <ct_ResultadoTexto_v1><DescricaoParametrosDB>{parametro}</DescricaoParametrosDB></ct_ResultadoTexto_v1>
+            </ListaResultadoTexto>
+        </ct_ResultadoProcedimentos_v1>
+    </ListaResultadoProcedimentos>
+</ct_Resultado_v1>"""))
+
+def test_termos_normaliza_acentos_e_caixa():
+    assert termos("HETERÓFILOS (Paul-Bunnell)") == ["heterofilos", "paul", "bunnell"]
+    assert termos(None) == []
+
+def test_indice_busca_por_termo_campo_e_prefixo(tmp_path):
+    with IndiceExames(str(tmp_path / "indice.db")) as indice:
+        indice.adicionar(_registro("1001", "GLIC", "ENZIMÁTICO", "Glicose"), lote="10")
+        indice.adicionar(_registro("1002", "MONOC", "AGLUTINAÇÃO", "Mononucleose"), lote="10")
+        assert indice.descarregar() == 2
+
+        assert [r["atendimento"] for r in indice.buscar("glicose")] == ["1001"]
+        assert [r["atendimento"] for r in indice.buscar("aglutinacao")] == ["1002"]
+        assert indice.buscar("991002")[0]["exames"] == "MONOC"
+        assert [r["atendimento"] for r in indice.buscar("exame:mon*")] == ["1002"]
+        # Termos combinados: E lógico
+        assert indice.buscar("glic mononucleose") == []
+        # 'glic' é código de exame, não parâmetro
+        assert indice.buscar("parametro:glic") == []
+        with pytest.raises(ValueError):
+            indice.buscar("paciente:1001")
+
+def test_indice_substitui_atendimento_reemitido(tmp_path):
+    with IndiceExames(str(tmp_path / "indice.db")) as indice:
+        indice.adicionar(_registro("1001", "GLIC", "ENZIMÁTICO", "Glicose"), lote="10")
+        indice.descarregar()
+        indice.adicionar(_registro("1001", "TSH", "QUIMIOLUMINESCÊNCIA", "TSH"), lote="11")
+        indice.descarregar()
+
+        assert len(indice) == 1
+        assert indice.buscar("glicose") == []
+        assert indice.buscar("tsh")[0]["lote"] == "11"
+
+def test_separar_lote_xml_indexa_atendimentos(temp_dir, isolated_cwd):
+    input_file = temp_dir / "lote.xml"
+    input_file.write_text("""<?xml version="1.0" encoding="ISO-8859-1"?>
+<ct_LoteResultados_v1>
+    <NumeroLote>7</NumeroLote>
+    <ListaResultados>
+        <ct_Resultado_v1>
+            <NumeroAtendimentoApoiado>6790505</NumeroAtendimentoApoiado>
+            <ListaResultadoProcedimentos>
+                <ct_ResultadoProcedimentos_v1>
+                    <CodigoExameDB>MONOC</CodigoExameDB>
+                    <DescricaoMetodologia>AGLUTINAÇÃO</DescricaoMetodologia>
+                </ct_ResultadoProcedimentos_v1>
+            </ListaResultadoProcedimentos>
+        </ct_Resultado_v1>
+    </ListaResultados>
+</ct_LoteResultados_v1>""", encoding="iso-8859-1")
+
+    with patch('src.separacao.TasyClient'):
+        assert separar_lote_xml(str(input_file)) == 1
+
+    with IndiceExames(str(isolated_cwd / INDICE_DB)) as indice:
+        (encontrado,) = indice.buscar("monoc aglutinação")
+    assert encontrado["atendimento"] == "6790505"
+    assert encontrado["lote"] == "7"
+
+def test_falha_no_indice_nao_reemite_o_bloco(temp_dir, sample_xml_content):
+    input_file = temp_dir / "lote.xml"
+    input_file.write_text(sample_xml_content, encoding="iso-8859-1")
+
+    relatorio = {}
+    with patch('src.separacao.TasyClient'), \
+         patch.object(IndiceExames, 'descarregar', side_effect=sqlite3.OperationalError("database is locked")):
+        assert separar_lote_xml(str(input_file), relatorio=relatorio) == 2
+    # Bloco confirmado: o índice é recuperado com a reindexação, sem regravar os XMLs
+    assert relatorio == {"falhas": 0}
+    with patch('src.separacao.TasyClient'):
+        assert separar_lote_xml(str(input_file)) == 0
+
+def test_reindexar_a_partir_dos_lotes_das_pastas_mensais(tmp_path, sample_xml_content):
+    pasta = tmp_path / "202601"
+    pasta.mkdir()
+    (pasta / "lote_exames_20260101_080000.xml").write_text(sample_xml_content, encoding="iso-8859-1")
+    (pasta / "lote_exames_20260102_080000.xml").write_text(
+        sample_xml_content.replace("12345", "12346").replace("ATEND01", "ATEND03"), encoding="iso-8859-1")
+    (pasta / "ATEND01_20260101080000.xml").write_text("<ct_Resultado_v1/>")
+
+    caminho = str(tmp_path / "indice.db")
+    assert reindexar(str(tmp_path), caminho) == 4
+
+    with IndiceExames(caminho) as indice:
+        assert len(indice) == 3
+        # Lote mais recente prevalece para o atendimento repetido
+        assert indice.buscar("atend02")[0]["lote"] == "12346"
+        assert indice.buscar("atend01")[0]["lote"] == "12345"
@@ -0,0 +1,134 @@
+import os
+import pytest
+import threading
+import time
+from datetime import datetime
+from unittest.mock import patch
+from src.historico import HistoricoProcessados
+from src.ingestao import IngestaoLotes, MAX_TENTATIVAS, ESPERA_MAXIMA
+
+MES_ATUAL = datetime.now().strftime('%Y%m')
+
+def _criar_lote(pasta, nome, conteudo="<ct_LoteResultados_v1/>"):
+    pasta.mkdir(exist_ok=True)
+    caminho = pasta / nome
+    caminho.write_text(conteudo)
+    return str(caminho)
+
+def test_varrer_enfileira_lotes_estaveis(tmp_path):
+    lote = _criar_lote(tmp_path / MES_ATUAL, "lote_exames_20260201_080000.xml")
+    _criar_lote(tmp_path / MES_ATUAL, "outro_arquivo.xml")
+    _criar_lote(tmp_path / "backup", "lote_exames_20260201_090000.xml")
+
+    servico = IngestaoLotes(str(tmp_path))
+
+    # Primeira varredura apenas observa; o lote entra na fila quando o tamanho não muda
+    assert servico.varrer() == []
+    assert servico.varrer() == [lote]
+    assert servico.varrer() == []
+    assert servico.fila.qsize() == 1
+
+def test_varrer_ignora_lote_em_download(tmp_path):
+    pasta = tmp_path / MES_ATUAL
+    lote = _criar_lote(pasta, "lote_exames_20260201_080000.xml", "<ct_Lote")
+
+    servico = IngestaoLotes(str(tmp_path))
+    servico.varrer()
+    _criar_lote(pasta, "lote_exames_20260201_080000.xml", "<ct_LoteResultados_v1/>")
+
+    assert servico.varrer() == []
+    assert servico.varrer() == [lote]
+
+def _executar_worker(servico, **kwargs):
+    """Processa a fila atual do serviço com separar_lote_xml simulado."""
+    with patch("src.ingestao.separar_lote_xml", **kwargs) as mock_separar:
+        servico._parar.clear()
+        worker = threading.Thread(target=servico._worker, daemon=True)
+        worker.start()
+        servico.fila.join()
+        servico._parar.set()
+        worker.join()
+    return mock_separar
+
+def _depois_da_espera(servico, segundos):
+    """Varredura como se 'segundos' tivessem passado (espera entre tentativas)."""
+    agora = time.monotonic()
+    with patch("src.ingestao.time.monotonic", return_value=agora + segundos):
+        return servico.varrer()
+
+def test_worker_libera_lote_com_falha_para_nova_tentativa(tmp_path):
+    lote = _criar_lote(tmp_path / MES_ATUAL, "lote_exames_20260201_080000.xml")
+    servico = IngestaoLotes(str(tmp_path), intervalo=10, max_concorrencia=1)
+    servico.varrer()
+    servico.varrer()
+
+    mock_separar = _executar_worker(servico, return_value=None)
+
+    mock_separar.assert_called_once_with(lote, saidas=None, relatorio={})
+    # O lote só volta para a fila depois da espera (10s na primeira falha, 20s na segunda)
+    assert servico.varrer() == []
+    assert _depois_da_espera(servico, 11) == [lote]
+
+    _executar_worker(servico, return_value=None)
+    assert _depois_da_espera(servico, 11) == []
+    assert _depois_da_espera(servico, 21) == [lote]
+
+def test_worker_libera_lote_com_falhas_parciais(tmp_path):
+    lote = _criar_lote(tmp_path / MES_ATUAL, "lote_exames_20260201_080000.xml")
+    servico = IngestaoLotes(str(tmp_path), intervalo=10, max_concorrencia=1)
+    servico.varrer()
+    servico.varrer()
+
+    def separar_com_falha(caminho, saidas=None, relatorio=None):
+        relatorio['falhas'] = 1
+        return 3
+
+    _executar_worker(servico, side_effect=separar_com_falha)
+
+    assert _depois_da_espera(servico, 11) == [lote]
+
+    # Sucesso na nova tentativa zera a contagem de falhas
+    _executar_worker(servico, return_value=3)
+    assert servico._falhas == {}
+
+def test_worker_estaciona_lote_apos_max_tentativas(tmp_path, caplog):
+    pasta = tmp_path / MES_ATUAL
+    lote = _criar_lote(pasta, "lote_exames_20260201_080000.xml")
+    servico = IngestaoLotes(str(tmp_path), intervalo=1, max_concorrencia=1)
+    servico.varrer()
+    servico.varrer()
+
+    for tentativa in range(MAX_TENTATIVAS):
+        if tentativa:
+            assert _depois_da_espera(servico, ESPERA_MAXIMA) == [lote]
+        _executar_worker(servico, side_effect=RuntimeError("falha"))
+
+    # Estacionado: não volta para a fila, por mais tempo que passe, e o ERROR é registrado uma vez
+    assert _depois_da_espera(servico, 10 * ESPERA_MAXIMA) == []
+    assert _depois_da_espera(servico, 20 * ESPERA_MAXIMA) == []
+    estacionados = [r for r in caplog.records if r.levelname == "ERROR" and "até o arquivo mudar" in r.getMessage()]
+    assert len(estacionados) == 1
+
+    # Nova versão do arquivo recomeça as tentativas
+    _criar_lote(pasta, "lote_exames_20260201_080000.xml", "<ct_LoteResultados_v1></ct_LoteResultados_v1>")
+    assert servico.varrer() == []
+    assert servico.varrer() == [lote]
+
+def test_varrer_ignora_lotes_antigos_exceto_pendentes(tmp_path):
+    antigo = _criar_lote(tmp_path / "202001", "lote_exames_20200101_080000.xml")
+    pendente = _criar_lote(tmp_path / "202001", "lote_exames_20200102_080000.xml")
+    with HistoricoProcessados() as historico:
+        historico.iniciar_lote(os.path.abspath(pendente), "assinatura", "20200102080000")
+
+    servico = IngestaoLotes(str(tmp_path))
+    servico.varrer()
+    assert servico.varrer() == [pendente]
+
+    # Lote antigo alterado depois do início do serviço (ex: copiado de novo) volta a ser considerado
+    os.utime(antigo, ns=(servico._inicio_ns + 10**9, servico._inicio_ns + 10**9))
+    servico.varrer()
+    assert servico.varrer() == [antigo]
+
+    todos = IngestaoLotes(str(tmp_path), incluir_antigos=True)
+    todos.varrer()
+    assert todos.varrer() == [antigo, pendente]
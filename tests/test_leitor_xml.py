@@ -0,0 +1,67 @@
+import os
+import re
+import hashlib
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.gerador_lote import gerar_lote
+from src import leitor_xml
+from src.extracao import ler_lote
+from src.leitor_xml import obter_backend, STDLIB
+from src.separacao import separar_lote_xml
+
+def test_obter_backend_volta_para_stdlib_sem_lxml():
+    with patch.object(leitor_xml, "LXML", None):
+        assert obter_backend("lxml") is STDLIB
+        assert obter_backend("auto") is STDLIB
+    assert obter_backend("stdlib") is STDLIB
+    with pytest.raises(ValueError):
+        obter_backend("expat")
+
+def test_iterar_resultados_ignora_comentarios_e_blocos_fora_da_lista(tmp_path):
+    caminho = tmp_path / "lote.xml"
+    caminho.write_text("""<?xml version="1.0" encoding="ISO-8859-1"?>
+<ct_LoteResultados_v1>
+    <NumeroLote>12</NumeroLote>
+    <ListaResultados>
+        <!-- comentário do portal -->
+        <ct_Resultado_v1><NumeroAtendimentoApoiado>1</NumeroAtendimentoApoiado></ct_Resultado_v1>
+        <Outro><ct_Resultado_v1><NumeroAtendimentoApoiado>X</NumeroAtendimentoApoiado></ct_Resultado_v1></Outro>
+        <ct_Resultado_v1><NumeroAtendimentoApoiado>2</NumeroAtendimentoApoiado></ct_Resultado_v1>
+    </ListaResultados>
+</ct_LoteResultados_v1>""", encoding="iso-8859-1")
+
+    for backend in leitor_xml.backends_instalados():
+        cabecalho = {}
+        ids = [r.findtext('NumeroAtendimentoApoiado')
+               for r in obter_backend(backend).iterar_resultados(str(caminho), cabecalho)]
+        assert ids == ["1", "2"]
+        assert cabecalho == {"ListaResultados": True, "NumeroLote": "12"}
+
+def _conteudo(pasta):
+    # Nomes sem o carimbo de data/hora da separação (atendimento_YYYYmmddHHMMSS.xml)
+    return sorted(
+        (re.sub(r'_\d{14}(?=\.)', '', os.path.relpath(os.path.join(raiz, nome), pasta)), hashlib.sha256(open(os.path.join(raiz, nome), 'rb').read()).hexdigest())
+        for raiz, _, arquivos in os.walk(pasta) for nome in arquivos
+        if not nome.endswith(('.db', '-wal', '-shm'))
+    )
+
+@pytest.mark.parametrize("modo", [{"modo_rapido": True}, {"streaming": True}, {"streaming": False}])
+def test_lxml_gera_saidas_identicas(tmp_path, monkeypatch, modo):
+    pytest.importorskip("lxml")
+    # TXTs soltos: a ordem dos registros nos pacotes do acervo depende das threads de gravação
+    monkeypatch.setattr('src.separacao.ACERVO_ATIVO', False)
+    lote = gerar_lote(str(tmp_path / "lote.xml"), 30)
+    assert ler_lote(lote, "lxml") == ler_lote(lote, "stdlib")
+
+    saidas = {}
+    for backend in ("stdlib", "lxml"):
+        pasta = tmp_path / backend
+        pasta.mkdir()
+        monkeypatch.chdir(pasta)
+        with patch('src.separacao.TasyClient'):
+            assert separar_lote_xml(lote, pasta_saida=str(pasta / "saida"), saidas=["xml", "txt", "rtf"],
+                                    backend_xml=backend, **modo) == 30
+        saidas[backend] = _conteudo(str(pasta))
+    assert saidas["lxml"] == saidas["stdlib"]
@@ -0,0 +1,36 @@
+import os
+import pytest
+from src.reprocessamento import listar_lotes, reprocessar
+
+def _criar_lote(caminho, sample_xml_content):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "w", encoding="iso-8859-1") as f:
+        f.write(sample_xml_content)
+    return str(caminho)
+
+def test_listar_lotes_diretorio_e_glob(temp_dir, sample_xml_content):
+    a = _criar_lote(temp_dir / "2026" / "lote_exames_20260101_080000.xml", sample_xml_content)
+    b = _criar_lote(temp_dir / "202602" / "lote_exames_20260201_080000.xml", sample_xml_content)
+    _criar_lote(temp_dir / "2026" / "ATEND01_20260101080000.xml", sample_xml_content)
+
+    assert listar_lotes([str(temp_dir)]) == [a, b]
+    assert listar_lotes([str(temp_dir / "2026" / "*.xml"), str(temp_dir)]) == sorted([
+        a, b, str(temp_dir / "2026" / "ATEND01_20260101080000.xml")
+    ])
+
+def test_reprocessar_forcado_reemite_lotes(temp_dir, sample_xml_content):
+    lotes = [
+        _criar_lote(temp_dir / "2026" / "lote_exames_20260101_080000.xml", sample_xml_content),
+        _criar_lote(temp_dir / "2026" / "lote_exames_20260102_080000.xml",
+                    sample_xml_content.replace("ATEND0", "ATEND1")),
+    ]
+    saida = temp_dir / "saida"
+
+    relatorio = reprocessar(lotes, processos=2, pasta_saida=str(saida))
+    assert relatorio["lotes"] == 2
+    assert relatorio["falhas"] == 0
+    assert relatorio["arquivos"] == 4
+
+    # Sem forçar, nada muda; forçando, todos os atendimentos são reemitidos
+    assert reprocessar(lotes, processos=2, pasta_saida=str(saida))["arquivos"] == 0
+    assert reprocessar(lotes, processos=2, pasta_saida=str(saida), ignorar_historico=True)["arquivos"] == 4
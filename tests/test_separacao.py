@@ -1,7 +1,11 @@
 import os
 import pytest
+from unittest.mock import patch
+from src import separacao
 from src.separacao import separar_lote_xml
+from src.historico import HistoricoProcessados
 import xml.etree.ElementTree as ET
+from datetime import datetime
 
 def test_separar_lote_xml_cria_arquivos(temp_dir, sample_xml_content):
     # Cria o arquivo XML de entrada
@@ -31,3 +35,250 @@ def test_separar_lote_xml_cria_arquivos(temp_dir, sample_xml_content):
 def test_separar_lote_xml_arquivo_inexistente(caplog):
     separar_lote_xml("arquivo_que_nao_existe.xml")
     assert "Arquivo não encontrado para separação" in caplog.text
+
+def test_separar_lote_xml_enriquece_apenas_novos(temp_dir, sample_xml_content):
+    input_file = temp_dir / "lote.xml"
+    with open(input_file, "w", encoding="iso-8859-1") as f:
+        f.write(sample_xml_content)
+
+    with patch("src.separacao.TasyClient") as mock_client_cls:
+        client = mock_client_cls.return_value
+        client.fetch_patients_by_prescriptions.return_value = {}
+
+        separar_lote_xml(str(input_file))
+        separar_lote_xml(str(input_file))
+
+    # Uma única consulta em lote na primeira execução; nenhuma na segunda (tudo duplicado)
+    client.fetch_patients_by_prescriptions.assert_called_once_with(["ATEND01", "ATEND02"])
+    client.fetch_patient_by_prescription.assert_not_called()
+
+def test_separar_lote_xml_streaming_gera_saida_identica(tmp_path, monkeypatch, sample_xml_content):
+    content = sample_xml_content.replace("Paciente Teste 2", "Conceição Araújo")
+    outputs = {}
+
+    for streaming in (False, True):
+        work_dir = tmp_path / f"streaming_{streaming}"
+        work_dir.mkdir()
+        input_file = work_dir / "lote.xml"
+        with open(input_file, "w", encoding="iso-8859-1") as f:
+            f.write(content)
+
+        # Histórico próprio para que os dois modos gerem os mesmos atendimentos
+        monkeypatch.chdir(work_dir)
+
+        with patch("src.separacao.TasyClient"):
+            separar_lote_xml(str(input_file), streaming=streaming)
+
+        outputs[streaming] = {
+            name.split("_")[0]: (work_dir / name).read_bytes()
+            for name in os.listdir(work_dir) if name.startswith("ATEND")
+        }
+
+    assert set(outputs[True]) == {"ATEND01", "ATEND02"}
+    assert outputs[True] == outputs[False]
+    assert "Conceição Araújo".encode("iso-8859-1") in outputs[True]["ATEND02"]
+
+def test_separar_lote_xml_falha_de_gravacao_nao_entra_no_historico(temp_dir, sample_xml_content):
+    input_file = temp_dir / "lote.xml"
+    with open(input_file, "w", encoding="iso-8859-1") as f:
+        f.write(sample_xml_content)
+
+    real_gravar = separacao._gravar_atendimento
+
+    def gravar_com_falha(resultado, atendimento, *args):
+        if atendimento == "ATEND01":
+            raise OSError("compartilhamento indisponível")
+        return real_gravar(resultado, atendimento, *args)
+
+    with patch("src.separacao.TasyClient"), patch("src.separacao._gravar_atendimento", gravar_com_falha):
+        separar_lote_xml(str(input_file), workers=4)
+
+    with HistoricoProcessados() as historico:
+        assert "ATEND02" in historico
+        assert "ATEND01" not in historico
+
+def test_separar_lote_xml_reemite_apenas_resultados_alterados(temp_dir, sample_xml_content):
+    input_file = temp_dir / "lote.xml"
+
+    def executar(content):
+        with open(input_file, "w", encoding="iso-8859-1") as f:
+            f.write(content)
+        with patch("src.separacao.TasyClient"):
+            separar_lote_xml(str(input_file))
+        gerados = [name for name in os.listdir(temp_dir) if name != "lote.xml"]
+        for name in gerados:
+            os.remove(temp_dir / name)
+        return sorted(name.split("_")[0] for name in gerados)
+
+    assert executar(sample_xml_content) == ["ATEND01", "ATEND02"]
+    # Re-download idêntico (apenas com indentação diferente): nada é reemitido
+    assert executar(sample_xml_content.replace("    ", "  ")) == []
+    # Correção do laboratório em um único atendimento
+    assert executar(sample_xml_content.replace("Paciente Teste 2", "Paciente Teste 2 (Retificado)")) == ["ATEND02"]
+
+def test_separar_lote_xml_modo_rapido_preserva_bytes_originais(temp_dir, sample_xml_content):
+    # Referência de caractere que o ElementTree recodificaria na regravação
+    content = sample_xml_content.replace("Paciente Teste 1", "Jo&#227;o")
+    input_file = temp_dir / "lote.xml"
+    with open(input_file, "w", encoding="iso-8859-1") as f:
+        f.write(content)
+
+    with patch("src.separacao.TasyClient"):
+        separar_lote_xml(str(input_file), modo_rapido=True)
+
+    file_atend01 = [f for f in os.listdir(temp_dir) if f.startswith("ATEND01")][0]
+    data = (temp_dir / file_atend01).read_bytes()
+
+    assert data.startswith(b'<?xml version="1.0" encoding="iso-8859-1"?>\n<ct_LoteResultados_v1><NumeroLote>12345</NumeroLote>')
+    assert b"Jo&#227;o" in data
+    root = ET.fromstring(data)
+    assert root.findtext("CodigoApoiado") == "TESTE"
+    assert root.findtext(".//NumeroAtendimentoApoiado") == "ATEND01"
+    assert root.findtext(".//Nome") == "João"
+
+def test_separar_lote_xml_modo_rapido_recorre_ao_modo_tradicional(temp_dir, sample_xml_content):
+    # Lote em UTF-8: os bytes não podem ser copiados para a saída ISO-8859-1
+    content = sample_xml_content.replace("ISO-8859-1", "UTF-8").replace("Paciente Teste 1", "João")
+    input_file = temp_dir / "lote.xml"
+    with open(input_file, "w", encoding="utf-8") as f:
+        f.write(content)
+
+    with patch("src.separacao.TasyClient"):
+        separar_lote_xml(str(input_file), modo_rapido=True)
+
+    file_atend01 = [f for f in os.listdir(temp_dir) if f.startswith("ATEND01")][0]
+    data = (temp_dir / file_atend01).read_bytes()
+    assert "João".encode("iso-8859-1") in data
+
+@pytest.mark.parametrize("abertura", ['<ListaResultados >', '<ListaResultados\n    tipo="parcial">'])
+def test_modo_rapido_volta_ao_leitor_xml_com_lista_fora_do_padrao(temp_dir, sample_xml_content, abertura):
+    input_file = temp_dir / "lote.xml"
+    input_file.write_text(sample_xml_content.replace("<ListaResultados>", abertura), encoding="iso-8859-1")
+
+    assert not separacao._lote_aceita_bytes_originais(str(input_file))
+    with patch("src.separacao.TasyClient"):
+        assert separar_lote_xml(str(input_file), modo_rapido=True, saidas=["xml"]) == 2
+
+def test_separar_lote_xml_retoma_lote_interrompido(temp_dir, sample_xml_content):
+    input_file = temp_dir / "lote.xml"
+    with open(input_file, "w", encoding="iso-8859-1") as f:
+        f.write(sample_xml_content)
+
+    chamadas = []
+
+    def enriquecer_e_cair(client, atendimentos, cache=None):
+        chamadas.append(list(atendimentos))
+        if len(chamadas) == 2:
+            raise SystemExit("queda do processo")
+        return {}
+
+    # Blocos de 1 atendimento: o primeiro é confirmado, o processo cai no segundo
+    with patch("src.separacao.TasyClient"), patch("src.separacao.TAMANHO_LOTE_ENRIQUECIMENTO", 1), \
+         patch("src.separacao.enriquecer_pacientes", enriquecer_e_cair):
+        with pytest.raises(SystemExit):
+            separar_lote_xml(str(input_file))
+
+    chamadas.clear()
+    with patch("src.separacao.TasyClient"), patch("src.separacao.enriquecer_pacientes", enriquecer_e_cair):
+        separar_lote_xml(str(input_file))
+        # Lote concluído: uma nova execução não reprocessa nada
+        separar_lote_xml(str(input_file))
+
+    assert chamadas == [["ATEND02"]]
+    with HistoricoProcessados() as historico:
+        assert "ATEND01" in historico and "ATEND02" in historico
+    assert not [name for name in os.listdir(temp_dir) if name.endswith(".tmp")]
+
+def test_separar_lote_xml_retoma_com_o_mesmo_carimbo(temp_dir, sample_xml_content):
+    input_file = temp_dir / "lote.xml"
+    with open(input_file, "w", encoding="iso-8859-1") as f:
+        f.write(sample_xml_content)
+
+    gravar_original = separacao._gravar_atendimento
+
+    def gravar_e_cair(resultado, atendimento, *args):
+        gravar_original(resultado, atendimento, *args)
+        if atendimento == "ATEND02":
+            raise SystemExit("queda antes de confirmar o bloco")
+
+    # O primeiro bloco cai depois de gravar os arquivos e antes do journal
+    with patch("src.separacao.TasyClient"), patch("src.separacao._gravar_atendimento", gravar_e_cair), \
+         patch("src.separacao.datetime") as relogio:
+        relogio.now.return_value = datetime(2026, 2, 1, 8, 0, 0)
+        with pytest.raises(SystemExit):
+            separar_lote_xml(str(input_file), saidas=["xml"])
+
+    with patch("src.separacao.TasyClient"):
+        assert separar_lote_xml(str(input_file), saidas=["xml"]) == 2
+
+    # Regravado com os mesmos nomes: nenhum atendimento duplicado na pasta
+    assert sorted(f for f in os.listdir(temp_dir) if f.startswith("ATEND")) == [
+        "ATEND01_20260201080000.xml", "ATEND02_20260201080000.xml"
+    ]
+
+def test_separar_lote_xml_falha_em_um_bloco_nao_perde_os_seguintes(temp_dir, sample_xml_content):
+    input_file = temp_dir / "lote.xml"
+    with open(input_file, "w", encoding="iso-8859-1") as f:
+        f.write(sample_xml_content)
+
+    gravar_original = separacao._gravar_atendimento
+
+    def gravar_com_falha(resultado, atendimento, *args):
+        if atendimento == "ATEND01":
+            raise OSError("disco cheio")
+        gravar_original(resultado, atendimento, *args)
+
+    relatorio = {}
+    with patch("src.separacao.TasyClient"), patch("src.separacao.TAMANHO_LOTE_ENRIQUECIMENTO", 1), \
+         patch("src.separacao._gravar_atendimento", gravar_com_falha):
+        assert separar_lote_xml(str(input_file), saidas=["xml"], relatorio=relatorio) == 1
+    assert relatorio == {"falhas": 1}
+
+    with HistoricoProcessados() as historico:
+        # O bloco seguinte foi confirmado; o journal parou antes do atendimento com falha
+        assert "ATEND02" in historico and "ATEND01" not in historico
+        assert historico.progresso_lote(os.path.abspath(input_file), _assinatura(input_file)) == (0, False)
+
+    relatorio = {}
+    with patch("src.separacao.TasyClient"):
+        assert separar_lote_xml(str(input_file), saidas=["xml"], relatorio=relatorio) == 1
+    assert relatorio == {"falhas": 0}
+    with HistoricoProcessados() as historico:
+        assert historico.progresso_lote(os.path.abspath(input_file), _assinatura(input_file)) == (2, True)
+
+def _assinatura(caminho):
+    stat = os.stat(caminho)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def test_separar_lote_xml_saidas_configuraveis(temp_dir):
+    xml_content = """<?xml version="1.0" encoding="ISO-8859-1"?>
+<ct_LoteResultados_v1>
+    <NumeroLote>1</NumeroLote>
+    <ListaResultados>
+        <ct_Resultado_v1>
+            <NumeroAtendimentoApoiado>ATEND01</NumeroAtendimentoApoiado>
+            <NumeroAtendimentoDB>1384686346</NumeroAtendimentoDB>
+            <ListaResultadoProcedimentos>
+                <ct_ResultadoProcedimentos_v1>
+                    <CodigoExameDB>MONOC</CodigoExameDB>
+                    <DescricaoMetodologia>AGLUTINAÇÃO</DescricaoMetodologia>
+                </ct_ResultadoProcedimentos_v1>
+            </ListaResultadoProcedimentos>
+        </ct_Resultado_v1>
+    </ListaResultados>
+</ct_LoteResultados_v1>"""
+    input_file = temp_dir / "lote.xml"
+    input_file.write_text(xml_content, encoding="iso-8859-1")
+
+    with pytest.raises(ValueError):
+        separar_lote_xml(str(input_file), saidas=["pdf"])
+
+    with patch("src.separacao.TasyClient"):
+        assert separar_lote_xml(str(input_file), saidas=["rtf"], pasta_saida=str(temp_dir / "saida")) == 1
+
+    # Só o RTF é gerado, com o nome que o XML individual teria
+    gerados = os.listdir(temp_dir / "saida")
+    assert len(gerados) == 1 and gerados[0].startswith("ATEND01_") and gerados[0].endswith(".rtf")
+    rtf = (temp_dir / "saida" / gerados[0]).read_text(encoding="ascii")
+    assert "Atendimento DB: 1384686346" in rtf
+    assert "Metodologia: AGLUTINA\\'c7\\'c3O" in rtf
@@ -0,0 +1,247 @@
+import json
+import pickle
+import pytest
+from unittest.mock import MagicMock, patch
+from utils import tasy_client, texto_rtf
+from utils.tasy_client import TasyClient, RegistroTasy
+from utils.texto_rtf import TextoRTFPendente
+
+def _mock_connection(rows_per_execute):
+    """Cria uma conexão falsa cujo cursor devolve as linhas informadas a cada execute."""
+    cursor = MagicMock()
+    cursor.description = [("NR_PRESCRICAO",), ("NM_PESSOA_FISICA",)]
+    batches = iter(rows_per_execute)
+    cursor.execute.side_effect = lambda sql, params: setattr(cursor, "_rows", next(batches))
+    cursor.__iter__.side_effect = lambda: iter(cursor._rows)
+
+    def fetchmany(size):
+        bloco, cursor._rows = cursor._rows[:size], cursor._rows[size:]
+        return bloco
+    cursor.fetchmany.side_effect = fetchmany
+    cursor.__enter__.return_value = cursor
+
+    connection = MagicMock()
+    connection.cursor.return_value = cursor
+    connection.__enter__.return_value = connection
+    return connection, cursor
+
+def test_fetch_patients_by_prescriptions_agrupa_em_blocos():
+    client = TasyClient()
+    connection, cursor = _mock_connection([
+        [(101, "PACIENTE A"), (102, "PACIENTE B")],
+        [(103, "PACIENTE C")],
+    ])
+
+    with patch.object(client, "_get_connection", return_value=connection):
+        result = client.fetch_patients_by_prescriptions(["101", "102", "103", "101"], chunk_size=2)
+
+    assert cursor.execute.call_count == 2
+    sql, params = cursor.execute.call_args_list[1][0]
+    assert "IN (:NR_PRESCRICAO_0, :NR_PRESCRICAO_1)" in sql
+    # O último bloco é completado com NULL para manter o mesmo texto de SQL
+    assert params == {"NR_PRESCRICAO_0": "103", "NR_PRESCRICAO_1": None}
+    assert set(result) == {"101", "102", "103"}
+    assert result["103"]["NM_PESSOA_FISICA"] == "PACIENTE C"
+
+def test_fetch_patients_by_prescriptions_usa_larguras_fixas():
+    client = TasyClient()
+    larguras = []
+    for quantidade in (3, 4, 5, 7, 600, 1500):
+        connection, cursor = _mock_connection([[]] * 2)
+        with patch.object(client, "_get_connection", return_value=connection):
+            client.fetch_patients_by_prescriptions([str(100 + i) for i in range(quantidade)])
+        larguras.append([len(params) for _, params in (c[0] for c in cursor.execute.call_args_list)])
+
+    # Potências de dois até o limite do Oracle: poucos textos de SQL distintos
+    assert larguras == [[4], [4], [8], [8], [1000], [1000, 1000]]
+    assert cursor.execute.call_args[0][1]["NR_PRESCRICAO_999"] is None
+
+def test_fetch_patients_by_prescriptions_isola_id_invalido():
+    client = TasyClient()
+    connection, cursor = _mock_connection([])
+    ruim = "102"
+
+    def execute(sql, params):
+        ids = [v for v in params.values() if v is not None]
+        if ruim in ids:
+            raise tasy_client.oracledb.DatabaseError("ORA-01722: invalid number")
+        cursor._rows = [(int(nr), f"PACIENTE {nr}") for nr in ids]
+    cursor.execute.side_effect = execute
+
+    with patch.object(client, "_get_connection", return_value=connection):
+        result = client.fetch_patients_by_prescriptions(["101", "102", "103", "ABC", "104"], chunk_size=2)
+
+    # 'ABC' nem chega ao banco; o bloco com '102' é refeito uma prescrição por vez
+    assert all("ABC" not in params.values() for _, params in (c[0] for c in cursor.execute.call_args_list))
+    assert set(result) == {"101", "103", "104"}
+
+def test_fetch_patients_by_prescriptions_lista_vazia():
+    client = TasyClient()
+    with patch.object(client, "_get_connection") as mock_conn:
+        assert client.fetch_patients_by_prescriptions([]) == {}
+    mock_conn.assert_not_called()
+
+def test_registro_tasy_compartilha_colunas_e_se_comporta_como_dict():
+    colunas = RegistroTasy.colunas([("NR_PRESCRICAO",), ("RESULTADO",)])
+    primeiro = RegistroTasy(colunas, (101, "{\\rtf1 A}"))
+    segundo = RegistroTasy(colunas, (102, None))
+
+    assert primeiro["NR_PRESCRICAO"] == 101 and segundo.get("RESULTADO") is None
+    assert dict(primeiro) == {"NR_PRESCRICAO": 101, "RESULTADO": "{\\rtf1 A}"}
+    assert primeiro.get("NM_PESSOA_FISICA") is None
+
+    # Coluna derivada: o mapa estendido também é compartilhado entre as linhas
+    primeiro["RESULTADO_TEXTO_PURO"] = "A"
+    segundo["RESULTADO_TEXTO_PURO"] = ""
+    assert primeiro._colunas is segundo._colunas
+    assert primeiro == {"NR_PRESCRICAO": 101, "RESULTADO": "{\\rtf1 A}", "RESULTADO_TEXTO_PURO": "A"}
+
+    # Cache de pacientes entre processos (Manager().dict()) serializa os registros
+    assert pickle.loads(pickle.dumps(primeiro)) == primeiro
+
+def test_registro_tasy_com_colunas_repetidas():
+    colunas = RegistroTasy.colunas([("A",), ("B",), ("A",), ("C",)])
+    registro = RegistroTasy(colunas, (1, 2, 10, 3))
+    assert dict(registro) == {"A": 10, "B": 2, "C": 3}
+
+    registro["NOVA"] = "x"
+    registro["C"] = 4
+    assert dict(registro) == {"A": 10, "B": 2, "C": 4, "NOVA": "x"}
+    assert dict(pickle.loads(pickle.dumps(registro))) == dict(registro)
+
+def test_registro_tasy_aceita_operacoes_de_dict():
+    colunas = RegistroTasy.colunas([("NR_PRESCRICAO",), ("RESULTADO",), ("DS_EXAME",)])
+    outro = RegistroTasy(colunas, (102, None, "TSH"))
+    registro = RegistroTasy(colunas, (101, TextoRTFPendente("{\\rtf1 A}"), "GLIC"))
+
+    copia = registro.copy()
+    copia["NR_PRESCRICAO"] = 999
+    copia.update({"DS_EXAME": "HB", "CD_MEDICO": 7}, NM_PACIENTE="X")
+    assert registro["NR_PRESCRICAO"] == 101 and "CD_MEDICO" not in registro
+    assert copia.setdefault("CD_MEDICO", 8) == 7 and copia.setdefault("IE_STATUS", "L") == "L"
+
+    assert registro.pop("DS_EXAME") == "GLIC" and registro.pop("DS_EXAME", None) is None
+    del registro["NR_PRESCRICAO"]
+    with pytest.raises(KeyError):
+        del registro["NR_PRESCRICAO"]
+    assert list(registro) == ["RESULTADO"]
+    # As demais linhas da consulta não são afetadas pela remoção
+    assert dict(outro) == {"NR_PRESCRICAO": 102, "RESULTADO": None, "DS_EXAME": "TSH"}
+
+    # json.dumps só aceita dict: a conversão é explícita
+    texto_rtf.limpar_cache()
+    with patch.object(texto_rtf, "rtf_to_text", return_value="A"):
+        assert json.loads(json.dumps(registro, default=dict)) == {"RESULTADO": "A"}
+        assert json.loads(json.dumps(dict(copia)))["RESULTADO"] == "A"
+    texto_rtf.limpar_cache()
+
+def test_execute_query_and_fetch_all_converte_rtf():
+    client = TasyClient()
+    connection, cursor = _mock_connection([[(101, "{\\rtf1\\ansi Glicose 92}"), (102, None)]])
+    cursor.description = [("NR_PRESCRICAO",), ("RESULTADO",)]
+
+    with patch.object(client, "_get_connection", return_value=connection):
+        linhas = client._execute_query_and_fetch_all("SELECT ...", {})
+
+    assert linhas[0]["RESULTADO_TEXTO_PURO"].strip() == "Glicose 92"
+    assert "RESULTADO_TEXTO_PURO" not in linhas[1]
+
+def test_texto_puro_convertido_so_na_leitura(monkeypatch):
+    client = TasyClient()
+    texto_rtf.limpar_cache()
+    chamadas = []
+    monkeypatch.setattr(texto_rtf, "rtf_to_text", lambda conteudo, errors: chamadas.append(conteudo) or "texto")
+    connection, cursor = _mock_connection([[(101, "{\\rtf1 A}"), (102, "{\\rtf1 B}"), (103, "{\\rtf1 A}")]])
+    cursor.description = [("NR_PRESCRICAO",), ("RESULTADO",)]
+
+    with patch.object(client, "_get_connection", return_value=connection):
+        linhas = client.fetch_exams("180927")
+
+    # Verificar a coluna não é ler o texto: nenhuma conversão até a primeira leitura
+    assert "RESULTADO_TEXTO_PURO" in linhas[0] and "RESULTADO_TEXTO_PURO" in linhas[1]
+    assert chamadas == []
+    # A cópia serializada leva o RTF pendente, não o texto
+    copia = pickle.loads(pickle.dumps(linhas[1]))
+    assert linhas[0]["RESULTADO_TEXTO_PURO"] == "texto" and chamadas == ["{\\rtf1 A}"]
+
+    tasy_client.resolver_textos_rtf(linhas, processos=1)
+    assert chamadas == ["{\\rtf1 A}", "{\\rtf1 B}"]
+    assert linhas[1]._pendentes() == [] and linhas[2]["RESULTADO_TEXTO_PURO"] == "texto"
+    assert copia["RESULTADO_TEXTO_PURO"] == "texto" and len(chamadas) == 2
+    texto_rtf.limpar_cache()
+
+def test_iter_exams_entrega_em_blocos_e_libera_sessao_ao_fechar():
+    client = TasyClient()
+    connection, cursor = _mock_connection([[(i, None) for i in range(5)]])
+    cursor.description = [("NR_PRESCRICAO",), ("RESULTADO",)]
+
+    with patch.object(client, "_get_connection", return_value=connection):
+        blocos = client.iter_exam_batches("180927", batch_size=2)
+        assert [len(b) for b in blocos] == [2, 2, 1]
+        assert cursor.arraysize == 2 and cursor.prefetchrows == tasy_client.FETCH_PREFETCHROWS
+        assert cursor.execute.call_args[0][1] == {"CD_PESSOA_FISICA": "180927"}
+
+    connection, cursor = _mock_connection([[(i, None) for i in range(5)]])
+    with patch.object(client, "_get_connection", return_value=connection):
+        exames = client.iter_exams("180927", batch_size=2)
+        assert next(exames)["NR_PRESCRICAO"] == 0
+        # Só o primeiro bloco foi buscado; fechar o iterador devolve a sessão ao pool
+        assert cursor.fetchmany.call_count == 1
+        connection.__exit__.assert_not_called()
+        exames.close()
+        connection.__exit__.assert_called_once()
+
+def test_iter_exams_propaga_erro_do_oracle():
+    client = TasyClient()
+    connection, cursor = _mock_connection([[]])
+    cursor.execute.side_effect = tasy_client.oracledb.DatabaseError("ORA-03113")
+
+    with patch.object(client, "_get_connection", return_value=connection):
+        with pytest.raises(tasy_client.oracledb.DatabaseError):
+            list(client.iter_exams("180927"))
+        # A versão em lista mantém o contrato antigo: erro vira lista vazia
+        assert client.fetch_exams("180927") == []
+
+def test_pool_compartilhado_entre_clientes(monkeypatch):
+    monkeypatch.setattr(tasy_client, "_pools", {})
+    monkeypatch.setenv("DB_USER", "TASY")
+    monkeypatch.setenv("DB_PASSWORD", "x")
+    monkeypatch.setenv("DB_DSN", "db:1521/ORCL")
+    connection, _ = _mock_connection([[(101, "PACIENTE A")], [(102, "PACIENTE B")]])
+
+    with patch("utils.tasy_client.oracledb.create_pool") as create_pool:
+        create_pool.return_value.acquire.return_value = connection
+        TasyClient().fetch_patients_by_prescriptions(["101"])
+        TasyClient().fetch_patients_by_prescriptions(["102"])
+
+        create_pool.assert_called_once()
+        assert create_pool.call_args.kwargs["stmtcachesize"] == tasy_client.STMT_CACHE_SIZE
+        assert create_pool.return_value.acquire.call_count == 2
+
+        # Processo filho (fork): sessões do pai não são reaproveitadas
+        with patch("utils.tasy_client.os.getpid", return_value=-1):
+            TasyClient()._get_connection()
+        assert create_pool.call_count == 2
+
+def test_inicializacao_oracle_unica_e_thin_no_linux(monkeypatch):
+    monkeypatch.setattr(tasy_client, "_modo_cliente", None)
+    monkeypatch.setattr(tasy_client, "ORACLE_CLIENT_LIB_DIR", None)
+    monkeypatch.setattr(tasy_client, "ORACLE_MODO", "auto")
+
+    with patch("utils.tasy_client.platform.system", return_value="Linux"), \
+         patch("utils.tasy_client.oracledb.init_oracle_client") as init_client:
+        TasyClient()
+        assert tasy_client._modo_cliente is None  # construir o cliente não toca no driver
+        assert tasy_client.inicializar_cliente_oracle() == tasy_client.MODO_THIN
+        assert tasy_client.inicializar_cliente_oracle() == tasy_client.MODO_THIN
+    init_client.assert_not_called()
+
+def test_inicializacao_oracle_thick_com_instant_client(monkeypatch, tmp_path):
+    monkeypatch.setattr(tasy_client, "_modo_cliente", None)
+    monkeypatch.setattr(tasy_client, "ORACLE_CLIENT_LIB_DIR", str(tmp_path))
+    monkeypatch.setattr(tasy_client, "ORACLE_MODO", "auto")
+
+    with patch("utils.tasy_client.oracledb.init_oracle_client") as init_client:
+        assert tasy_client.inicializar_cliente_oracle() == tasy_client.MODO_THICK
+        assert tasy_client.inicializar_cliente_oracle() == tasy_client.MODO_THICK
+    init_client.assert_called_once_with(lib_dir=str(tmp_path))
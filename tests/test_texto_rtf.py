@@ -0,0 +1,61 @@
+import pytest
+
+from utils import texto_rtf
+from utils.texto_rtf import converter_rtf, converter_rtf_em_lote, MENSAGEM_ERRO_RTF
+
+@pytest.fixture(autouse=True)
+def cache_vazio():
+    texto_rtf.limpar_cache()
+    yield
+    texto_rtf.limpar_cache()
+
+def _contar_conversoes(monkeypatch):
+    chamadas = []
+    original = texto_rtf.rtf_to_text
+    def rtf_to_text(conteudo, errors):
+        chamadas.append(conteudo)
+        return original(conteudo, errors=errors)
+    monkeypatch.setattr(texto_rtf, "rtf_to_text", rtf_to_text)
+    return chamadas
+
+def test_converter_rtf_memoriza_por_conteudo_com_limite(monkeypatch):
+    chamadas = _contar_conversoes(monkeypatch)
+    monkeypatch.setattr(texto_rtf, "RTF_CACHE_TAMANHO", 2)
+
+    assert converter_rtf("{\\rtf1\\ansi Glicose 92}").strip() == "Glicose 92"
+    assert converter_rtf("{\\rtf1\\ansi Glicose 92}").strip() == "Glicose 92"
+    assert len(chamadas) == 1
+
+    converter_rtf("{\\rtf1 B}")
+    converter_rtf("{\\rtf1 C}")
+    # O primeiro saiu do cache (menos usado recentemente) e é convertido de novo
+    converter_rtf("{\\rtf1\\ansi Glicose 92}")
+    assert len(chamadas) == 4
+
+def test_converter_rtf_erro_devolve_mensagem(monkeypatch):
+    monkeypatch.setattr(texto_rtf, "rtf_to_text", lambda conteudo, errors: 1 / 0)
+    assert converter_rtf("{\\rtf1 X}") == MENSAGEM_ERRO_RTF
+
+def test_converter_em_lote_repetidos_uma_vez(monkeypatch):
+    chamadas = _contar_conversoes(monkeypatch)
+    converter_rtf("{\\rtf1 A}")
+
+    textos = converter_rtf_em_lote(["{\\rtf1 A}", "{\\rtf1 B}", "{\\rtf1 B}"], processos=1)
+    assert [t.strip() for t in textos] == ["A", "B", "B"]
+    assert chamadas == ["{\\rtf1 A}", "{\\rtf1 B}"]
+
+def test_converter_em_lote_em_processos(monkeypatch):
+    monkeypatch.setattr(texto_rtf, "RTF_MINIMO_PARALELO", 2)
+    conteudos = [f"{{\\rtf1\\ansi Exame {i}\\par}}" for i in range(6)]
+    try:
+        paralelo = converter_rtf_em_lote(conteudos, processos=2)
+    finally:
+        texto_rtf.encerrar_processos()
+    texto_rtf.limpar_cache()
+    assert paralelo == converter_rtf_em_lote(conteudos, processos=1)
+
+def test_conteudo_que_nao_e_texto_devolve_mensagem():
+    lob = object()
+    assert converter_rtf(lob) == MENSAGEM_ERRO_RTF
+    textos = converter_rtf_em_lote([b"{\\rtf1 A}", "{\\rtf1 B}"], processos=1)
+    assert textos[0] == MENSAGEM_ERRO_RTF and textos[1].strip() == "B"
@@ -1,7 +1,7 @@
 import sys
 import os
 import pytest
-from xml_to_rtf import RTFConverter, parse_xml_content
+from xml_to_rtf import RTFConverter, parse_xml_content, convert_directory, convert_file
 
 # Adiciona o diretório raiz ao sys.path para importar xml_to_rtf
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -14,6 +14,18 @@ def test_rtf_converter_escape():
     assert "\\{" in escaped
     assert "\\}" in escaped
 
+def test_rtf_converter_escape_acentos_e_quebras():
+    assert RTFConverter.escape_text("Hemácias {x}\r\nReferência\r€ 😀") == (
+        "Hem\\'e1cias \\{x\\}\\par \n"
+        "Refer\\'eancia\\par \n"
+        "\\'80 \\u62976?"
+    )
+
+def test_rtf_converter_escape_many():
+    textos = ["Não reagente", None, "a\\b", ""]
+    assert RTFConverter.escape_many(textos) == [RTFConverter.escape_text(t) for t in textos]
+    assert RTFConverter.escape_many([]) == []
+
 def test_parse_xml_content_db_format(temp_dir, sample_xml_content):
     # Cria um arquivo XML simulando o formato DB
     # Nota: xml_to_rtf espera uma estrutura um pouco diferente da separacao.py (ct_ResultadoProcedimentos_v1)
@@ -56,3 +68,60 @@ def test_create_file_rtf(temp_dir):
         content_read = f.read()
         assert "Conte\\'fado de Teste" in content_read
         assert r"{\rtf1" in content_read
+
+def test_convert_directory_ignora_rtfs_atualizados(temp_dir):
+    xml_content = """<?xml version="1.0" encoding="ISO-8859-1"?>
+<ct_LoteResultados_v1><ListaResultados><ct_Resultado_v1>
+    <NumeroAtendimentoDB>{0}</NumeroAtendimentoDB>
+    <ct_ResultadoProcedimentos_v1><CodigoExameDB>GLIC</CodigoExameDB></ct_ResultadoProcedimentos_v1>
+</ct_Resultado_v1></ListaResultados></ct_LoteResultados_v1>"""
+    for atendimento in ("101", "102", "103"):
+        (temp_dir / f"{atendimento}_20260123.xml").write_text(xml_content.format(atendimento), encoding="iso-8859-1")
+    (temp_dir / "lote_exames_1.xml").write_text(xml_content.format("999"), encoding="iso-8859-1")
+    saida = temp_dir / "rtf"
+
+    report = convert_directory(str(temp_dir), str(saida), workers=2)
+    assert (report["total"], report["convertidos"], report["ignorados"], report["falhas"]) == (3, 3, 0, 0)
+    assert sorted(os.listdir(saida)) == ["101_20260123.rtf", "102_20260123.rtf", "103_20260123.rtf"]
+
+    # Só o XML mais novo que o seu RTF é convertido de novo
+    rtf = saida / "102_20260123.rtf"
+    os.utime(rtf, (rtf.stat().st_atime, rtf.stat().st_mtime - 60))
+    report = convert_directory(str(temp_dir), str(saida), workers=2)
+    assert (report["convertidos"], report["ignorados"]) == (1, 2)
+
+def test_convert_file_streaming_identico_ao_documento_inteiro(temp_dir):
+    xml_content = """<?xml version="1.0" encoding="ISO-8859-1"?>
+<ct_LoteResultados_v1><ListaResultados>
+    <ct_Resultado_v1>
+        <NumeroAtendimentoDB>101</NumeroAtendimentoDB>
+        <ListaResultadoProcedimentos>
+            <ct_ResultadoProcedimentos_v1>
+                <CodigoExameDB>GLIC</CodigoExameDB>
+                <ct_ResultadoTexto_v1><DescricaoParametrosDB>Glicose</DescricaoParametrosDB><ValorResultado>92</ValorResultado></ct_ResultadoTexto_v1>
+                <Observacao1>Jejum de 8h {confirmado}</Observacao1>
+            </ct_ResultadoProcedimentos_v1>
+            <ct_ResultadoProcedimentos_v1><CodigoExameDB>TSH</CodigoExameDB></ct_ResultadoProcedimentos_v1>
+        </ListaResultadoProcedimentos>
+    </ct_Resultado_v1>
+    <ct_Resultado_v1>
+        <ListaResultadoProcedimentos>
+            <ct_ResultadoProcedimentos_v1><DescricaoMetodologia>AGLUTINAÇÃO</DescricaoMetodologia></ct_ResultadoProcedimentos_v1>
+        </ListaResultadoProcedimentos>
+    </ct_Resultado_v1>
+</ListaResultados></ct_LoteResultados_v1>"""
+    input_file = temp_dir / "lote_exames_1.xml"
+    input_file.write_text(xml_content, encoding="iso-8859-1")
+
+    inteiro = convert_file(str(input_file), str(temp_dir / "inteiro"), stream=False)
+    streaming = convert_file(str(input_file), str(temp_dir / "streaming"), stream=True)
+
+    assert open(inteiro, "rb").read() == open(streaming, "rb").read()
+
+def test_convert_file_streaming_recorre_ao_formato_simples(temp_dir):
+    input_file = temp_dir / "simples.xml"
+    input_file.write_text("<Raiz><ListaResultados><Conteudo>Laudo único</Conteudo></ListaResultados></Raiz>", encoding="utf-8")
+
+    output_path = convert_file(str(input_file), stream=True)
+
+    assert "Laudo \\'fanico" in open(output_path, encoding="ascii").read()
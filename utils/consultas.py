@@ -0,0 +1,194 @@
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Pasta das queries: sobe um nível de 'utils' para a raiz e entra em 'querys'
+PASTA_QUERYS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'querys')
+
+# Literais de texto ('...', com '' como aspas escapadas), comentários de linha e de bloco
+PADRAO_LITERAL_OU_COMENTARIO = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", re.S)
+# Bind Oracle (:NOME), ignorando '::' e atribuições ':='
+PADRAO_BIND = re.compile(r"(?<![:\w]):([A-Za-z][\w$#]*)")
+
+# Limite de expressões em uma lista IN do Oracle (ORA-01795)
+LIMITE_LISTA_IN = 1000
+# Variantes IN memorizadas (as menos usadas recentemente saem primeiro)
+MAX_DERIVADAS = 64
+
+class Consulta(NamedTuple):
+    """Statement normalizado de um arquivo de 'querys/'."""
+    nome: str
+    sql: str
+    binds: Tuple[str, ...]
+    mtime_ns: int
+
+    def validar_parametros(self, params):
+        """
+        Confere os parâmetros com os binds do statement antes de ir ao banco.
+
+        Raises:
+            ValueError: Bind sem valor ou parâmetro que não existe no SQL.
+        """
+        informados = {nome.upper() for nome in params}
+        esperados = {nome.upper() for nome in self.binds}
+        faltando = esperados - informados
+        sobrando = informados - esperados
+        if faltando or sobrando:
+            detalhes = []
+            if faltando:
+                detalhes.append(f"sem valor: {', '.join(sorted(faltando))}")
+            if sobrando:
+                detalhes.append(f"inexistentes no SQL: {', '.join(sorted(sobrando))}")
+            raise ValueError(f"Parâmetros inválidos para '{self.nome}' ({'; '.join(detalhes)}).")
+
+def normalizar_sql(sql):
+    """
+    Remove comentários (fora de literais), espaços à direita, linhas vazias e o ';' final,
+    produzindo sempre o mesmo texto para o mesmo arquivo.
+    """
+    sem_comentarios = PADRAO_LITERAL_OU_COMENTARIO.sub(
+        lambda m: m.group(0) if m.group(0).startswith("'") else "", sql
+    )
+    linhas = [linha.rstrip() for linha in sem_comentarios.splitlines()]
+    return "\n".join(linha for linha in linhas if linha).strip().rstrip(";").rstrip()
+
+def extrair_binds(sql):
+    """Binds do statement, em ordem de aparição e sem repetição (literais de texto são ignorados)."""
+    sem_literais = PADRAO_LITERAL_OU_COMENTARIO.sub(" ", sql)
+    return tuple(dict.fromkeys(PADRAO_BIND.findall(sem_literais)))
+
+def largura_lista_in(quantidade, maximo):
+    """
+    Quantidade de binds da lista IN para 'quantidade' valores: a próxima potência de dois, limitada a
+    'maximo' (ex: 3 -> 4, 600 -> 1000 com máximo 1000). Com poucas larguras possíveis, o Oracle vê
+    poucos textos de SQL distintos e o cache de statements não se enche de variantes.
+    """
+    quantidade = max(1, quantidade)
+    return max(quantidade, min(1 << (quantidade - 1).bit_length(), maximo))
+
+class RegistroConsultas:
+    """
+    Catálogo das queries de 'querys/*.sql', carregadas e normalizadas uma única vez.
+
+    Responsabilidade:
+        - Ler todos os arquivos na criação e expor os statements por nome ('Pessoa_Fisica' ou 'Pessoa_Fisica.sql').
+        - Conhecer os binds de cada statement para validar parâmetros antes da execução.
+        - Recarregar um arquivo apenas quando seu mtime muda (edição em produção sem reiniciar).
+        - Devolver sempre o mesmo texto de SQL, para o cache de statements do Oracle reaproveitar o parse.
+    """
+
+    def __init__(self, pasta=PASTA_QUERYS):
+        """
+        Args:
+            pasta (str): Pasta dos arquivos .sql (padrão: 'querys/' na raiz do projeto).
+        """
+        self.pasta = pasta
+        self._consultas = {}
+        self._derivadas = OrderedDict()
+        self._lock = threading.Lock()
+        if os.path.isdir(pasta):
+            for arquivo in sorted(os.listdir(pasta)):
+                if arquivo.lower().endswith(".sql"):
+                    try:
+                        self.obter(arquivo)
+                    except Exception as e:
+                        logger.error(f"Erro ao carregar query '{arquivo}': {e}")
+
+    def __contains__(self, nome):
+        return os.path.exists(self._caminho(nome))
+
+    def nomes(self):
+        """Nomes dos statements carregados."""
+        return sorted(self._consultas)
+
+    def _caminho(self, nome):
+        arquivo = nome if nome.lower().endswith(".sql") else f"{nome}.sql"
+        return os.path.join(self.pasta, arquivo)
+
+    def obter(self, nome):
+        """
+        Retorna o statement normalizado, relendo o arquivo só se ele mudou desde a última leitura.
+
+        Raises:
+            FileNotFoundError: Arquivo inexistente em 'querys/'.
+        """
+        caminho = self._caminho(nome)
+        chave = os.path.splitext(os.path.basename(caminho))[0]
+        try:
+            mtime_ns = os.stat(caminho).st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Arquivo de query não encontrado: {caminho}") from None
+
+        consulta = self._consultas.get(chave)
+        if consulta is not None and consulta.mtime_ns == mtime_ns:
+            return consulta
+
+        with self._lock:
+            consulta = self._consultas.get(chave)
+            if consulta is None or consulta.mtime_ns != mtime_ns:
+                with open(caminho, 'r', encoding='utf-8') as f:
+                    sql = normalizar_sql(f.read())
+                consulta = Consulta(chave, sql, extrair_binds(sql), mtime_ns)
+                if chave in self._consultas:
+                    logger.info(f"Query '{chave}' alterada em disco; recarregada.")
+                    # Variantes IN da versão anterior nunca mais serão pedidas
+                    for derivada in [d for d in self._derivadas if d[0] == chave]:
+                        del self._derivadas[derivada]
+                self._consultas[chave] = consulta
+        return consulta
+
+    def sql(self, nome):
+        """Texto normalizado do statement."""
+        return self.obter(nome).sql
+
+    def com_lista_in(self, nome, bind, quantidade):
+        """
+        Variante do statement em que o filtro '= :BIND' vira 'IN (:BIND_0, ..., :BIND_n-1)', com
+        'quantidade' arredondada para a largura fixa seguinte (largura_lista_in: 3 -> 4 binds); o
+        chamador completa os binds que sobrarem com NULL.
+        Memorizada por (nome, bind, largura, versão do arquivo), em um cache de até MAX_DERIVADAS
+        variantes: o texto é sempre o mesmo.
+
+        Raises:
+            ValueError: O filtro '= :BIND' não aparece exatamente uma vez no statement.
+        """
+        base = self.obter(nome)
+        quantidade = largura_lista_in(quantidade, LIMITE_LISTA_IN)
+        chave = (base.nome, bind, quantidade, base.mtime_ns)
+        with self._lock:
+            consulta = self._derivadas.get(chave)
+            if consulta is not None:
+                self._derivadas.move_to_end(chave)
+                return consulta
+
+        nomes = [f"{bind}_{i}" for i in range(quantidade)]
+        sql, n_subs = re.subn(
+            rf'=\s*:{bind}\b',
+            "IN (" + ", ".join(f":{nome}" for nome in nomes) + ")",
+            base.sql
+        )
+        if n_subs != 1:
+            raise ValueError(f"Filtro ':{bind}' não encontrado em '{base.nome}.sql'.")
+        consulta = Consulta(base.nome, sql, extrair_binds(sql), base.mtime_ns)
+        with self._lock:
+            self._derivadas[chave] = consulta
+            while len(self._derivadas) > MAX_DERIVADAS:
+                self._derivadas.popitem(last=False)
+        return consulta
+
+_registro = None
+_registro_lock = threading.Lock()
+
+def registro_consultas():
+    """Registro de queries compartilhado pelo processo (criado no primeiro uso)."""
+    global _registro
+    if _registro is None:
+        with _registro_lock:
+            if _registro is None:
+                _registro = RegistroConsultas()
+    return _registro
@@ -1,28 +1,301 @@
 import oracledb
 import os
-import re
+import atexit
 import logging
-from typing import Optional, Dict, List, Any
+import platform
+import threading
+from collections.abc import MutableMapping
+from typing import Optional, Dict, List, Any, Iterator
 from datetime import datetime
-from striprtf.striprtf import rtf_to_text
+
+from utils.consultas import registro_consultas, largura_lista_in, LIMITE_LISTA_IN
+from utils.texto_rtf import TextoRTFPendente, converter_rtf, converter_rtf_em_lote
 
 # Configuração de Logger
 logger = logging.getLogger(__name__)
 
+# Pool de sessões compartilhado pelo processo (criado no primeiro uso). Configurável por variáveis de ambiente.
+POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.environ.get("DB_POOL_MAX", "4"))
+POOL_INCREMENT = int(os.environ.get("DB_POOL_INCREMENT", "1"))
+# Segundos ociosos após os quais a conexão é verificada (ping) antes de ser entregue
+POOL_PING_INTERVAL = int(os.environ.get("DB_POOL_PING_INTERVAL", "60"))
+# Segundos ociosos após os quais sessões acima de POOL_MIN são encerradas
+POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "300"))
+# Segundos máximos aguardando uma sessão livre quando todas estão em uso
+POOL_WAIT_TIMEOUT = int(os.environ.get("DB_POOL_WAIT_TIMEOUT", "30"))
+# Cursores preparados mantidos por sessão (mesmo texto de SQL -> sem novo parse no Oracle)
+STMT_CACHE_SIZE = int(os.environ.get("DB_STMT_CACHE_SIZE", "40"))
+
+# Linhas por ida ao banco (cursor.arraysize) e linhas que já voltam junto com o execute
+# (cursor.prefetchrows). Com prefetch = arraysize, o primeiro bloco não custa uma ida extra.
+FETCH_ARRAYSIZE = int(os.environ.get("DB_FETCH_ARRAYSIZE", "200"))
+FETCH_PREFETCHROWS = int(os.environ.get("DB_FETCH_PREFETCHROWS", str(FETCH_ARRAYSIZE)))
+
+# Modo do driver: 'auto' (Instant Client do projeto no Windows/macOS, thin nos demais), 'thick' ou 'thin'
+ORACLE_MODO = os.environ.get("ORACLE_MODO", "auto").strip().lower()
+# Instant Client fora do projeto (ex: /opt/oracle/instantclient_23_6 em servidores Linux)
+ORACLE_CLIENT_LIB_DIR = os.environ.get("ORACLE_CLIENT_LIB_DIR")
+# Instant Client distribuído junto com o projeto, por sistema operacional
+INSTANT_CLIENT_LOCAL = {
+    "Windows": "instantclient_23_6",
+    "Darwin": "instantclient-basiclite-macos",
+}
+
+MODO_THIN = "thin"
+MODO_THICK = "thick"
+
+_modo_cliente = None
+_modo_lock = threading.Lock()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _diretorio_instant_client():
+    if ORACLE_CLIENT_LIB_DIR:
+        return ORACLE_CLIENT_LIB_DIR
+    pasta = INSTANT_CLIENT_LOCAL.get(platform.system())
+    if pasta:
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), pasta)
+    return None
+
+def inicializar_cliente_oracle():
+    """
+    Prepara o driver uma única vez por processo (chamadas seguintes só retornam o modo escolhido).
+
+    - Thick: quando há Instant Client (ORACLE_CLIENT_LIB_DIR ou a pasta do projeto no Windows/macOS),
+      ou com ORACLE_MODO=thick (bibliotecas do sistema).
+    - Thin: nos demais casos, como nos servidores Linux: nada é carregado, a inicialização é imediata.
+      Se o Instant Client falhar ao carregar, o driver segue em modo thin.
+
+    Returns:
+        str: MODO_THICK ou MODO_THIN.
+    """
+    global _modo_cliente
+    if _modo_cliente is not None:
+        return _modo_cliente
+
+    with _modo_lock:
+        if _modo_cliente is not None:
+            return _modo_cliente
+
+        modo = MODO_THIN
+        lib_dir = _diretorio_instant_client() if ORACLE_MODO != MODO_THIN else None
+        if not oracledb.is_thin_mode():
+            # Já inicializado em modo thick por outro código do processo
+            modo = MODO_THICK
+        elif lib_dir and os.path.isdir(lib_dir):
+            try:
+                oracledb.init_oracle_client(lib_dir=lib_dir)
+                modo = MODO_THICK
+                logger.info(f"Oracle Client (Thick Mode) inicializado em: {lib_dir}")
+            except oracledb.Error as e:
+                logger.warning(f"Falha ao carregar o Oracle Client em {lib_dir}; usando modo thin: {e}")
+        elif ORACLE_MODO == MODO_THICK:
+            try:
+                oracledb.init_oracle_client()
+                modo = MODO_THICK
+                logger.info("Oracle Client (Thick Mode) inicializado com as bibliotecas do sistema.")
+            except oracledb.Error as e:
+                logger.warning(f"Falha ao carregar o Oracle Client do sistema; usando modo thin: {e}")
+        else:
+            if lib_dir:
+                logger.warning(f"Diretório do Oracle Client não encontrado: {lib_dir}; usando modo thin.")
+            logger.info("Driver Oracle em modo thin (sem Instant Client).")
+
+        _modo_cliente = modo
+    return modo
+
+def obter_pool(user, password, dsn):
+    """
+    Retorna o pool de sessões do processo para (user, dsn), criando-o no primeiro uso.
+
+    O pool é recriado em processos filhos (fork, ex: ProcessPoolExecutor do reprocessamento),
+    pois as sessões do processo pai não podem ser compartilhadas.
+    """
+    chave = (user, dsn, os.getpid())
+    pool = _pools.get(chave)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(chave)
+        if pool is None:
+            # O modo thick precisa ser escolhido antes da primeira sessão
+            inicializar_cliente_oracle()
+            pool = oracledb.create_pool(
+                user=user,
+                password=password,
+                dsn=dsn,
+                min=POOL_MIN,
+                max=max(POOL_MIN, POOL_MAX),
+                increment=POOL_INCREMENT,
+                getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+                wait_timeout=POOL_WAIT_TIMEOUT * 1000,
+                timeout=POOL_TIMEOUT,
+                ping_interval=POOL_PING_INTERVAL,
+                stmtcachesize=STMT_CACHE_SIZE,
+            )
+            _pools[chave] = pool
+            logger.info(f"Pool Oracle criado ({POOL_MIN}-{POOL_MAX} sessões) para {user}@{dsn}.")
+    return pool
+
+def fechar_pools():
+    """Encerra os pools deste processo (chamado automaticamente na saída do interpretador)."""
+    with _pools_lock:
+        for chave in [chave for chave in _pools if chave[2] == os.getpid()]:
+            try:
+                _pools.pop(chave).close(force=True)
+            except oracledb.Error as e:
+                logger.warning(f"Erro ao fechar pool Oracle: {e}")
+
+atexit.register(fechar_pools)
+
+def resolver_textos_rtf(registros, processos=None):
+    """
+    Faz de uma vez as conversões RTF pendentes de vários registros (ex: uma listagem que vai exibir
+    o texto de todos os exames), em paralelo quando o lote é grande (ver converter_rtf_em_lote).
+
+    Args:
+        registros (list): Registros devolvidos pelo TasyClient.
+        processos (int, opcional): Sobrepõe RTF_PROCESSOS nesta chamada.
+
+    Returns:
+        list: Os mesmos registros, já convertidos.
+    """
+    pendentes = [(registro, chave, pendente)
+                 for registro in registros if isinstance(registro, RegistroTasy)
+                 for chave, pendente in registro._pendentes()]
+    if pendentes:
+        textos = converter_rtf_em_lote([pendente.conteudo for _, _, pendente in pendentes], processos)
+        for (registro, chave, _), texto in zip(pendentes, textos):
+            registro[chave] = texto
+    return registros
+
+class _Colunas(dict):
+    """
+    Mapa {nome_da_coluna: posição} compartilhado por todas as linhas de uma consulta.
+    As extensões (colunas derivadas, ex: RESULTADO_TEXTO_PURO) são criadas uma vez e reaproveitadas.
+
+    Coluna com nome repetido (ex: CD_PESSOA_FISICA de PM e de PF em Pessoa_Fisica.sql) aponta para a
+    última ocorrência, como no antigo dict(zip(colunas, linha)); por isso as posições são guardadas
+    explicitamente e 'largura' (tamanho da linha) pode ser maior que o número de nomes.
+    """
+    __slots__ = ('_extensoes', 'largura')
+
+    def __init__(self, posicoes, largura):
+        super().__init__(posicoes)
+        self.largura = largura
+        self._extensoes = {}
+
+    @classmethod
+    def de_nomes(cls, nomes):
+        nomes = list(nomes)
+        return cls(((nome, posicao) for posicao, nome in enumerate(nomes)), len(nomes))
+
+    def estender(self, nome):
+        extensao = self._extensoes.get(nome)
+        if extensao is None:
+            extensao = self._extensoes[nome] = _Colunas({**self, nome: self.largura}, self.largura + 1)
+        return extensao
+
+    def __reduce__(self):
+        return (_Colunas, (dict(self), self.largura))
+
+class RegistroTasy(MutableMapping):
+    """
+    Linha de consulta ao Tasy, usada como um dicionário (row['NM_PESSOA_FISICA'], row.get(...), dict(row),
+    copy, update, pop, setdefault, del row[...]).
+
+    Os valores ficam na própria tupla devolvida pelo cursor e os nomes das colunas em um mapa único
+    por consulta, em vez de um dicionário novo por linha. Atribuir uma coluna inexistente a acrescenta.
+    Valores TextoRTFPendente são convertidos na primeira leitura e substituídos pelo texto.
+
+    Não é uma subclasse de dict: para json.dumps (e APIs que exigem dict), use dict(row) ou
+    json.dumps(row, default=dict).
+    """
+    __slots__ = ('_colunas', '_valores')
+
+    def __init__(self, colunas, valores):
+        """
+        Args:
+            colunas (_Colunas): Mapa de colunas da consulta (ver RegistroTasy.colunas).
+            valores (tuple): Linha devolvida pelo cursor.
+        """
+        self._colunas = colunas
+        self._valores = tuple(valores)
+
+    @staticmethod
+    def colunas(description):
+        """Mapa de colunas a partir de cursor.description (nome repetido: vale a última ocorrência)."""
+        return _Colunas.de_nomes(coluna[0] for coluna in description)
+
+    def __getitem__(self, chave):
+        valor = self._valores[self._colunas[chave]]
+        if type(valor) is TextoRTFPendente:
+            valor = valor.resolver()
+            self[chave] = valor
+        return valor
+
+    def _pendentes(self):
+        """Colunas com conversão RTF ainda não feita, como pares (coluna, TextoRTFPendente)."""
+        return [(chave, self._valores[posicao]) for chave, posicao in self._colunas.items()
+                if type(self._valores[posicao]) is TextoRTFPendente]
+
+    def __setitem__(self, chave, valor):
+        posicao = self._colunas.get(chave)
+        if posicao is None:
+            self._colunas = self._colunas.estender(chave)
+            self._valores += (valor,)
+        else:
+            self._valores = self._valores[:posicao] + (valor,) + self._valores[posicao + 1:]
+
+    def __delitem__(self, chave):
+        # Raro (pop/del): a linha passa a ter um mapa de colunas próprio
+        nomes = [nome for nome in self._colunas if nome != chave]
+        if len(nomes) == len(self._colunas):
+            raise KeyError(chave)
+        self._valores = tuple(self._valores[self._colunas[nome]] for nome in nomes)
+        self._colunas = _Colunas.de_nomes(nomes)
+
+    def copy(self):
+        """Cópia rasa, com as mesmas colunas e os RTFs ainda pendentes (como dict.copy)."""
+        return RegistroTasy(self._colunas, self._valores)
+
+    def __contains__(self, chave):
+        # Sem passar por __getitem__: verificar a coluna não converte o RTF pendente
+        return chave in self._colunas
+
+    def __iter__(self):
+        return iter(self._colunas)
+
+    def __len__(self):
+        return len(self._colunas)
+
+    def __repr__(self):
+        return f"RegistroTasy({dict(self)!r})"
+
+    def __reduce__(self):
+        return (RegistroTasy, (self._colunas, self._valores))
+
 class TasyClient:
     """
     Cliente reutilizável para conexão e operações no banco de dados Oracle (Tasy).
     
     Responsabilidade:
-        - Gerenciar conexões com o banco de dados.
+        - Gerenciar conexões com o banco de dados (pool de sessões compartilhado pelo processo).
         - Executar queries parametrizadas de forma segura.
         - Tratar erros específicos do OracleDB.
         - Normalizar dados retornados.
     """
 
+    # Limite de expressões em uma lista IN do Oracle (ORA-01795)
+    MAX_IN_BINDS = LIMITE_LISTA_IN
+
     def __init__(self):
         """
         Inicializa o cliente carregando as configurações das variáveis de ambiente.
+        Não toca no driver: o Oracle Client e o pool são preparados no primeiro acesso ao banco.
         """
         self.user = os.environ.get("DB_USER")
         self.password = os.environ.get("DB_PASSWORD")
@@ -31,46 +304,15 @@ class TasyClient:
         if not all([self.user, self.password, self.dsn]):
              logger.warning("Credenciais de banco de dados incompletas nas variáveis de ambiente.")
 
-        # Inicialização do Oracle Client (Thick Mode)
-        try:
-            import platform
-            
-            # Caminho base (onde está este arquivo tasy_client.py)
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            
-            if platform.system() == "Windows":
-                lib_dir = os.path.join(base_dir, "instantclient_23_6")
-            elif platform.system() == "Darwin": # macOS
-                lib_dir = os.path.join(base_dir, "instantclient-basiclite-macos")
-            else:
-                lib_dir = None
-                logger.warning(f"Sistema operacional {platform.system()} não mapeado para Instant Client local.")
-
-            if lib_dir and os.path.exists(lib_dir):
-                # Tenta inicializar apenas se ainda não estiver inicializado
-                try:
-                    oracledb.init_oracle_client(lib_dir=lib_dir)
-                    logger.info(f"Oracle Client (Thick Mode) inicializado em: {lib_dir}")
-                except oracledb.DatabaseError as e:
-                    # Ignora erro se já estiver inicializado
-                    if "DPY-1012" not in str(e): # DPY-1012: already initialized
-                         logger.warning(f"Aviso ao inicializar Oracle Client: {e}")
-            else:
-                 if lib_dir:
-                    logger.warning(f"Diretório do Oracle Client não encontrado: {lib_dir}")
-                    
-        except Exception as e:
-            logger.error(f"Falha na configuração do Oracle Client: {e}")
-
     def _get_connection(self):
-        """Estabelece e retorna uma conexão com o banco de dados."""
+        """
+        Retorna uma sessão do pool do processo (ver obter_pool).
+        Usada como context manager ('with self._get_connection() as connection'), a sessão volta
+        ao pool ao final do bloco em vez de ser encerrada.
+        """
         try:
-            connection = oracledb.connect(
-                user=self.user,
-                password=self.password,
-                dsn=self.dsn
-            )
-            logger.debug("Conexão com Oracle estabelecida com sucesso.")
+            connection = obter_pool(self.user, self.password, self.dsn).acquire()
+            logger.debug("Sessão Oracle obtida do pool.")
             return connection
         except oracledb.Error as e:
             logger.error(f"Erro ao conectar ao Oracle: {e}")
@@ -124,57 +366,84 @@ class TasyClient:
 
     def _load_query(self, filename: str) -> str:
         """
-        Lê e retorna o conteúdo de um arquivo SQL da pasta 'querys'.
+        Retorna o SQL normalizado (sem comentários) de um arquivo da pasta 'querys'.
+        Vem do registro de queries do processo: o arquivo só é relido quando seu mtime muda.
         
         Args:
             filename: Nome do arquivo (ex: 'Resultados_Exames.sql').
         """
         try:
-            # Caminho relativo: sobe um nível de 'utils' para a raiz e entra em 'querys'
-            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            query_path = os.path.join(base_dir, 'querys', filename)
-            
-            if not os.path.exists(query_path):
-                raise FileNotFoundError(f"Arquivo de query não encontrado: {query_path}")
-                
-            with open(query_path, 'r', encoding='utf-8') as f:
-                sql = f.read()
-                
-            # Limpeza básica de comentários (opcional, mas recomendada para oracledb)
-            sql = re.sub(r'--.*$', '', sql, flags=re.MULTILINE)
-            return sql
-            
+            return registro_consultas().sql(filename)
+        except Exception as e:
+            logger.error(f"Erro ao carregar query '{filename}': {e}")
+            raise
+
+    def _prepare_query(self, filename: str, params: Dict[str, Any]) -> str:
+        """Obtém o statement do registro e valida os parâmetros contra os binds antes da execução."""
+        try:
+            consulta = registro_consultas().obter(filename)
         except Exception as e:
             logger.error(f"Erro ao carregar query '{filename}': {e}")
             raise
+        consulta.validar_parametros(params)
+        return consulta.sql
 
-    def fetch_exams(self, cd_pessoa_fisica: str) -> List[Dict[str, Any]]:
+    def fetch_exams(self, cd_pessoa_fisica: str, resolver_rtf: bool = False) -> List[Dict[str, Any]]:
         """
         Busca todos os exames de um paciente.
 
         Args:
             cd_pessoa_fisica: Código do paciente.
+            resolver_rtf: Converte já o RESULTADO_TEXTO_PURO de todos os exames, em lote (e em
+                paralelo, se configurado), em vez de convertê-lo na primeira leitura de cada um.
 
         Returns:
             Lista de dicionários contendo os dados dos exames.
         """
-        # Carrega a query do arquivo externo
-        sql = self._load_query("Resultados_Exames.sql")
-        
         params = {'CD_PESSOA_FISICA': cd_pessoa_fisica}
+
+        # Query do arquivo externo (registro de queries, binds validados)
+        sql = self._prepare_query("Resultados_Exames.sql", params)
         
-        return self._execute_query_and_fetch_all(sql, params)
+        exames = self._execute_query_and_fetch_all(sql, params)
+        if resolver_rtf:
+            resolver_textos_rtf(exames)
+        return exames
+
+    def iter_exams(self, cd_pessoa_fisica: str, batch_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Versão em streaming de fetch_exams: entrega cada exame assim que seu bloco chega do banco,
+        sem montar a lista completa (históricos longos, com RTF em cada linha).
+
+        A sessão do pool fica em uso até o iterador terminar; consuma até o fim ou feche-o
+        (iterador.close()). Erros do Oracle são registrados e propagados ao consumidor.
+
+        Args:
+            cd_pessoa_fisica: Código do paciente.
+            batch_size: Linhas por ida ao banco (padrão: FETCH_ARRAYSIZE / DB_FETCH_ARRAYSIZE).
+        """
+        for batch in self.iter_exam_batches(cd_pessoa_fisica, batch_size):
+            yield from batch
+
+    def iter_exam_batches(self, cd_pessoa_fisica: str, batch_size: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Como iter_exams, mas entrega os exames em listas de até 'batch_size' (uma por ida ao banco),
+        para quem renderiza ou grava em blocos.
+        """
+        params = {'CD_PESSOA_FISICA': cd_pessoa_fisica}
+        sql = self._prepare_query("Resultados_Exames.sql", params)
+        return self._iter_query_batches(sql, params, batch_size)
 
     def fetch_single_exam(self, cd_pessoa_fisica: str, id_exame_item: str, nr_prescricao: str) -> Optional[Dict[str, Any]]:
         """
         Busca um exame específico para geração de PDF.
         """
-        sql = self._load_query("Resultado_Exame.sql")
         params = {
             'CD_PESSOA_FISICA': cd_pessoa_fisica,
             'ID_EXAME_ITEM': id_exame_item,
             'NR_PRESCRICAO': nr_prescricao
         }
+        sql = self._prepare_query("Resultado_Exame.sql", params)
         
         results = self._execute_query_and_fetch_all(sql, params)
         return results[0] if results else None
@@ -183,8 +452,8 @@ class TasyClient:
         """
         Busca dados do paciente baseando-se no número da prescrição.
         """
-        sql = self._load_query("Pessoa_Fisica.sql")
         params = {'NR_PRESCRICAO': nr_prescricao}
+        sql = self._prepare_query("Pessoa_Fisica.sql", params)
         
         results = self._execute_query_and_fetch_all(sql, params)
         if results:
@@ -193,35 +462,139 @@ class TasyClient:
             logger.warning(f"Nenhum paciente encontrado para prescrição: {nr_prescricao}")
             return None
 
-    def _execute_query_and_fetch_all(self, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Método auxiliar para executar SELECT e retornar lista de dicts."""
-        files_list = []
+    def fetch_patients_by_prescriptions(self, nr_prescricoes: List[str], chunk_size: int = MAX_IN_BINDS) -> Dict[str, Dict[str, Any]]:
+        """
+        Busca dados de pacientes para várias prescrições de uma só vez.
+
+        Reaproveita a query 'Pessoa_Fisica.sql', trocando o filtro por igualdade por uma
+        cláusula IN com binds. A quantidade de binds é arredondada para uma potência de dois
+        (até chunk_size/MAX_IN_BINDS) e o último bloco é completado com NULL: uma chamada usa um
+        único texto de SQL, e o Oracle vê no máximo ~11 variantes (1, 2, 4, ..., 512, 1000)
+        qualquer que seja o tamanho do lote.
+
+        Args:
+            nr_prescricoes: Números de prescrição (NumeroAtendimentoApoiado).
+            chunk_size: Quantidade de binds por consulta (máximo de 1000 no Oracle).
+
+        Um id inválido não derruba o bloco inteiro: ids não numéricos (NR_PRESCRICAO é numérico no
+        Tasy; no IN causariam ORA-01722 para todo o bloco) são descartados antes da consulta e, se
+        um bloco ainda assim falhar, suas prescrições são consultadas uma a uma.
+
+        Returns:
+            Dicionário {numero_prescricao: dados_do_paciente}. Prescrições não encontradas
+            ficam fora do dicionário.
+        """
+        ids = list(dict.fromkeys(str(nr).strip() for nr in nr_prescricoes if nr))
+        invalidos = [nr for nr in ids if not nr.isdigit()]
+        if invalidos:
+            logger.warning(f"Prescrições com número inválido ignoradas no Tasy: {', '.join(invalidos[:10])}"
+                           + (f" (+{len(invalidos) - 10})" if len(invalidos) > 10 else ""))
+            ids = [nr for nr in ids if nr.isdigit()]
+        if not ids:
+            return {}
+
+        maximo = max(1, min(chunk_size, self.MAX_IN_BINDS))
+        chunk_size = largura_lista_in(min(len(ids), maximo), maximo)
+        # Variante IN memorizada no registro de queries: mesmo texto de SQL para a mesma largura
+        consulta = registro_consultas().com_lista_in("Pessoa_Fisica.sql", "NR_PRESCRICAO", chunk_size)
+        sql = consulta.sql
+        bind_names = [nome for nome in consulta.binds if nome.startswith("NR_PRESCRICAO_")]
+
+        patients = {}
+
+        def consultar(cursor, chunk):
+            # Completa com NULL: mesmo texto de SQL (e cursor em cache) para todos os blocos da largura
+            padded = chunk + [None] * (len(bind_names) - len(chunk))
+            cursor.execute(sql, dict(zip(bind_names, padded)))
+            colunas = RegistroTasy.colunas(cursor.description)
+            for row in cursor:
+                registro = RegistroTasy(colunas, row)
+                patients.setdefault(str(registro.get('NR_PRESCRICAO')), registro)
+
         try:
             with self._get_connection() as connection:
                 with connection.cursor() as cursor:
+                    self._configure_cursor(cursor)
+                    for start in range(0, len(ids), chunk_size):
+                        chunk = ids[start:start + chunk_size]
+                        logger.debug(f"Buscando {len(chunk)} prescrições em lote...")
+                        try:
+                            consultar(cursor, chunk)
+                        except oracledb.DatabaseError as e:
+                            if len(chunk) == 1:
+                                logger.error(f"Erro ao buscar paciente da prescrição {chunk[0]}: {e}")
+                                continue
+                            logger.warning(f"Erro ao buscar pacientes em lote ({e}); consultando as {len(chunk)} prescrições uma a uma.")
+                            falhas = []
+                            for nr in chunk:
+                                try:
+                                    consultar(cursor, [nr])
+                                except oracledb.DatabaseError:
+                                    falhas.append(nr)
+                            if falhas:
+                                logger.error(f"Prescrições sem dados do Tasy por erro na consulta: {', '.join(falhas[:10])}"
+                                             + (f" (+{len(falhas) - 10})" if len(falhas) > 10 else ""))
+        except oracledb.Error as e:
+            logger.error(f"Erro ao buscar pacientes em lote: {e}")
+
+        logger.info(f"Pacientes encontrados no Tasy: {len(patients)}/{len(ids)} prescrições.")
+        return patients
+
+    @staticmethod
+    def _configure_cursor(cursor, batch_size: Optional[int] = None, prefetch_rows: Optional[int] = None):
+        """Ajusta o tamanho das idas ao banco (deve ser feito antes do execute)."""
+        cursor.arraysize = batch_size or FETCH_ARRAYSIZE
+        cursor.prefetchrows = prefetch_rows if prefetch_rows is not None else FETCH_PREFETCHROWS
+
+    def _iter_query_batches(self, sql: str, params: Dict[str, Any], batch_size: Optional[int] = None,
+                            prefetch_rows: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Executa o SELECT e entrega as linhas (RegistroTasy) em listas de até 'batch_size', à medida
+        que chegam do banco. A sessão e o cursor são liberados quando o gerador termina ou é fechado.
+        Erros do Oracle são registrados e propagados.
+        """
+        batch_size = batch_size or FETCH_ARRAYSIZE
+        try:
+            with self._get_connection() as connection:
+                with connection.cursor() as cursor:
+                    self._configure_cursor(cursor, batch_size, prefetch_rows)
                     logger.debug(f"Executando SQL com parametros: {params}")
                     cursor.execute(sql, params)
-                    
-                    # Obter nomes das colunas
-                    col_names = [row[0] for row in cursor.description]
-                    
-                    for row in cursor:
-                        row_dict = dict(zip(col_names, row))
-                        # Conversão automática de RTF
-                        self._process_rtf_field(row_dict)
-                        files_list.append(row_dict)
-                        
-            return files_list
+
+                    # Nomes das colunas (um mapa só para todas as linhas)
+                    colunas = RegistroTasy.colunas(cursor.description)
+
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        batch = [RegistroTasy(colunas, row) for row in rows]
+                        for registro in batch:
+                            # Conversão automática de RTF
+                            self._process_rtf_field(registro)
+                        yield batch
         except oracledb.Error as e:
             logger.error(f"Erro ao executar query: {e}")
+            raise
+
+    def _execute_query_and_fetch_all(self, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Método auxiliar para executar SELECT e retornar lista de registros (RegistroTasy, lidos como dicts)."""
+        files_list = []
+        try:
+            for batch in self._iter_query_batches(sql, params):
+                files_list.extend(batch)
+            return files_list
+        except oracledb.Error:
             return []
 
     def _process_rtf_field(self, data_dict: Dict[str, Any], field_name: str = 'RESULTADO'):
-        """Processa e limpa campos RTF no dicionário de dados."""
+        """
+        Acrescenta '<campo>_TEXTO_PURO' quando há conteúdo RTF. Em RegistroTasy a conversão fica
+        pendente até a coluna ser lida; em dicionários comuns é feita na hora (ambas com cache).
+        """
         rtf_content = data_dict.get(field_name)
         if rtf_content:
-            try:
-                data_dict[f'{field_name}_TEXTO_PURO'] = rtf_to_text(rtf_content, errors="ignore")
-            except Exception as e:
-                logger.error(f"Erro ao converter RTF: {e}")
-                data_dict[f'{field_name}_TEXTO_PURO'] = "Erro ao processar conteúdo do exame."
+            if isinstance(data_dict, RegistroTasy):
+                data_dict[f'{field_name}_TEXTO_PURO'] = TextoRTFPendente(rtf_content)
+            else:
+                data_dict[f'{field_name}_TEXTO_PURO'] = converter_rtf(rtf_content)
@@ -0,0 +1,170 @@
+import os
+import atexit
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from striprtf.striprtf import rtf_to_text
+
+logger = logging.getLogger(__name__)
+
+# Conversão RTF -> texto puro dos resultados do Tasy. O rtf_to_text é Python puro e caro; por isso
+# a conversão é memorizada pelo hash do conteúdo (o mesmo laudo volta a cada consulta do paciente)
+# e, nas linhas do TasyClient, só acontece quando o texto é lido (TextoRTFPendente).
+
+# Textos convertidos mantidos em memória (os menos usados recentemente saem primeiro)
+RTF_CACHE_TAMANHO = int(os.environ.get("RTF_CACHE_TAMANHO", "1024"))
+# Processos para conversões em lote (0 ou 1: sempre no processo atual)
+RTF_PROCESSOS = int(os.environ.get("RTF_PROCESSOS", "0"))
+# Conversões pendentes a partir das quais um lote vai para os processos auxiliares
+RTF_MINIMO_PARALELO = int(os.environ.get("RTF_MINIMO_PARALELO", "64"))
+
+MENSAGEM_ERRO_RTF = "Erro ao processar conteúdo do exame."
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+# Tarefas enviadas ao pool e ainda não concluídas (canceladas no encerramento)
+_tarefas = set()
+
+def _chave(conteudo):
+    """Hash do conteúdo; None quando ele não é texto (ex: LOB, bytes), que então não passa pelo cache."""
+    try:
+        return hashlib.blake2b(conteudo.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    except Exception:
+        return None
+
+def _converter(conteudo):
+    """Conversão sem cache (também é a tarefa executada nos processos auxiliares)."""
+    try:
+        return rtf_to_text(conteudo, errors="ignore")
+    except Exception as e:
+        logger.error(f"Erro ao converter RTF: {e}")
+        return MENSAGEM_ERRO_RTF
+
+def _converter_varios(conteudos):
+    """Tarefa dos processos auxiliares: um bloco de conteúdos por envio."""
+    return [_converter(conteudo) for conteudo in conteudos]
+
+def _do_cache(chave):
+    with _cache_lock:
+        texto = _cache.get(chave)
+        if texto is not None:
+            _cache.move_to_end(chave)
+        return texto
+
+def _guardar(chave, texto):
+    if RTF_CACHE_TAMANHO <= 0:
+        return
+    with _cache_lock:
+        _cache[chave] = texto
+        _cache.move_to_end(chave)
+        while len(_cache) > RTF_CACHE_TAMANHO:
+            _cache.popitem(last=False)
+
+def limpar_cache():
+    """Esvazia o cache de textos convertidos."""
+    with _cache_lock:
+        _cache.clear()
+
+def converter_rtf(conteudo):
+    """
+    Texto puro de um conteúdo RTF, reaproveitando conversões anteriores do mesmo conteúdo.
+    Erros de conversão são registrados e devolvem MENSAGEM_ERRO_RTF.
+    """
+    chave = _chave(conteudo)
+    if chave is None:
+        return _converter(conteudo)
+    texto = _do_cache(chave)
+    if texto is None:
+        texto = _converter(conteudo)
+        _guardar(chave, texto)
+    return texto
+
+def _obter_executor(processos):
+    """Pool de processos do processo atual (criado no primeiro lote grande; recriado após fork)."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=processos)
+            _executor_pid = os.getpid()
+            logger.info(f"Pool de conversão RTF criado ({processos} processos).")
+        return _executor
+
+def encerrar_processos():
+    """Encerra o pool de conversão deste processo (chamado automaticamente na saída do interpretador)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            for tarefa in list(_tarefas):
+                tarefa.cancel()
+            _executor.shutdown(wait=True)
+        _executor = None
+        _tarefas.clear()
+
+atexit.register(encerrar_processos)
+
+def converter_rtf_em_lote(conteudos, processos=None):
+    """
+    Converte vários conteúdos de uma vez, na mesma ordem. Conteúdos repetidos ou já em cache
+    não são convertidos de novo; quando sobram ao menos RTF_MINIMO_PARALELO conversões e há
+    processos configurados (RTF_PROCESSOS), elas são distribuídas entre os processos auxiliares.
+
+    Args:
+        conteudos (list): Textos RTF.
+        processos (int, opcional): Sobrepõe RTF_PROCESSOS nesta chamada (1 força o processo atual).
+
+    Returns:
+        list: Textos puros, um por conteúdo.
+    """
+    chaves = [_chave(conteudo) for conteudo in conteudos]
+    textos = {}
+    faltando = {}
+    for chave, conteudo in zip(chaves, conteudos):
+        if chave is None or chave in textos or chave in faltando:
+            continue
+        texto = _do_cache(chave)
+        if texto is None:
+            faltando[chave] = conteudo
+        else:
+            textos[chave] = texto
+
+    if faltando:
+        processos = RTF_PROCESSOS if processos is None else processos
+        if processos > 1 and len(faltando) >= RTF_MINIMO_PARALELO:
+            executor = _obter_executor(processos)
+            # Blocos de conteúdos por tarefa diluem o custo de comunicação entre processos
+            pendentes = list(faltando.values())
+            tamanho = max(1, len(pendentes) // (processos * 4))
+            tarefas = [executor.submit(_converter_varios, pendentes[i:i + tamanho])
+                       for i in range(0, len(pendentes), tamanho)]
+            _tarefas.update(tarefas)
+            for tarefa in tarefas:
+                tarefa.add_done_callback(_tarefas.discard)
+            convertidos = [texto for tarefa in tarefas for texto in tarefa.result()]
+        else:
+            convertidos = map(_converter, faltando.values())
+        for chave, texto in zip(faltando, convertidos):
+            textos[chave] = texto
+            _guardar(chave, texto)
+
+    return [textos[chave] if chave is not None else _converter(conteudo)
+            for chave, conteudo in zip(chaves, conteudos)]
+
+class TextoRTFPendente:
+    """Conversão adiada: guarda o RTF e só o converte quando o texto é lido (ver RegistroTasy)."""
+    __slots__ = ('conteudo',)
+
+    def __init__(self, conteudo):
+        self.conteudo = conteudo
+
+    def resolver(self):
+        return converter_rtf(self.conteudo)
+
+    def __repr__(self):
+        return f"TextoRTFPendente({type(self.conteudo).__name__})"
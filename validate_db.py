@@ -1,8 +1,7 @@
 import logging
-import os
-import re
 from dotenv import load_dotenv
 from utils.tasy_client import TasyClient
+from utils.consultas import registro_consultas
 
 # Carrega variáveis de ambiente
 load_dotenv()
@@ -13,13 +12,9 @@ logger = logging.getLogger(__name__)
 
 def validate_db_connection():
     try:
-        # 1. Carregar Query
-        query_path = os.path.join("querys", "Prescricao_medica.sql")
-        with open(query_path, 'r', encoding='utf-8') as f:
-            sql_query = f.read()
-
-        # Limpeza básica da query
-        sql_query = re.sub(r'--.*$', '', sql_query, flags=re.MULTILINE)
+        # 1. Carregar Query (normalizada pelo registro de queries)
+        consulta = registro_consultas().obter("Prescricao_medica.sql")
+        sql_query = consulta.sql
 
         # 2. Inicializar Cliente
         logger.info("Inicializando Cliente Tasy...")
@@ -28,6 +23,7 @@ def validate_db_connection():
         # 3. Executar Query
         test_id = 6788792
         params = {'NR_PRESCRICAO': test_id}
+        consulta.validar_parametros(params)
         
         logger.info(f"Executando query Prescricao_medica.sql para ID: {test_id}...")
         results = client._execute_query_and_fetch_all(sql_query, params)
@@ -1,17 +1,23 @@
 import os
+import re
 import sys
 import glob
+import time
 import argparse
 import logging
-import xml.etree.ElementTree as ET
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 
-# Configuração de Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+from src.escrita import escrita_atomica
+from src.extracao import extrair_resultado
+from src.leitor_xml import obter_backend, ERROS_PARSE
+
+# Acima deste tamanho o XML é convertido em streaming (bloco a bloco) em vez de montar o RTF inteiro
+STREAMING_THRESHOLD_BYTES = 50 * 1024 * 1024
+
+# Configuração de Logging (aplicada em main(): o módulo também é importado pela separação)
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_DATEFMT = '%Y-%m-%d %H:%M:%S'
 logger = logging.getLogger(__name__)
 
 class RTFConverter:
@@ -29,6 +35,27 @@ class RTFConverter:
     
     RTF_FOOTER = r"\par}"
 
+    @staticmethod
+    def _escape_char(char):
+        """
+        Sequência RTF de um caractere não-ASCII (entrada da tabela de escape).
+        """
+        # Para garantir compatibilidade total (ASCII-7), convertemos caracteres fora do range ASCII
+        # para a notação hex do RTF (\'hh).
+        try:
+            # Codifica o caractere para obter o byte correspondente em CP1252 (padrão do RTF \ansi)
+            byte_val = char.encode('cp1252')[0]
+            return f"\\'{byte_val:02x}"
+        except UnicodeEncodeError:
+            # Fallback para caracteres que não existem em CP1252 (ex: emojis, caracteres complexos)
+            # Usa a notação Unicode do RTF: \uN?
+            # N é o valor decimal signed de 16-bit (short)
+            # O '?' é o caractere de substituição para leitores antigos
+            code = ord(char)
+            if code > 32767:
+                code = code - 65536
+            return f"\\u{code}?"
+
     @staticmethod
     def escape_text(text):
         """
@@ -45,33 +72,28 @@ class RTFConverter:
         
         # 2. Converter quebras de linha para \par (parágrafo) ou \line (quebra de linha simples)
         # Normalizando quebras de linha
-        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
         text = text.replace('\n', r'\par ' + '\n')
         
-        # 3. Tratamento de caracteres não-ASCII para RTF
-        # Para garantir compatibilidade total (ASCII-7), convertemos caracteres fora do range ASCII
-        # para a notação hex do RTF (\'hh).
-        final_text = []
-        for char in text:
-            code = ord(char)
-            if code < 128:
-                final_text.append(char)
-            else:
-                # Tenta codificar em CP1252 (padrão do RTF \ansi)
-                try:
-                    # Codifica o caractere para obter o byte correspondente em CP1252
-                    byte_val = char.encode('cp1252')[0]
-                    final_text.append(f"\\'{byte_val:02x}")
-                except UnicodeEncodeError:
-                    # Fallback para caracteres que não existem em CP1252 (ex: emojis, caracteres complexos)
-                    # Usa a notação Unicode do RTF: \uN?
-                    # N é o valor decimal signed de 16-bit (short)
-                    # O '?' é o caractere de substituição para leitores antigos
-                    if code > 32767:
-                        code = code - 65536
-                    final_text.append(f"\\u{code}?")
-        
-        return "".join(final_text)
+        # 3. Tratamento de caracteres não-ASCII para RTF: cada um é trocado pela sequência
+        # pré-calculada na tabela (sem laço Python por caractere nem encode por ocorrência)
+        if text.isascii():
+            return text
+        return _NAO_ASCII.sub(_substituir_nao_ascii, text)
+
+    @classmethod
+    def escape_many(cls, texts):
+        """
+        Escapa vários textos em uma chamada (ex: todos os resultados de um lote).
+        Retorna uma lista na mesma ordem, com "" para textos vazios ou None.
+        """
+        texts = [text or "" for text in texts]
+
+        # Junta tudo com um separador ausente dos textos e traduz de uma vez só
+        if not any(_SEPARADOR_LOTE in text for text in texts):
+            return cls.escape_text(_SEPARADOR_LOTE.join(texts)).split(_SEPARADOR_LOTE) if texts else []
+        return [cls.escape_text(text) for text in texts]
 
     @classmethod
     def create_file(cls, content, output_path):
@@ -93,6 +115,57 @@ class RTFConverter:
             logger.error(f"Erro ao escrever arquivo RTF: {e}")
             return False
 
+    @classmethod
+    def create_file_streaming(cls, blocks, output_path):
+        """
+        Gera o arquivo RTF a partir de blocos de texto, escapando e gravando um bloco por vez
+        (o documento nunca é montado inteiro em memória). Os blocos são separados por quebra de linha.
+        Retorna False sem criar o arquivo quando não há nenhum bloco.
+        """
+        blocks = iter(blocks)
+        try:
+            first = next(blocks, None)
+            if first is None:
+                return False
+
+            separator = cls.escape_text("\n")
+            with escrita_atomica(output_path, 'w', encoding='ascii', errors='replace') as f:
+                f.write(cls.RTF_HEADER)
+                f.write(cls.escape_text(first))
+                for block in blocks:
+                    f.write(separator)
+                    f.write(cls.escape_text(block))
+                f.write(cls.RTF_FOOTER)
+
+            logger.info(f"Arquivo RTF criado com sucesso: {output_path}")
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao escrever arquivo RTF: {e}")
+            return False
+
+class _TabelaEscapeRTF(dict):
+    """
+    Tabela de escape RTF dos caracteres não-ASCII: o repertório Latin-1/CP1252 é pré-calculado;
+    os demais caracteres são calculados na primeira ocorrência e memorizados.
+    """
+
+    def __missing__(self, char):
+        value = RTFConverter._escape_char(char)
+        self[char] = value
+        return value
+
+_TABELA_ESCAPE_RTF = _TabelaEscapeRTF()
+for _char in bytes(range(128, 256)).decode('latin-1') + bytes(range(128, 256)).decode('cp1252', errors='ignore'):
+    _TABELA_ESCAPE_RTF[_char]
+
+_NAO_ASCII = re.compile('[^\x00-\x7f]')
+
+def _substituir_nao_ascii(match):
+    return _TABELA_ESCAPE_RTF[match.group()]
+
+# Separador usado por escape_many: NUL não aparece em XML válido e o escape o mantém inalterado
+_SEPARADOR_LOTE = '\x00'
+
 def find_latest_xml(directory="."):
     """
     Busca o arquivo .xml mais recente no diretório especificado.
@@ -113,6 +186,101 @@ def find_latest_xml(directory="."):
     logger.info(f"Arquivo XML mais recente encontrado em '{directory}': {latest_file}")
     return latest_file
 
+def formatar_cabecalho(registro):
+    """
+    Linhas de cabeçalho de um atendimento (src.extracao.Resultado); vazio quando não há NumeroAtendimentoDB.
+    """
+    # Dados do paciente/atendimento (opcional, mas bom ter no cabeçalho)
+    atendimento = registro.atendimento_db or ""
+    if not atendimento:
+        return []
+    return [f"Atendimento DB: {atendimento}", "-" * 40, ""]
+
+def formatar_procedimento(proc):
+    """
+    Linhas de texto de um procedimento (src.extracao.Procedimento) no layout do RTF.
+    """
+    full_text = []
+    exame = proc.codigo_exame or "Exame"
+    
+    full_text.append(f"EXAME: {exame}")
+    if proc.metodologia:
+        full_text.append(f"Metodologia: {proc.metodologia}")
+    full_text.append("")
+    
+    # Parâmetros (ListaResultadoTexto)
+    for param in proc.parametros:
+        descricao = param.descricao or ""
+        valor = param.valor or ""
+        unidade = param.unidade or ""
+        referencia = param.referencia or ""
+        
+        # Formatação: Descrição ........ Valor Unidade
+        line = f"{descricao}: {valor} {unidade}".strip()
+        full_text.append(line)
+        
+        if referencia:
+            full_text.append("Valor de Referência:")
+            full_text.append(referencia)
+        
+        full_text.append("")
+    
+    # Observações do procedimento
+    if proc.observacoes:
+        full_text.append("Observações:")
+        full_text.extend(proc.observacoes)
+        full_text.append("")
+        
+    if proc.liberador:
+        full_text.append(f"Liberado por: {proc.liberador} em {proc.data_liberacao}")
+    
+    full_text.append("=" * 40)
+    full_text.append("")
+    return full_text
+
+def formatar_resultado(registro):
+    """
+    Linhas de texto de um atendimento (src.extracao.Resultado) no layout do RTF.
+    """
+    full_text = formatar_cabecalho(registro)
+    for proc in registro.procedimentos:
+        full_text.extend(formatar_procedimento(proc))
+    return full_text
+
+def iter_db_diagnosticos_blocks(xml_path, backend=None):
+    """
+    Versão em streaming de parse_db_diagnosticos_format: lê o XML com iterparse e produz um bloco de
+    texto por cabeçalho de atendimento e por procedimento, descartando cada 'ct_Resultado_v1' após o uso.
+    Unir os blocos com "\n" dá exatamente o texto de parse_db_diagnosticos_format.
+    Não produz nada quando o arquivo não está no formato DB Diagnósticos.
+    'backend' escolhe o leitor XML (ver src.leitor_xml; padrão: variável XML_BACKEND).
+    """
+    pilha = []
+    formato_db = False
+    for event, elem in obter_backend(backend).iterparse(xml_path, ('start', 'end')):
+        if event == 'start':
+            # Mesma detecção de parse_db_diagnosticos_format (raiz ou tags características)
+            if not formato_db and elem.tag in ('ct_LoteResultados_v1', 'ListaResultadoProcedimentos'):
+                logger.info("Detectado formato DB Diagnósticos / ct_LoteResultados_v1")
+                formato_db = True
+            pilha.append(elem)
+            continue
+
+        pilha.pop()
+        if elem.tag != 'ct_Resultado_v1' or len(pilha) == 0:
+            continue
+
+        if formato_db:
+            registro = extrair_resultado(elem)
+            cabecalho = formatar_cabecalho(registro)
+            if cabecalho:
+                yield "\n".join(cabecalho)
+            for proc in registro.procedimentos:
+                yield "\n".join(formatar_procedimento(proc))
+
+        # Libera o atendimento já convertido (o pai só guarda os que ainda estão em leitura)
+        pilha[-1].remove(elem)
+
 def parse_db_diagnosticos_format(root):
     """
     Tenta extrair dados do formato DB Diagnósticos (ct_LoteResultados_v1).
@@ -129,79 +297,23 @@ def parse_db_diagnosticos_format(root):
     full_text = []
     
     # Itera sobre os resultados
-    # Pode haver múltiplos ct_Resultado_v1
-    resultados = root.findall('.//ct_Resultado_v1')
-    
-    for res in resultados:
-        # Dados do paciente/atendimento (opcional, mas bom ter no cabeçalho)
-        atendimento = res.findtext('NumeroAtendimentoDB') or ""
-        if atendimento:
-            full_text.append(f"Atendimento DB: {atendimento}")
-            full_text.append("-" * 40)
-            full_text.append("")
-
-        procedimentos = res.findall('.//ct_ResultadoProcedimentos_v1')
-        
-        for proc in procedimentos:
-            exame = proc.findtext('CodigoExameDB') or "Exame"
-            metodologia = proc.findtext('DescricaoMetodologia')
-            
-            full_text.append(f"EXAME: {exame}")
-            if metodologia:
-                full_text.append(f"Metodologia: {metodologia}")
-            full_text.append("")
-            
-            # Processa ListaResultadoTexto (Parâmetros)
-            params = proc.findall('.//ct_ResultadoTexto_v1')
-            for param in params:
-                descricao = param.findtext('DescricaoParametrosDB') or ""
-                valor = param.findtext('ValorResultado') or ""
-                unidade = param.findtext('UnidadeMedida') or ""
-                referencia = param.findtext('ValorReferencia') or ""
-                
-                # Formatação: Descrição ........ Valor Unidade
-                line = f"{descricao}: {valor} {unidade}".strip()
-                full_text.append(line)
-                
-                if referencia:
-                    full_text.append("Valor de Referência:")
-                    full_text.append(referencia)
-                
-                full_text.append("")
-            
-            # Observações do procedimento
-            obs_list = []
-            for i in range(1, 6):
-                obs = proc.findtext(f'Observacao{i}')
-                if obs:
-                    obs_list.append(obs)
-            
-            if obs_list:
-                full_text.append("Observações:")
-                full_text.extend(obs_list)
-                full_text.append("")
-                
-            liberador = proc.findtext('NomeLiberadorClinico')
-            data_lib = proc.findtext('DataHoraLiberacaoClinica')
-            if liberador:
-                full_text.append(f"Liberado por: {liberador} em {data_lib}")
-            
-            full_text.append("=" * 40)
-            full_text.append("")
+    # Pode haver múltiplos ct_Resultado_v1 (cada um percorrido uma única vez pelo motor de extração)
+    for res in root.findall('.//ct_Resultado_v1'):
+        full_text.extend(formatar_resultado(extrair_resultado(res)))
 
     if not full_text:
         return None
         
     return "\n".join(full_text)
 
-def parse_xml_content(xml_path):
+def parse_xml_content(xml_path, backend=None):
     """
     Analisa o XML e busca pelo conteúdo do resultado.
     Suporta formato simples (Conteudo/TextoResultado) e formato estruturado DB.
+    'backend' escolhe o leitor XML (ver src.leitor_xml; padrão: variável XML_BACKEND).
     """
     try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
+        root = obter_backend(backend).parse(xml_path)
         
         # 1. Tenta formato DB Diagnósticos (Estruturado)
         db_content = parse_db_diagnosticos_format(root)
@@ -238,20 +350,161 @@ def parse_xml_content(xml_path):
             logger.error("Nenhum conteúdo de texto encontrado nas tags esperadas (Simples ou DB).")
             return None
 
-    except ET.ParseError as e:
+    except ERROS_PARSE as e:
         logger.error(f"Erro de sintaxe no XML (Malformado): {e}")
         return None
     except Exception as e:
         logger.error(f"Erro inesperado ao ler XML: {e}")
         return None
 
+def rtf_output_path(input_path, output_dir=None):
+    """
+    Caminho do RTF correspondente a um XML: mesmo nome, na pasta de saída ou ao lado do XML.
+    """
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir or os.path.dirname(input_path), f"{base_name}.rtf")
+
+def is_up_to_date(input_path, output_path):
+    """
+    Indica se o RTF já existe e é mais recente que o XML de origem.
+    """
+    try:
+        return os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+    except OSError:
+        return False
+
+def convert_file(input_path, output_dir=None, stream=None):
+    """
+    Converte um XML em RTF.
+    Retorna o caminho do RTF gerado ou None em caso de falha/conteúdo vazio.
+
+    Com 'stream' (padrão: automático para arquivos a partir de STREAMING_THRESHOLD_BYTES), lotes no
+    formato DB Diagnósticos são convertidos bloco a bloco, sem carregar o documento inteiro.
+    """
+    output_path = rtf_output_path(input_path, output_dir)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if stream is None:
+        stream = os.path.getsize(input_path) >= STREAMING_THRESHOLD_BYTES
+    if stream:
+        if RTFConverter.create_file_streaming(iter_db_diagnosticos_blocks(input_path), output_path):
+            return output_path
+        # Formato simples (ou sem resultados): segue pelo caminho tradicional
+        logger.info("Conversão em streaming não aplicável; usando leitura completa do XML.")
+
+    content = parse_xml_content(input_path)
+    if not content:
+        logger.warning(f"Falha ao extrair conteúdo ou conteúdo vazio: {input_path}")
+        return None
+
+    if not RTFConverter.create_file(content, output_path):
+        return None
+    return output_path
+
+def _init_batch_worker(log_level):
+    # Cada processo trabalhador herda o nível de log do processo principal
+    logging.basicConfig(level=log_level, format=LOG_FORMAT, datefmt=LOG_DATEFMT)
+    logging.getLogger().setLevel(log_level)
+
+def _convert_batch_task(input_path, output_dir):
+    try:
+        return input_path, convert_file(input_path, output_dir) is not None
+    except Exception as e:
+        logger.error(f"Erro ao converter {input_path}: {e}")
+        return input_path, False
+
+def convert_directory(input_dir, output_dir=None, workers=None, force=False, include_lotes=False):
+    """
+    Converte todos os XMLs de um diretório em RTF, distribuindo os arquivos entre processos.
+
+    Args:
+        input_dir (str): Diretório com os XMLs individuais (separados por atendimento).
+        output_dir (str, opcional): Diretório dos RTFs (padrão: ao lado de cada XML).
+        workers (int, opcional): Quantidade de processos (padrão: número de CPUs).
+        force (bool): Reconverte mesmo quando o RTF já está atualizado.
+        include_lotes (bool): Inclui os lotes completos ('lote_exames_*.xml'), ignorados por padrão.
+
+    Returns:
+        dict: Relatório com total, convertidos, ignorados (já atualizados), falhas e segundos.
+    """
+    inicio = time.perf_counter()
+    files = sorted(glob.glob(os.path.join(input_dir, "*.xml")))
+    if not include_lotes:
+        files = [f for f in files if not os.path.basename(f).startswith("lote_exames_")]
+
+    report = {"total": len(files), "convertidos": 0, "ignorados": 0, "falhas": 0, "segundos": 0.0}
+
+    # A checagem de data é feita aqui (um stat por arquivo); só os desatualizados vão para o pool
+    pending = []
+    for input_path in files:
+        if not force and is_up_to_date(input_path, rtf_output_path(input_path, output_dir)):
+            report["ignorados"] += 1
+        else:
+            pending.append(input_path)
+
+    if pending:
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        workers = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+        # Lotes de arquivos por tarefa diluem o custo de comunicação entre processos
+        chunksize = max(1, min(64, len(pending) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                 initargs=(logging.getLogger().getEffectiveLevel(),)) as pool:
+            for input_path, ok in pool.map(_convert_batch_task, pending,
+                                           [output_dir] * len(pending), chunksize=chunksize):
+                if ok:
+                    report["convertidos"] += 1
+                else:
+                    report["falhas"] += 1
+                    logger.error(f"Falha na conversão: {input_path}")
+
+    report["segundos"] = time.perf_counter() - inicio
+    return report
+
 def main():
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, datefmt=LOG_DATEFMT)
+
     parser = argparse.ArgumentParser(description="Converte conteúdo de XML laboratorial para RTF.")
     parser.add_argument("file", nargs='?', help="Caminho do arquivo XML específico. Se omitido, busca na pasta de entrada.")
     parser.add_argument("-i", "--input-dir", default=".", help="Diretório para buscar arquivos XML (padrão: atual).")
     parser.add_argument("-o", "--output-dir", help="Diretório para salvar o arquivo RTF (padrão: mesmo do XML).")
+    parser.add_argument("-b", "--batch", action="store_true", help="Converte todos os XMLs do diretório de entrada.")
+    parser.add_argument("-w", "--workers", type=int, help="Processos no modo lote (padrão: número de CPUs).")
+    parser.add_argument("--force", action="store_true", help="Modo lote: reconverte mesmo os RTFs já atualizados.")
+    parser.add_argument("--stream", action="store_true", help="Força a conversão em streaming (padrão: automática para XMLs grandes).")
+    parser.add_argument("--include-lotes", action="store_true", help="Modo lote: inclui os arquivos lote_exames_*.xml.")
     args = parser.parse_args()
 
+    if args.output_dir and not os.path.exists(args.output_dir):
+        # Se diretório de saída foi especificado
+        try:
+            os.makedirs(args.output_dir)
+            logger.info(f"Diretório de saída criado: {args.output_dir}")
+        except OSError as e:
+            logger.error(f"Não foi possível criar o diretório de saída: {e}")
+            sys.exit(1)
+
+    # Modo lote: um diretório inteiro em uma única execução
+    if args.batch:
+        input_dir = args.file or args.input_dir
+        if not os.path.isdir(input_dir):
+            logger.error(f"Diretório de busca não encontrado: {input_dir}")
+            sys.exit(1)
+
+        # O log por arquivo fica nos avisos e erros; o resumo sai ao final
+        logging.getLogger().setLevel(logging.WARNING)
+        report = convert_directory(input_dir, args.output_dir, args.workers, args.force, args.include_lotes)
+        logging.getLogger().setLevel(logging.INFO)
+
+        segundos = max(report["segundos"], 1e-9)
+        logger.info(f"Conversão em lote: {report['convertidos']} convertidos, {report['ignorados']} já atualizados, "
+                    f"{report['falhas']} falhas de {report['total']} arquivos em {report['segundos']:.1f}s "
+                    f"({report['convertidos'] / segundos:.1f} arquivos/s).")
+        if report["falhas"]:
+            sys.exit(1)
+        return
+
     # 1. Determinar arquivo de entrada
     input_path = args.file
     
@@ -268,36 +521,8 @@ def main():
 
     logger.info(f"Processando arquivo: {input_path}")
 
-    # 2. Extrair conteúdo
-    content = parse_xml_content(input_path)
-    
-    if not content:
-        logger.warning("Falha ao extrair conteúdo ou conteúdo vazio. Arquivo RTF não será gerado.")
-        sys.exit(1)
-
-    # 3. Gerar caminho de saída
-    filename = os.path.basename(input_path)
-    base_name = os.path.splitext(filename)[0]
-    
-    if args.output_dir:
-        # Se diretório de saída foi especificado
-        if not os.path.exists(args.output_dir):
-            try:
-                os.makedirs(args.output_dir)
-                logger.info(f"Diretório de saída criado: {args.output_dir}")
-            except OSError as e:
-                logger.error(f"Não foi possível criar o diretório de saída: {e}")
-                sys.exit(1)
-        output_path = os.path.join(args.output_dir, f"{base_name}.rtf")
-    else:
-        # Padrão: Salva no mesmo diretório do arquivo original
-        output_dir = os.path.dirname(input_path)
-        output_path = os.path.join(output_dir, f"{base_name}.rtf")
-
-    # 4. Criar RTF
-    success = RTFConverter.create_file(content, output_path)
-    
-    if success:
+    # 2. Extrair conteúdo, 3. gerar caminho de saída e 4. criar RTF
+    if convert_file(input_path, args.output_dir, stream=args.stream or None):
         logger.info("Conversão concluída com sucesso.")
     else:
         logger.error("Falha na conversão.")